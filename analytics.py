@@ -0,0 +1,228 @@
+import re
+import threading
+from collections import Counter
+from collections.abc import Hashable
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Sequence
+
+from layer_store import CategoricalColumn, ColumnarLayer, NumericColumn
+
+# Risk levels always reported, even when no feature uses them
+RISK_LEVELS = ('high', 'medium', 'low')
+
+# Months shown in the incident trend
+TREND_MONTHS = 12
+
+_MONTH_PATTERN = re.compile(r'^(\d{4})-(\d{2})')
+
+# Feature identity followed by the properties the aggregates are built from
+FEATURE_KEYS = ('id', 'risk_level', 'severity', 'last_updated')
+
+# Marks a row without the property, or with a value the aggregates skip
+_ABSENT = object()
+
+
+def _month_of(value) -> Optional[str]:
+    """YYYY-MM prefix of a last_updated value, or None if it isn't a date"""
+    if not isinstance(value, str):
+        return None
+    match = _MONTH_PATTERN.match(value)
+    return f"{match.group(1)}-{match.group(2)}" if match else None
+
+
+def _previous_months(last_month: str, count: int) -> List[str]:
+    """The count months ending at last_month (YYYY-MM), oldest first"""
+    year, month = int(last_month[:4]), int(last_month[5:7])
+    months = []
+    for _ in range(count):
+        months.append(f"{year:04d}-{month:02d}")
+        month -= 1
+        if month == 0:
+            year, month = year - 1, 12
+    return months[::-1]
+
+
+def _row_values(columns: ColumnarLayer, key: str) -> List:
+    """Per-row value of a property, _ABSENT where the row lacks it or it is unhashable"""
+    column = columns.columns.get(key)
+    if column is None:
+        return [_ABSENT] * columns.size
+    if isinstance(column, CategoricalColumn):
+        values = [column.categories[code] if code >= 0 else _ABSENT for code in column.codes.tolist()]
+    elif isinstance(column, NumericColumn):
+        values = column.values.tolist()
+    else:
+        values = column.values
+    present = columns.has_property(key).tolist()
+    return [value if has_value and isinstance(value, Hashable) else _ABSENT
+            for value, has_value in zip(values, present)]
+
+
+def _feature_rows(columns: ColumnarLayer) -> Counter:
+    """Multiset of the FEATURE_KEYS values of every feature of a layer"""
+    return Counter(zip(*(_row_values(columns, key) for key in FEATURE_KEYS)))
+
+
+def _properties_of(row: tuple) -> Dict:
+    """The aggregated properties of a _feature_rows entry"""
+    return {key: value for key, value in zip(FEATURE_KEYS[1:], row[1:]) if value is not _ABSENT}
+
+
+def analytics_delta(old: Dict, new: Dict) -> Dict:
+    """
+    The parts of an analytics snapshot that changed, as a shallow patch.
+    Distributions only list their changed entries; entries that disappeared are sent as 0.
+    """
+    delta = {}
+    for key, value in new.items():
+        if key == 'generated_at':
+            continue
+        previous = old.get(key)
+        if isinstance(value, dict) and isinstance(previous, dict):
+            changed = {k: v for k, v in value.items() if previous.get(k) != v}
+            changed.update({k: 0 for k in previous if k not in value})
+            if changed:
+                delta[key] = changed
+        elif value != previous:
+            delta[key] = value
+    return delta
+
+
+class LayerAggregates:
+    """Feature count and risk, severity and monthly distributions of one layer"""
+
+    def __init__(self):
+        self.count = 0
+        self.risk_levels = Counter()
+        self.severities = Counter()
+        self.months = Counter()
+
+    @classmethod
+    def from_columns(cls, columns: ColumnarLayer) -> 'LayerAggregates':
+        """Aggregate a columnar layer using its category codes"""
+        aggregates = cls()
+        aggregates.count = columns.size
+        aggregates.risk_levels.update(columns.value_counts('risk_level'))
+        aggregates.severities.update(columns.value_counts('severity'))
+        # Dates repeat a lot, so parse each distinct value once
+        for value, count in columns.value_counts('last_updated').items():
+            month = _month_of(value)
+            if month is not None:
+                aggregates.months[month] += count
+        return aggregates
+
+    @classmethod
+    def updated(cls, previous: 'LayerAggregates', old_columns: ColumnarLayer,
+                new_columns: ColumnarLayer) -> 'LayerAggregates':
+        """
+        Aggregates of a new layer version, derived from the previous version's:
+        features that disappeared or changed are removed, new ones are added
+        """
+        old_rows, new_rows = _feature_rows(old_columns), _feature_rows(new_columns)
+        aggregates = previous.copy()
+        for row, count in (old_rows - new_rows).items():
+            aggregates.remove_feature(_properties_of(row), count)
+        for row, count in (new_rows - old_rows).items():
+            aggregates.add_feature(_properties_of(row), count)
+        return aggregates
+
+    def copy(self) -> 'LayerAggregates':
+        """An independent copy of these aggregates"""
+        aggregates = LayerAggregates()
+        aggregates.add(self)
+        return aggregates
+
+    def add_feature(self, properties: Optional[Dict], count: int = 1):
+        """Account for added features with these properties"""
+        self._apply_feature(properties or {}, count)
+
+    def remove_feature(self, properties: Optional[Dict], count: int = 1):
+        """Account for removed features with these properties"""
+        self._apply_feature(properties or {}, -count)
+
+    def _apply_feature(self, properties: Dict, weight: int):
+        self.count += weight
+        if 'risk_level' in properties:
+            self.risk_levels[properties['risk_level']] += weight
+        if 'severity' in properties:
+            self.severities[properties['severity']] += weight
+        month = _month_of(properties.get('last_updated'))
+        if month is not None:
+            self.months[month] += weight
+
+    def add(self, other: 'LayerAggregates'):
+        """Fold another layer's aggregates into these"""
+        self.count += other.count
+        self.risk_levels.update(other.risk_levels)
+        self.severities.update(other.severities)
+        self.months.update(other.months)
+
+    def subtract(self, other: 'LayerAggregates'):
+        """Take another layer's aggregates back out"""
+        self.count -= other.count
+        self.risk_levels.subtract(other.risk_levels)
+        self.severities.subtract(other.severities)
+        self.months.subtract(other.months)
+
+
+class AnalyticsEngine:
+    """
+    Cross-layer analytics kept up to date incrementally.
+    Each layer version carries its own LayerAggregates; when a layer changes,
+    only its old aggregates are subtracted from the totals and the new ones
+    added. The response dict is rebuilt only then and otherwise served as-is.
+    """
+
+    def __init__(self, disaster_types: Sequence[str], get_layer: Callable):
+        self.disaster_types = list(disaster_types)
+        self._get_layer = get_layer
+        self._layers = {disaster_type: None for disaster_type in self.disaster_types}
+        self._by_type = {disaster_type: 0 for disaster_type in self.disaster_types}
+        self._totals = LayerAggregates()
+        self._snapshot: Optional[Dict] = None
+        self._lock = threading.Lock()
+
+    def get(self) -> Dict:
+        """Current analytics; callers must not modify the returned dict"""
+        snapshot = self._snapshot
+        if snapshot is not None and all(self._get_layer(t) is self._layers[t] for t in self.disaster_types):
+            return snapshot
+
+        with self._lock:
+            # Read under the lock, so a caller holding an older layer can't fold it back in
+            current = {t: self._get_layer(t) for t in self.disaster_types}
+            for disaster_type, layer in current.items():
+                old = self._layers[disaster_type]
+                if layer is old:
+                    continue
+                if old is not None:
+                    self._totals.subtract(old.aggregates)
+                if layer is not None:
+                    self._totals.add(layer.aggregates)
+                self._by_type[disaster_type] = layer.aggregates.count if layer is not None else 0
+                self._layers[disaster_type] = layer
+
+            self._snapshot = self._build_snapshot()
+            return self._snapshot
+
+    def _build_snapshot(self) -> Dict:
+        totals = self._totals
+        risk_distribution = {level: 0 for level in RISK_LEVELS}
+        risk_distribution.update({k: v for k, v in totals.risk_levels.items() if v > 0})
+
+        # Trend covers the months leading up to the newest data
+        months = [m for m, count in totals.months.items() if count > 0]
+        last_month = max(months) if months else datetime.now().strftime('%Y-%m')
+        trend_data = [
+            {'month': month, 'incidents': totals.months.get(month, 0)}
+            for month in _previous_months(last_month, TREND_MONTHS)
+        ]
+
+        return {
+            'total_incidents': totals.count,
+            'by_type': dict(self._by_type),
+            'trend_data': trend_data,
+            'risk_distribution': risk_distribution,
+            'severity_distribution': {k: v for k, v in totals.severities.items() if v > 0},
+            'generated_at': datetime.now().isoformat()
+        }
@@ -1,25 +1,184 @@
 import os
 import logging
-from flask import Flask, render_template, request, jsonify, send_file
+import multiprocessing
+import threading
+import time
+from flask import Flask, Response, g, render_template, request, jsonify, stream_with_context
 from weather_api import WeatherAPI
-from utils import GeoJSONUtils
+from weather_async import WeatherService
+from utils import DEFAULT_PAGE_SIZE, DISASTER_TYPES, MAX_PAGE_SIZE, GeoJSONUtils, layer_cache
+from report_export import stream_csv, stream_geojson
+from vector_tiles import tile_cache
+from http_cache import EncodedBody, make_etag, send_body
+from bookmark_store import DEFAULT_PAGE_SIZE as BOOKMARK_PAGE_SIZE, MAX_NAME_LENGTH, bookmark_store
+from risk_watcher import BookmarkRiskWatcher
+from event_hub import event_hub
+from analytics import analytics_delta
+from layer_watcher import LayerWatcher
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, registry as metrics_registry
+from profiler import profiler
+from ml_model.feature_store import feature_store
+from ml_model.registry import model_registry
+from ml_model.risk_raster import RiskRaster
 import json
 from datetime import datetime
-import pandas as pd
-from io import StringIO, BytesIO
 
-# Set up logging
-logging.basicConfig(level=logging.DEBUG)
+# Set up logging; DEBUG is very chatty under load, so production stays at INFO
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+logging.basicConfig(level=LOG_LEVEL)
 
 app = Flask(__name__)
 app.secret_key = os.environ.get("SESSION_SECRET", "dev-secret-key-change-in-production")
 
 # Initialize utilities
 weather_api = WeatherAPI()
+# Coalesces identical in-flight upstream calls across request threads
+weather_service = WeatherService(weather_api)
 geojson_utils = GeoJSONUtils()
 
-# In-memory storage for bookmarks (in production, use a database)
-bookmarks = []
+# Per-route request counts and latencies; the route is the URL rule, not the path,
+# so label cardinality stays bounded
+REQUESTS = metrics_registry.counter(
+    'http_requests_total', 'HTTP requests by method, route and status', ('method', 'route', 'status')
+)
+REQUEST_SECONDS = metrics_registry.histogram(
+    'http_request_duration_seconds', 'Time to produce HTTP responses, by method and route', ('method', 'route')
+)
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    if profiler.enabled:
+        g.profile_token = profiler.begin()
+
+@app.after_request
+def record_request_metrics(response):
+    route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    started = g.pop('request_started', None)
+    if started is not None:
+        # Streamed bodies (reports, events) are timed up to their first byte only
+        REQUEST_SECONDS.labels(request.method, route).observe(time.perf_counter() - started)
+    REQUESTS.labels(request.method, route, response.status_code).inc()
+    
+    profile_token = g.pop('profile_token', None)
+    if profile_token is not None:
+        path = profiler.end(profile_token, f"{request.method} {route}")
+        if path is not None:
+            response.headers['X-Profile-File'] = os.path.basename(path)
+    return response
+
+# Processes started by multiprocessing re-import their parent's __main__, and
+# with it this module, while they are still "inheriting" from the parent; the
+# startup below (model, layers, background tasks) belongs to server processes only
+SERVER_PROCESS = (multiprocessing.parent_process() is None
+                  and not getattr(multiprocessing.current_process(), '_inheriting', False))
+
+# Load the prediction model once per worker instead of once per request
+if SERVER_PROCESS:
+    try:
+        model_registry.preload()
+    except Exception as e:
+        app.logger.error(f"ML model preload failed: {str(e)}")
+
+# Precomputed model output on a global grid; /api/ml-predict answers from it
+risk_raster = RiskRaster()
+
+# Set to 0 to always run the live model and never build the raster
+RISK_RASTER_ENABLED = os.environ.get("RISK_RASTER_ENABLED", "1") != "0"
+
+def ensure_risk_raster():
+    """Build the risk raster in the background if it is missing or from another model version"""
+    if not RISK_RASTER_ENABLED:
+        return
+    try:
+        model_registry.get()
+        if not risk_raster.is_current(model_registry.model_version):
+            risk_raster.rebuild_async(model_registry.factory, model_registry.model_version)
+    except Exception as e:
+        app.logger.error(f"Risk raster check failed: {str(e)}")
+
+# Tiles up to this zoom are rendered into the tile cache at startup (-1 disables)
+TILE_PRERENDER_ZOOM = int(os.environ.get("TILE_PRERENDER_ZOOM", -1))
+
+# Browser/CDN cache lifetime of vector tiles, in seconds
+TILE_MAX_AGE = int(os.environ.get("TILE_MAX_AGE", 300))
+
+def prerender_tiles():
+    """Fill the tile cache with the low-zoom tiles of every layer"""
+    try:
+        count = geojson_utils.tiles.prerender(DISASTER_TYPES, TILE_PRERENDER_ZOOM)
+        app.logger.info(f"Pre-rendered {count} vector tiles")
+    except Exception as e:
+        app.logger.error(f"Tile pre-rendering failed: {str(e)}")
+
+# Re-scores saved locations in the background so bookmark risk is read, not computed
+risk_watcher = BookmarkRiskWatcher(bookmark_store, model_registry, geojson_utils.get_layer, DISASTER_TYPES)
+
+# Every worker's watcher relays the stored passes' changes to its own SSE clients
+risk_watcher.add_listener(lambda changes: event_hub.publish('bookmark-risk', {'changes': changes}))
+
+# Reloads changed layer files in the background and swaps them in atomically
+layer_watcher = LayerWatcher(geojson_utils)
+
+# Analytics as last pushed to SSE clients, so only deltas go out
+_published_analytics = None
+
+def publish_layer_change(disaster_type, old_layer, new_layer):
+    """Push a swapped layer version and the resulting analytics delta to SSE clients"""
+    global _published_analytics
+    event_hub.publish('layer', {
+        'disaster_type': disaster_type,
+        'version': new_layer.body.etag.strip('"') if new_layer is not None else None,
+        'features': new_layer.columns.size if new_layer is not None else 0
+    })
+    
+    snapshot = geojson_utils.get_disaster_analytics()
+    if _published_analytics is not None:
+        delta = analytics_delta(_published_analytics, snapshot)
+        if delta:
+            event_hub.publish('analytics', delta)
+    _published_analytics = snapshot
+    
+    # Nearby incident counts of bookmarks depend on the layers
+    risk_watcher.trigger()
+
+layer_watcher.add_listener(publish_layer_change)
+
+# Layers are built at import, like the model above, so that under gunicorn's
+# preload_app the master loads them once and forked workers share them
+# copy-on-write instead of each parsing and indexing its own copy
+if SERVER_PROCESS:
+    layer_watcher.load()
+    _published_analytics = geojson_utils.get_disaster_analytics()
+
+# Process that started the background threads; threads do not survive a fork
+_background_pid = None
+
+def start_background_tasks():
+    """Start this process's background threads; safe to call again, e.g. after a fork"""
+    global _background_pid
+    if _background_pid == os.getpid():
+        return
+    _background_pid = os.getpid()
+    
+    layer_watcher.start()
+    risk_watcher.start()
+    ensure_risk_raster()
+    if TILE_PRERENDER_ZOOM >= 0:
+        # In the background so startup is not held up by rendering
+        threading.Thread(target=prerender_tiles, name='tile-prerender', daemon=True).start()
+
+# Upper bound on coordinates scored by one batch prediction request
+MAX_BATCH_POINTS = int(os.environ.get("MAX_BATCH_POINTS", 200000))
+
+# Upper bound on points per weather batch request
+MAX_WEATHER_BATCH_POINTS = int(os.environ.get("MAX_WEATHER_BATCH_POINTS", 50))
+
+# Feature properties accepted as filters on /api/disaster-data
+LAYER_FILTER_KEYS = ('severity', 'risk_level', 'country', 'city', 'id')
+
+# Query parameters that switch /api/disaster-data from the full layer to a viewport query
+LAYER_QUERY_PARAMS = ('bbox', 'zoom', 'limit', 'cursor', 'cluster') + LAYER_FILTER_KEYS
 
 @app.route('/')
 def dashboard():
@@ -30,31 +189,92 @@ def dashboard():
 def get_weather(lat, lon):
     """Get weather data for specific coordinates"""
     try:
-        weather_data = weather_api.get_weather(float(lat), float(lon))
+        weather_data = weather_service.get_weather(float(lat), float(lon))
         return jsonify(weather_data)
     except Exception as e:
         app.logger.error(f"Weather API error: {str(e)}")
         return jsonify({'error': 'Failed to fetch weather data'}), 500
 
+@app.route('/api/weather/batch', methods=['POST'])
+def get_weather_batch():
+    """Get current weather and forecasts for several coordinates at once"""
+    data = request.get_json(silent=True) or {}
+    try:
+        points = [(float(point[0]), float(point[1])) for point in data.get('points', [])]
+    except (TypeError, ValueError, IndexError, KeyError):
+        return jsonify({'error': 'Invalid coordinates'}), 400
+    
+    if not points or len(points) > MAX_WEATHER_BATCH_POINTS:
+        return jsonify({'error': f'Expected 1 to {MAX_WEATHER_BATCH_POINTS} points'}), 400
+    
+    try:
+        include_forecast = bool(data.get('include_forecast', True))
+        return jsonify(weather_service.get_conditions_many(points, include_forecast))
+    except Exception as e:
+        app.logger.error(f"Weather batch error: {str(e)}")
+        return jsonify({'error': 'Failed to fetch weather data'}), 500
+
 @app.route('/api/disaster-data/<disaster_type>')
 def get_disaster_data(disaster_type):
-    """Get disaster data for specific type"""
+    """Get disaster data for specific type, optionally limited to a viewport"""
     try:
-        valid_types = ['flood', 'wildfire', 'drought', 'earthquake']
-        if disaster_type not in valid_types:
+        if disaster_type not in DISASTER_TYPES:
             return jsonify({'error': 'Invalid disaster type'}), 400
         
-        data = geojson_utils.load_disaster_data(disaster_type)
-        return jsonify(data)
+        if not any(param in request.args for param in LAYER_QUERY_PARAMS):
+            return send_body(geojson_utils.load_disaster_body(disaster_type))
+        
+        try:
+            bbox = None
+            if request.args.get('bbox'):
+                bbox = tuple(float(v) for v in request.args['bbox'].split(','))
+                if len(bbox) != 4:
+                    raise ValueError('bbox needs 4 values')
+            zoom = int(request.args['zoom']) if 'zoom' in request.args else None
+            limit = min(max(int(request.args.get('limit', DEFAULT_PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+            cursor = int(request.args.get('cursor', 0))
+        except ValueError:
+            return jsonify({'error': 'Invalid bbox, zoom, limit or cursor'}), 400
+        
+        filters = {key: request.args[key].split(',') for key in LAYER_FILTER_KEYS if request.args.get(key)}
+        cluster = request.args.get('cluster', '0').lower() in ('1', 'true', 'yes')
+        
+        def encode_query():
+            result = geojson_utils.query_layer(disaster_type, bbox=bbox, filters=filters, limit=limit,
+                                               cursor=cursor, zoom=zoom, cluster=cluster)
+            return json.dumps(result, separators=(',', ':')).encode('utf-8')
+        
+        # Same layer version and query give the same page, so revalidation skips the query
+        layer = geojson_utils.get_layer(disaster_type)
+        version = layer.version if layer is not None else (disaster_type, 'empty')
+        etag = make_etag(*version, sorted(request.args.items(multi=True)))
+        return send_body(EncodedBody(encode_query, etag, layer.mtime_ns / 1e9 if layer is not None else None))
     except Exception as e:
         app.logger.error(f"Disaster data error: {str(e)}")
         return jsonify({'error': 'Failed to load disaster data'}), 500
 
+@app.route('/api/tiles/<disaster_type>/<int:z>/<int:x>/<int:y>')
+def get_disaster_tile(disaster_type, z, x, y):
+    """Get one vector tile of a disaster layer"""
+    try:
+        if disaster_type not in DISASTER_TYPES:
+            return jsonify({'error': 'Invalid disaster type'}), 400
+        
+        tile = geojson_utils.tiles.get_tile(disaster_type, z, x, y)
+        response = Response(tile, mimetype='application/json')
+        response.headers['Cache-Control'] = f'public, max-age={TILE_MAX_AGE}'
+        return response
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        app.logger.error(f"Tile error: {str(e)}")
+        return jsonify({'error': 'Failed to render tile'}), 500
+
 @app.route('/api/search/<city_name>')
 def search_city(city_name):
     """Search for city coordinates"""
     try:
-        coordinates = weather_api.get_city_coordinates(city_name)
+        coordinates = weather_service.get_city_coordinates(city_name)
         return jsonify(coordinates)
     except Exception as e:
         app.logger.error(f"City search error: {str(e)}")
@@ -64,23 +284,87 @@ def search_city(city_name):
 def handle_bookmarks():
     """Handle bookmark operations"""
     if request.method == 'GET':
-        return jsonify(bookmarks)
+        try:
+            limit = int(request.args.get('limit', BOOKMARK_PAGE_SIZE))
+            cursor = int(request.args.get('cursor', 0))
+        except ValueError:
+            return jsonify({'error': 'Invalid limit or cursor'}), 400
+        
+        try:
+            page, next_cursor = bookmark_store.list(limit, cursor)
+            response = jsonify(page)
+            # Pagination travels in headers so the body stays a plain list
+            response.headers['X-Total-Count'] = str(bookmark_store.count())
+            if next_cursor is not None:
+                response.headers['X-Next-Cursor'] = str(next_cursor)
+            return response
+        except Exception as e:
+            app.logger.error(f"Bookmark list error: {str(e)}")
+            return jsonify({'error': 'Failed to load bookmarks'}), 500
     
     elif request.method == 'POST':
-        data = request.get_json()
-        bookmark = {
-            'id': len(bookmarks) + 1,
-            'name': data.get('name'),
-            'lat': data.get('lat'),
-            'lon': data.get('lon'),
-            'timestamp': datetime.now().isoformat()
-        }
-        bookmarks.append(bookmark)
-        return jsonify(bookmark)
+        data = request.get_json(silent=True) or {}
+        try:
+            lat = float(data.get('lat'))
+            lon = float(data.get('lon'))
+        except (TypeError, ValueError):
+            return jsonify({'error': 'Invalid coordinates'}), 400
+        name = data.get('name')
+        if not -90 <= lat <= 90 or not -180 <= lon <= 180:
+            return jsonify({'error': 'Invalid coordinates'}), 400
+        if name is not None and (not isinstance(name, str) or len(name) > MAX_NAME_LENGTH):
+            return jsonify({'error': f'Name must be a string of at most {MAX_NAME_LENGTH} characters'}), 400
+        
+        try:
+            bookmark = bookmark_store.add(name, lat, lon)
+            # Score the new bookmark now rather than at the next interval
+            risk_watcher.trigger()
+            return jsonify(bookmark)
+        except Exception as e:
+            app.logger.error(f"Bookmark save error: {str(e)}")
+            return jsonify({'error': 'Failed to save bookmark'}), 500
+
+@app.route('/api/bookmarks/near')
+def get_nearby_bookmarks():
+    """Get bookmarks within a radius of a point, nearest first"""
+    try:
+        lat = float(request.args['lat'])
+        lon = float(request.args['lon'])
+        radius = float(request.args.get('radius', 50))  # km
+        limit = int(request.args.get('limit', BOOKMARK_PAGE_SIZE))
+    except (KeyError, ValueError):
+        return jsonify({'error': 'lat and lon are required; radius and limit must be numbers'}), 400
+    
+    try:
+        return jsonify(bookmark_store.near(lat, lon, radius, limit))
+    except Exception as e:
+        app.logger.error(f"Nearby bookmarks error: {str(e)}")
+        return jsonify({'error': 'Failed to search bookmarks'}), 500
+
+@app.route('/api/bookmarks/risk')
+def get_bookmark_risk():
+    """Get the precomputed risk of saved bookmarks"""
+    try:
+        ids = [int(i) for i in request.args['ids'].split(',')] if request.args.get('ids') else None
+    except ValueError:
+        return jsonify({'error': 'ids must be comma-separated integers'}), 400
+    
+    results = risk_watcher.results()
+    if ids is None:
+        assessments = list(results.values())
+        pending = []
+    else:
+        assessments = [results[i] for i in ids if i in results]
+        pending = [i for i in ids if i not in results]
+    return jsonify({
+        'bookmarks': assessments,
+        'pending': pending,
+        'watcher': risk_watcher.status()
+    })
 
 @app.route('/api/download-report')
 def download_report():
-    """Download disaster report for selected region"""
+    """Download disaster report for selected region, streamed as it is generated"""
     try:
         # Get parameters from request
         disaster_type = request.args.get('type', 'flood')
@@ -89,39 +373,36 @@ def download_report():
         lon = float(request.args.get('lon', 0))
         radius = float(request.args.get('radius', 10))  # km
         
-        # Generate report data
-        report_data = geojson_utils.generate_report(disaster_type, lat, lon, radius)
+        # 'global' exports every disaster layer in one file
+        report_types = DISASTER_TYPES if disaster_type == 'global' else [disaster_type]
         
-        if format_type == 'csv':
-            # Convert to CSV
-            df = pd.DataFrame(report_data['features'])
-            csv_buffer = StringIO()
-            df.to_csv(csv_buffer, index=False)
-            csv_buffer.seek(0)
-            
-            # Create downloadable file
-            output = BytesIO()
-            output.write(csv_buffer.getvalue().encode('utf-8'))
-            output.seek(0)
-            
-            return send_file(
-                output,
-                mimetype='text/csv',
-                as_attachment=True,
-                download_name=f'{disaster_type}_report_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
-            )
+        # Locate matches up front (positions only); features are materialized while streaming
+        sections = []
+        total_features = 0
+        for report_type in report_types:
+            layer, positions, distances = geojson_utils.find_within_radius(report_type, lat, lon, radius)
+            if layer is None:
+                continue
+            features = geojson_utils.iter_report_features(layer, positions, distances)
+            sections.append((report_type, layer.columns.property_keys, features))
+            total_features += len(positions)
         
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        if format_type == 'csv':
+            body = stream_csv(sections)
+            mimetype = 'text/csv'
+            filename = f'{disaster_type}_report_{timestamp}.csv'
         else:  # geojson
-            output = BytesIO()
-            output.write(json.dumps(report_data, indent=2).encode('utf-8'))
-            output.seek(0)
-            
-            return send_file(
-                output,
-                mimetype='application/geo+json',
-                as_attachment=True,
-                download_name=f'{disaster_type}_report_{datetime.now().strftime("%Y%m%d_%H%M%S")}.geojson'
-            )
+            metadata = geojson_utils.report_metadata(disaster_type, lat, lon, radius, total_features)
+            body = stream_geojson(metadata, sections, tag_disaster_type=disaster_type == 'global')
+            mimetype = 'application/geo+json'
+            filename = f'{disaster_type}_report_{timestamp}.geojson'
+        
+        return Response(
+            stream_with_context(body),
+            mimetype=mimetype,
+            headers={'Content-Disposition': f'attachment; filename={filename}'}
+        )
             
     except Exception as e:
         app.logger.error(f"Report generation error: {str(e)}")
@@ -131,28 +412,182 @@ def download_report():
 def ml_predict():
     """ML disaster prediction endpoint"""
     try:
-        from ml_model.predict_disaster import DisasterPredictor
-        
         lat = float(request.args.get('lat', 0))
         lon = float(request.args.get('lon', 0))
         
-        predictor = DisasterPredictor()
-        prediction = predictor.predict_risk(lat, lon)
+        predictor = model_registry.get()
+        # exact=1 skips the raster and runs the model at this exact point
+        if RISK_RASTER_ENABLED and request.args.get('exact', '0').lower() not in ('1', 'true', 'yes'):
+            prediction = risk_raster.lookup(lat, lon, model_registry.model_version)
+            if prediction is not None:
+                return jsonify(prediction)
         
+        prediction = predictor.predict_risk(lat, lon)
+        prediction['source'] = 'model'
         return jsonify(prediction)
     except Exception as e:
         app.logger.error(f"ML prediction error: {str(e)}")
         return jsonify({'error': 'ML prediction unavailable', 'risk_level': 'unknown'}), 500
 
+@app.route('/api/ml-predict/batch', methods=['POST'])
+def ml_predict_batch():
+    """Batch ML disaster prediction endpoint"""
+    data = request.get_json(silent=True) or {}
+    try:
+        if 'points' in data:
+            points = data['points']
+            lats = [float(point[0]) for point in points]
+            lons = [float(point[1]) for point in points]
+        else:
+            lats = [float(lat) for lat in data.get('lats', [])]
+            lons = [float(lon) for lon in data.get('lons', [])]
+    except (TypeError, ValueError, IndexError, KeyError):
+        return jsonify({'error': 'Invalid coordinates'}), 400
+    
+    if not lats or len(lats) != len(lons):
+        return jsonify({'error': 'Expected matching, non-empty lists of coordinates'}), 400
+    if len(lats) > MAX_BATCH_POINTS:
+        return jsonify({'error': f'At most {MAX_BATCH_POINTS} points per request'}), 400
+    
+    try:
+        predictor = model_registry.get()
+        predictions = predictor.predict_risk_batch(lats, lons)
+        
+        return jsonify(predictions)
+    except Exception as e:
+        app.logger.error(f"ML batch prediction error: {str(e)}")
+        return jsonify({'error': 'ML prediction unavailable'}), 500
+
+@app.route('/api/ml-model', methods=['GET'])
+def ml_model_status():
+    """Report the active ML model version"""
+    return jsonify({**model_registry.status(), 'risk_raster': risk_raster.status()})
+
+@app.route('/api/ml-model/reload', methods=['POST'])
+def ml_model_reload():
+    """Hot-reload the ML model; requires the ADMIN_TOKEN header when configured"""
+    admin_token = os.environ.get("ADMIN_TOKEN")
+    if not admin_token or request.headers.get('X-Admin-Token') != admin_token:
+        return jsonify({'error': 'Forbidden'}), 403
+    
+    try:
+        model_registry.reload()
+        # Bookmark risk and the raster were computed by the previous model; the
+        # raster stops answering as soon as the model's fingerprint differs
+        risk_watcher.trigger()
+        ensure_risk_raster()
+        return jsonify(model_registry.status())
+    except Exception as e:
+        app.logger.error(f"ML model reload error: {str(e)}")
+        return jsonify({'error': 'Model reload failed', **model_registry.status()}), 500
+
+@app.route('/api/ml-features/prefetch', methods=['POST'])
+def ml_features_prefetch():
+    """Extract and store the features of every geohash cell in a bbox; requires the ADMIN_TOKEN header"""
+    admin_token = os.environ.get("ADMIN_TOKEN")
+    if not admin_token or request.headers.get('X-Admin-Token') != admin_token:
+        return jsonify({'error': 'Forbidden'}), 403
+    
+    data = request.get_json(silent=True) or {}
+    try:
+        bbox = tuple(float(v) for v in data['bbox'])
+        if len(bbox) != 4:
+            raise ValueError('bbox needs 4 values')
+        date_range = int(data.get('date_range', 30))
+    except (KeyError, TypeError, ValueError):
+        return jsonify({'error': 'Invalid bbox or date_range'}), 400
+    
+    try:
+        return jsonify(model_registry.get().prefetch_features(bbox, date_range))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        app.logger.error(f"Feature prefetch error: {str(e)}")
+        return jsonify({'error': 'Feature prefetch failed'}), 500
+
+@app.route('/api/cache-stats')
+def get_cache_stats():
+    """Hit/miss counters of the in-process caches"""
+    return jsonify({
+        'weather': weather_service.cache_stats(),
+        'layers': layer_cache.stats(),
+        'tiles': tile_cache.stats(),
+        'features': feature_store.status(),
+        'events': event_hub.stats(),
+        'layer_watcher': layer_watcher.status()
+    })
+
+metrics_registry.gauge('layer_cache_bytes', 'Bytes held by the disaster layer cache',
+                       lambda: layer_cache.stats()['bytes'])
+metrics_registry.gauge('tile_cache_bytes', 'Bytes held by the vector tile cache',
+                       lambda: tile_cache.stats()['bytes'])
+metrics_registry.gauge('weather_cache_entries', 'Entries in the weather response cache',
+                       lambda: weather_service.cache_stats()['entries'])
+metrics_registry.gauge('event_subscribers', 'Open Server-Sent Events streams',
+                       lambda: event_hub.stats()['subscribers'])
+
+@app.route('/metrics')
+def get_metrics():
+    """Request, GeoJSON, weather and ML metrics in the Prometheus text format"""
+    return Response(metrics_registry.render(), content_type=METRICS_CONTENT_TYPE)
+
+@app.route('/api/profiler', methods=['GET', 'POST'])
+def profiler_settings():
+    """Report or toggle the per-request sampling profiler; changes require the ADMIN_TOKEN header"""
+    if request.method == 'POST':
+        admin_token = os.environ.get("ADMIN_TOKEN")
+        if not admin_token or request.headers.get('X-Admin-Token') != admin_token:
+            return jsonify({'error': 'Forbidden'}), 403
+        
+        data = request.get_json(silent=True) or {}
+        try:
+            sample_rate = float(data['sample_rate']) if 'sample_rate' in data else None
+        except (TypeError, ValueError):
+            return jsonify({'error': 'Invalid sample_rate'}), 400
+        enabled = bool(data['enabled']) if 'enabled' in data else None
+        profiler.configure(enabled=enabled, sample_rate=sample_rate)
+    return jsonify(profiler.status())
+
+@app.route('/api/events')
+def stream_events():
+    """Server-Sent Events: layer versions, analytics deltas and bookmark risk changes"""
+    try:
+        last_event_id = int(request.headers.get('Last-Event-ID') or request.args.get('last_event_id'))
+    except (TypeError, ValueError):
+        last_event_id = None
+    
+    response = Response(event_hub.stream(last_event_id), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # Stop reverse proxies from buffering the stream
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route('/api/events/state')
+def get_event_state():
+    """Current layer versions and bookmark risk pass, polled by clients the event stream turned away"""
+    layers = {}
+    for disaster_type in DISASTER_TYPES:
+        layer = geojson_utils.get_layer(disaster_type)
+        layers[disaster_type] = layer.body.etag.strip('"') if layer is not None else None
+    latest_risk_run = bookmark_store.latest_risk_run()
+    return jsonify({
+        'layers': layers,
+        'bookmark_risk_run': latest_risk_run['id'] if latest_risk_run is not None else None
+    })
+
 @app.route('/api/analytics')
 def get_analytics():
     """Get disaster analytics data"""
     try:
-        analytics_data = geojson_utils.get_disaster_analytics()
-        return jsonify(analytics_data)
+        return send_body(geojson_utils.get_analytics_body())
     except Exception as e:
         app.logger.error(f"Analytics error: {str(e)}")
         return jsonify({'error': 'Failed to load analytics'}), 500
 
+if SERVER_PROCESS and os.environ.get("BACKGROUND_TASKS", "1") != "0":
+    start_background_tasks()
+
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    # Development server only; production runs under gunicorn (see gunicorn.conf.py)
+    app.run(host=os.environ.get("HOST", "0.0.0.0"), port=int(os.environ.get("PORT", 5000)),
+            debug=os.environ.get("FLASK_DEBUG", "false").lower() == "true")
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+DisasterMap AI - Bookmark Store Benchmark
+Hammers BookmarkStore with thousands of concurrent writers spread over
+several processes (like gunicorn workers), then checks that no write was
+lost, every ID is unique, and times radius lookups on the result.
+
+Usage:
+    python -m benchmarks.bookmark_writers
+    python -m benchmarks.bookmark_writers --processes 8 --threads 500 --writes 4
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bookmark_store import BookmarkStore  # noqa: E402
+
+
+def _worker(path: str, worker: int, threads: int, writes: int, results):
+    """One process: `threads` writer threads sharing one store, each saving `writes` bookmarks"""
+    store = BookmarkStore(path)
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    start = threading.Barrier(threads)
+
+    def writer(thread: int):
+        rng = random.Random(worker * 100003 + thread)
+        start.wait()
+        for i in range(writes):
+            began = time.perf_counter()
+            try:
+                store.add(f"bench-{worker}-{thread}-{i}", rng.uniform(-90, 90), rng.uniform(-180, 180))
+            except Exception as e:
+                with lock:
+                    errors.append(str(e))
+                continue
+            elapsed = time.perf_counter() - began
+            with lock:
+                latencies.append(elapsed)
+
+    pool = [threading.Thread(target=writer, args=(t,)) for t in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    results.put((latencies, errors))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent-writer benchmark for the bookmark store")
+    parser.add_argument('--processes', type=int, default=4, help="Writer processes (default: 4)")
+    parser.add_argument('--threads', type=int, default=500, help="Writer threads per process (default: 500)")
+    parser.add_argument('--writes', type=int, default=5, help="Bookmarks saved per thread (default: 5)")
+    parser.add_argument('--queries', type=int, default=200, help="Radius lookups timed afterwards (default: 200)")
+    args = parser.parse_args()
+
+    writers = args.processes * args.threads
+    expected = writers * args.writes
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bookmarks.db')
+        store = BookmarkStore(path)
+        store.count()  # Create the schema before the writers race
+
+        results = multiprocessing.Queue()
+        began = time.perf_counter()
+        processes = [
+            multiprocessing.Process(target=_worker, args=(path, w, args.threads, args.writes, results))
+            for w in range(args.processes)
+        ]
+        for process in processes:
+            process.start()
+        outcomes = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+        elapsed = time.perf_counter() - began
+
+        latencies = np.array([l for outcome in outcomes for l in outcome[0]])
+        errors = [e for outcome in outcomes for e in outcome[1]]
+        ids = [row[0] for row in store._connection().execute('SELECT id FROM bookmarks')]
+
+        print(f"Writers: {writers} ({args.processes} processes x {args.threads} threads), "
+              f"R*Tree: {'yes' if store.has_rtree else 'no'}")
+        print(f"Saved {len(ids):,} of {expected:,} bookmarks in {elapsed:.2f}s "
+              f"({len(latencies) / elapsed:,.0f} writes/s)")
+        if len(latencies):
+            print(f"Write latency: p50 {np.percentile(latencies, 50) * 1000:.1f} ms, "
+                  f"p99 {np.percentile(latencies, 99) * 1000:.1f} ms")
+        print(f"Errors: {len(errors)}" + (f" (first: {errors[0]})" if errors else ""))
+
+        rng = random.Random(0)
+        timings = []
+        found = 0
+        for _ in range(args.queries):
+            began = time.perf_counter()
+            found += len(store.near(rng.uniform(-60, 60), rng.uniform(-180, 180), 500, limit=1000))
+            timings.append(time.perf_counter() - began)
+        if timings:
+            print(f"Radius lookups (500 km): p50 {np.percentile(timings, 50) * 1000:.2f} ms, "
+                  f"p99 {np.percentile(timings, 99) * 1000:.2f} ms, {found / len(timings):.1f} hits avg")
+
+        ok = not errors and len(ids) == expected and len(set(ids)) == len(ids)
+        print("✅ No lost writes, IDs unique" if ok else "❌ Lost writes or duplicate IDs")
+        sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+DisasterMap AI - Serving Load Test
+Starts gunicorn with gunicorn.conf.py at increasing worker counts and drives
+each with concurrent keep-alive clients over a mix of layer queries, vector
+tiles, analytics and model predictions, to show how throughput scales with
+cores. Clients run in their own processes on the same machine, so leave some
+cores for them or the numbers flatten early.
+
+Usage:
+    python -m benchmarks.load_test
+    python -m benchmarks.load_test --workers 1,2,4,8 --clients 32 --duration 20
+"""
+
+import argparse
+import http.client
+import multiprocessing
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Request mix; weather endpoints are left out so the upstream API is not measured
+PATHS = [
+    '/api/disaster-data/flood',
+    '/api/disaster-data/wildfire?bbox=-130,20,-60,55&risk_level=high,medium',
+    '/api/disaster-data/earthquake?zoom=3&cluster=1',
+    '/api/tiles/flood/2/1/1',
+    '/api/tiles/earthquake/4/3/6',
+    '/api/analytics',
+    '/api/ml-predict?lat={lat}&lon={lon}',
+]
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _start_server(workers: int, threads: int, port: int) -> subprocess.Popen:
+    env = dict(os.environ, WEB_CONCURRENCY=str(workers), GUNICORN_THREADS=str(threads),
+               HOST='127.0.0.1', PORT=str(port), LOG_LEVEL='warning', BACKGROUND_TASKS='0')
+    server = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'app:app'],
+                              cwd=ROOT, env=env)
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with status {server.returncode}")
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=2)
+            conn.request('GET', '/api/cache-stats')
+            conn.getresponse().read()
+            conn.close()
+            # The first answer comes from one worker; give the rest a moment
+            time.sleep(1)
+            return server
+        except OSError:
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError("gunicorn did not start within 60s")
+
+
+def _client(port: int, duration: float, seed: int, results):
+    """One keep-alive client issuing requests back to back until the deadline"""
+    rng = random.Random(seed)
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        path = rng.choice(PATHS).format(lat=rng.uniform(-60, 60), lon=rng.uniform(-180, 180))
+        began = time.perf_counter()
+        try:
+            conn.request('GET', path, headers={'Accept-Encoding': 'gzip'})
+            response = conn.getresponse()
+            response.read()
+            if response.status != 200:
+                errors += 1
+                continue
+        except (OSError, http.client.HTTPException):
+            errors += 1
+            conn.close()
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+            continue
+        latencies.append(time.perf_counter() - began)
+    conn.close()
+    results.put((latencies, errors))
+
+
+def run(workers: int, threads: int, clients: int, duration: float) -> dict:
+    port = _free_port()
+    server = _start_server(workers, threads, port)
+    try:
+        results = multiprocessing.Queue()
+        processes = [multiprocessing.Process(target=_client, args=(port, duration, seed, results))
+                     for seed in range(clients)]
+        for process in processes:
+            process.start()
+        outcomes = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+    latencies = np.array([l for outcome in outcomes for l in outcome[0]])
+    return {
+        'workers': workers,
+        'requests': len(latencies),
+        'errors': sum(outcome[1] for outcome in outcomes),
+        'throughput': len(latencies) / duration,
+        'p50_ms': float(np.percentile(latencies, 50) * 1000) if len(latencies) else None,
+        'p99_ms': float(np.percentile(latencies, 99) * 1000) if len(latencies) else None,
+    }
+
+
+def main():
+    cores = multiprocessing.cpu_count()
+    default_workers = sorted({1, 2, 4, cores} & set(range(1, cores + 1)))
+    parser = argparse.ArgumentParser(description="Throughput of the gunicorn profile across worker counts")
+    parser.add_argument('--workers', default=','.join(map(str, default_workers)),
+                        help=f"Comma-separated worker counts (default: {','.join(map(str, default_workers))})")
+    parser.add_argument('--threads', type=int, default=4, help="Threads per worker (default: 4)")
+    parser.add_argument('--clients', type=int, default=max(8, 4 * cores),
+                        help=f"Concurrent client processes (default: {max(8, 4 * cores)})")
+    parser.add_argument('--duration', type=float, default=10, help="Seconds per run (default: 10)")
+    args = parser.parse_args()
+
+    print(f"Cores: {cores}, clients: {args.clients}, threads per worker: {args.threads}, "
+          f"{args.duration:.0f}s per run")
+    print(f"{'workers':>7} {'req/s':>9} {'speedup':>8} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    baseline = None
+    for workers in [int(w) for w in args.workers.split(',')]:
+        result = run(workers, args.threads, args.clients, args.duration)
+        baseline = baseline or result['throughput']
+        speedup = result['throughput'] / baseline if baseline else 0
+        p50 = f"{result['p50_ms']:.1f}" if result['p50_ms'] is not None else '-'
+        p99 = f"{result['p99_ms']:.1f}" if result['p99_ms'] is not None else '-'
+        print(f"{workers:>7} {result['throughput']:>9,.0f} {speedup:>7.2f}x {p50:>8} {p99:>8} "
+              f"{result['errors']:>7}")
+
+
+if __name__ == "__main__":
+    main()
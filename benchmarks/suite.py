@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+DisasterMap AI - Benchmark Suite
+Generates seeded synthetic layers at each size, then times the layer, report,
+analytics and prediction paths, directly and through the Flask endpoints.
+Each size runs in a fresh interpreter so its peak RSS is its own. Results are
+saved as JSON, one file per commit by default, and can be compared with an
+earlier run.
+
+Usage:
+    python -m benchmarks.suite
+    python -m benchmarks.suite --sizes 1000,10000 --budget 1
+    python -m benchmarks.suite --compare benchmarks/results/1c03daa.json
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.synthetic import DEFAULT_SEED, LAYER_SPECS, write_layers  # noqa: E402
+from utils import DISASTER_TYPES  # noqa: E402
+
+DEFAULT_SIZES = (1000, 10000, 100000, 1000000)
+
+# Radius of the report benchmarks, in km
+REPORT_RADIUS_KM = 200
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process so far"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def measure(fn: Callable[[], object], budget_s: float, min_iterations: int = 3,
+            max_iterations: int = 100000, warmup: int = 1) -> Dict:
+    """Call fn repeatedly for about budget_s seconds; latency percentiles and throughput"""
+    for _ in range(warmup):
+        fn()
+    latencies = []
+    began = time.perf_counter()
+    while len(latencies) < max_iterations and (len(latencies) < min_iterations
+                                               or time.perf_counter() - began < budget_s):
+        started = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - started)
+    latencies = np.array(latencies)
+    return {
+        'iterations': len(latencies),
+        'throughput_per_s': round(len(latencies) / latencies.sum(), 3),
+        'mean_ms': round(float(latencies.mean()) * 1000, 4),
+        'p50_ms': round(float(np.percentile(latencies, 50)) * 1000, 4),
+        'p99_ms': round(float(np.percentile(latencies, 99)) * 1000, 4),
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def _report_centers(disaster_type: str, seed: int) -> Callable[[], tuple]:
+    """Seeded report centers near the layer's hotspots, so reports find features"""
+    rng = random.Random(seed)
+    hotspots = LAYER_SPECS[disaster_type]['hotspots']
+
+    def center():
+        spot = rng.choice(hotspots)
+        return spot[2] + rng.uniform(-1, 1), spot[3] + rng.uniform(-1, 1)
+    return center
+
+
+def run_size(workdir: str, layer: str, size: int, seed: int, budget_s: float) -> Dict:
+    """Every benchmark at one layer size; runs inside workdir, whose data/ holds the layers"""
+    os.chdir(workdir)
+    os.environ['BACKGROUND_TASKS'] = '0'
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    os.environ['BOOKMARK_DB_PATH'] = os.path.join(workdir, 'bookmarks.db')
+
+    from ml_model.predict_disaster import DisasterPredictor
+    from utils import GeoJSONUtils, LayerCache
+
+    results = {}
+    # A new cache every call: file parse, column and index build, then materialization
+    results['load_disaster_data_cold'] = measure(
+        lambda: GeoJSONUtils(cache=LayerCache()).load_disaster_data(layer),
+        budget_s, min_iterations=1, max_iterations=20, warmup=0
+    )
+    # The same, serialized instead of materialized
+    results['load_disaster_payload_cold'] = measure(
+        lambda: GeoJSONUtils(cache=LayerCache()).load_disaster_payload(layer),
+        budget_s, min_iterations=1, max_iterations=20, warmup=0
+    )
+
+    geojson_utils = GeoJSONUtils(cache=LayerCache())
+    results['load_disaster_data'] = measure(lambda: geojson_utils.load_disaster_data(layer), budget_s)
+    results['load_disaster_body'] = measure(lambda: geojson_utils.load_disaster_body(layer), budget_s)
+
+    center = _report_centers(layer, seed)
+    results['generate_report'] = measure(
+        lambda: geojson_utils.generate_report(layer, *center(), REPORT_RADIUS_KM), budget_s
+    )
+
+    results['get_disaster_analytics'] = measure(geojson_utils.get_disaster_analytics, budget_s)
+    # A new engine has to fold every layer's aggregates again, as after a layer swap
+    results['get_disaster_analytics_rebuild'] = measure(
+        lambda: GeoJSONUtils(cache=geojson_utils.cache).get_disaster_analytics(), budget_s
+    )
+
+    predictor = DisasterPredictor()
+    rng = random.Random(seed)
+    results['predict_risk'] = measure(
+        lambda: predictor.predict_risk(rng.uniform(-60, 60), rng.uniform(-180, 180)), budget_s
+    )
+
+    # Endpoints; importing the app loads every layer in data/
+    started = time.perf_counter()
+    import app as app_module
+    app_import_s = round(time.perf_counter() - started, 3)
+    client = app_module.app.test_client()
+
+    def get(url: str):
+        response = client.get(url)
+        # Consume streamed bodies so the whole response is timed
+        response.get_data()
+        if response.status_code != 200:
+            raise RuntimeError(f"GET {url}: {response.status_code}")
+
+    results['endpoint_layer'] = measure(lambda: get(f'/api/disaster-data/{layer}'), budget_s)
+    results['endpoint_layer_viewport'] = measure(
+        lambda: get(f'/api/disaster-data/{layer}?bbox=-130,20,-60,55&risk_level=high,medium&limit=2000'),
+        budget_s
+    )
+    results['endpoint_report'] = measure(
+        lambda: get('/api/download-report?type={}&lat={}&lon={}&radius={}&format=geojson'.format(
+            layer, *center(), REPORT_RADIUS_KM)), budget_s
+    )
+    results['endpoint_analytics'] = measure(lambda: get('/api/analytics'), budget_s)
+
+    return {
+        'size': size,
+        'app_import_s': app_import_s,
+        'peak_rss_mb': peak_rss_mb(),
+        'benchmarks': results,
+    }
+
+
+def _child(workdir: str, layer: str, size: int, seed: int, budget_s: float, queue):
+    try:
+        queue.put(run_size(workdir, layer, size, seed, budget_s))
+    except Exception as e:
+        queue.put({'size': size, 'error': f"{type(e).__name__}: {e}"})
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(result: Dict):
+    print(f"\n{result['size']:,} features (peak RSS {result['peak_rss_mb']:.0f} MB, "
+          f"app import {result['app_import_s']:.2f}s)")
+    print(f"  {'benchmark':<32} {'ops/s':>11} {'p50 ms':>10} {'p99 ms':>10} {'RSS MB':>8}")
+    for name, stats in result['benchmarks'].items():
+        print(f"  {name:<32} {stats['throughput_per_s']:>11,.1f} {stats['p50_ms']:>10.3f} "
+              f"{stats['p99_ms']:>10.3f} {stats['peak_rss_mb']:>8.0f}")
+
+
+def compare(baseline: Dict, current: Dict):
+    """Throughput and p99 changes of every benchmark present in both runs"""
+    before = {(r['size'], name): stats for r in baseline['results'] if 'benchmarks' in r
+              for name, stats in r['benchmarks'].items()}
+    print(f"\nCompared with {baseline['meta'].get('commit') or 'baseline'}:")
+    print(f"  {'size':>9} {'benchmark':<32} {'ops/s':>9} {'p99':>9}")
+    for result in current['results']:
+        for name, stats in result.get('benchmarks', {}).items():
+            old = before.get((result['size'], name))
+            if old is None:
+                continue
+            throughput = stats['throughput_per_s'] / old['throughput_per_s'] - 1
+            p99 = stats['p99_ms'] / old['p99_ms'] - 1 if old['p99_ms'] else 0
+            print(f"  {result['size']:>9,} {name:<32} {throughput:>+8.1%} {p99:>+8.1%}")
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="Benchmark DisasterMap AI on synthetic layers of growing size")
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)),
+                        help=f"Comma-separated feature counts (default: {','.join(map(str, DEFAULT_SIZES))})")
+    parser.add_argument('--layer', default='flood', choices=DISASTER_TYPES,
+                        help="Layer generated at each size and benchmarked (default: flood)")
+    parser.add_argument('--other-features', type=int, default=1000,
+                        help="Features in each of the other layers (default: 1000)")
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED, help=f"Random seed (default: {DEFAULT_SEED})")
+    parser.add_argument('--budget', type=float, default=2.0, help="Seconds per benchmark (default: 2)")
+    parser.add_argument('--output', help="Results file (default: benchmarks/results/<commit>.json)")
+    parser.add_argument('--compare', help="Earlier results file to compare with")
+    args = parser.parse_args(argv)
+
+    sizes = [int(size) for size in args.sizes.split(',')]
+    commit = _git_commit()
+    output = args.output or os.path.join(ROOT, 'benchmarks', 'results', f"{commit or 'results'}.json")
+    report = {
+        'meta': {
+            'commit': commit,
+            'timestamp': datetime.now().isoformat(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'seed': args.seed,
+            'layer': args.layer,
+            'other_features': args.other_features,
+            'budget_s': args.budget,
+        },
+        'results': [],
+    }
+
+    # A fresh interpreter per size, so peak RSS is not carried over from smaller runs
+    context = multiprocessing.get_context('spawn')
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            counts = {t: args.other_features for t in DISASTER_TYPES}
+            counts[args.layer] = size
+            began = time.perf_counter()
+            write_layers(os.path.join(tmp, 'data'), counts, args.seed)
+            print(f"Generated {size:,} {args.layer} features in {time.perf_counter() - began:.1f}s")
+
+            queue = context.Queue()
+            process = context.Process(target=_child, args=(tmp, args.layer, size, args.seed, args.budget, queue))
+            process.start()
+            result = queue.get()
+            process.join()
+            report['results'].append(result)
+            if 'error' in result:
+                print(f"❌ {size:,} features: {result['error']}")
+            else:
+                print_results(result)
+
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults saved to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+    sys.exit(1 if any('error' in result for result in report['results']) else 0)
+
+
+if __name__ == "__main__":
+    main()
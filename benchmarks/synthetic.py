@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+DisasterMap AI - Synthetic Layer Generator
+Writes seeded, realistic *_zones.geojson layers with the same property schema
+as the files shipped in data/. Features are scattered around real hotspots of
+each disaster type, so spatial queries and clustering behave as they would on
+real data. The same seed and size always produce byte-identical files.
+
+Usage:
+    python -m benchmarks.synthetic --features 100000 --out /tmp/disastermap/data
+    python -m benchmarks.synthetic --features 1000000 --types flood --seed 7 --out /tmp/big
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import date, timedelta
+from typing import Dict, Iterator, List, Sequence
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import DISASTER_TYPES  # noqa: E402
+
+DEFAULT_SEED = 42
+
+# Dates are spread over these two years, so the analytics trend has data in every month
+FIRST_DATE = date(2023, 1, 1)
+DATE_SPAN_DAYS = 730
+
+# Standard deviation of the scatter around each hotspot, in degrees
+SCATTER_DEG = 1.5
+
+# Per type: id prefix, severities from most to least severe with their risk
+# levels and weights, and hotspots as (city, country, lat, lon, description)
+LAYER_SPECS = {
+    'flood': {
+        'prefix': 'flood',
+        'severities': [('High', 'high', 0.25), ('Medium', 'medium', 0.45), ('Low', 'low', 0.30)],
+        'hotspots': [
+            ('New York', 'USA', 40.7128, -74.0060, 'Coastal flooding risk due to storm surge'),
+            ('Chicago', 'USA', 41.8781, -87.6298, 'Urban flooding from heavy rains'),
+            ('Paris', 'France', 48.8566, 2.3522, 'Seine River flooding risk'),
+            ('Tokyo', 'Japan', 35.6762, 139.6503, 'Typhoon-related flooding'),
+            ('London', 'UK', 51.5074, 0.1276, 'Thames River flood risk'),
+            ('Rome', 'Italy', 41.9028, 12.4964, 'Tiber River flooding'),
+            ('New Delhi', 'India', 28.7041, 77.1025, 'Monsoon flooding'),
+            ('Shanghai', 'China', 31.2304, 121.4737, 'Yangtze River flooding'),
+            ('Sydney', 'Australia', -33.8688, 151.2093, 'Coastal storm surge'),
+            ('São Paulo', 'Brazil', -23.5505, -46.6333, 'River overflow potential'),
+            ('Dhaka', 'Bangladesh', 23.8103, 90.4125, 'Monsoon flooding'),
+            ('Jakarta', 'Indonesia', -6.2088, 106.8456, 'Urban flooding from heavy rains'),
+        ],
+    },
+    'wildfire': {
+        'prefix': 'fire',
+        'severities': [('High', 'high', 0.30), ('Medium', 'medium', 0.45), ('Low', 'low', 0.25)],
+        'hotspots': [
+            ('Sacramento', 'USA', 38.5816, -121.4694, 'Active wildfire in forest area'),
+            ('San Diego', 'USA', 32.7157, -117.1611, 'Brush fire near residential area'),
+            ('Madrid', 'Spain', 40.4637, -3.7492, 'Mediterranean forest fire'),
+            ('Clermont-Ferrand', 'France', 46.2276, 2.2137, 'Controlled burn operation'),
+            ('Armidale', 'Australia', -31.2532, 146.9161, 'Bushfire in eucalyptus forest'),
+            ('Athens', 'Greece', 37.9755, 23.7275, 'Mediterranean scrubland fire'),
+            ('Vancouver', 'Canada', 49.2827, -123.1207, 'Boreal forest fire'),
+            ('Santiago', 'Chile', -33.4489, -70.6693, 'Andes mountain fire'),
+        ],
+    },
+    'drought': {
+        'prefix': 'drought',
+        'severities': [('Extreme', 'high', 0.25), ('Severe', 'medium', 0.45), ('Moderate', 'low', 0.30)],
+        'hotspots': [
+            ('Fresno', 'USA', 36.7783, -119.4179, 'Exceptional drought conditions'),
+            ('Amarillo', 'USA', 35.2271, -101.8313, 'Agricultural drought impact'),
+            ('Polokwane', 'South Africa', -22.9576, 31.2357, 'Severe water shortage'),
+            ('Gaza', 'Israel', 31.2001, 34.8516, 'Mediterranean drought'),
+            ('Alice Springs', 'Australia', -23.6980, 133.8807, 'Outback drought conditions'),
+            ('Bangalore', 'India', 12.9716, 77.5946, 'Monsoon failure impact'),
+            ('Niamey', 'Niger', 13.5137, 2.1734, 'Sahel drought crisis'),
+            ('Brasília', 'Brazil', -15.7942, -47.8825, 'Cerrado region drought'),
+        ],
+    },
+    'earthquake': {
+        'prefix': 'earthquake',
+        'severities': [('Major', 'high', 0.20), ('Strong', 'medium', 0.40), ('Moderate', 'low', 0.40)],
+        'hotspots': [
+            ('Los Angeles', 'USA', 34.0522, -118.2437, 'San Andreas Fault zone', 'San Andreas'),
+            ('San Francisco', 'USA', 37.7749, -122.4194, 'Hayward Fault activity', 'Hayward'),
+            ('Tokyo', 'Japan', 35.6762, 139.6503, 'Pacific Ring of Fire', 'Pacific Ring'),
+            ('Rome', 'Italy', 41.9028, 12.4964, 'Mediterranean fault line', 'Apennine'),
+            ('Istanbul', 'Turkey', 41.0082, 28.9784, 'North Anatolian Fault', 'Anatolian'),
+            ('Santiago', 'Chile', -33.4489, -70.6693, 'Nazca Plate subduction', 'Nazca'),
+            ('Kathmandu', 'Nepal', 27.7172, 85.3240, 'Himalayan fault zone', 'Himalayan'),
+            ('Wellington', 'New Zealand', -41.2865, 174.7633, 'Alpine Fault activity', 'Alpine'),
+        ],
+    },
+}
+
+
+def _type_properties(disaster_type: str, rng: np.random.Generator, n: int,
+                     hotspot: np.ndarray, severity: np.ndarray) -> Dict[str, List]:
+    """Columns of the properties specific to one disaster type"""
+    # More severe incidents (lower severity index) get bigger numbers
+    scale = 1.0 + (2 - severity) * 0.5
+    if disaster_type == 'flood':
+        return {
+            'population_affected': (rng.lognormal(10, 1, n) * scale).astype(np.int64).tolist(),
+            'area_km2': np.round(rng.lognormal(3, 0.5, n) * scale, 1).tolist(),
+        }
+    if disaster_type == 'wildfire':
+        return {
+            'acres_burned': (rng.lognormal(7.5, 1.2, n) * scale).astype(np.int64).tolist(),
+            'containment_percent': rng.integers(0, 101, n).tolist(),
+        }
+    if disaster_type == 'drought':
+        return {
+            'drought_index': (4 - severity - rng.integers(0, 2, n)).clip(1, 4).tolist(),
+            'duration_weeks': (rng.gamma(2, 20, n) * scale).astype(np.int64).clip(1).tolist(),
+        }
+    faults = [spot[5] for spot in LAYER_SPECS['earthquake']['hotspots']]
+    return {
+        'magnitude': np.round((7.2 - severity * 1.2 + rng.normal(0, 0.4, n)).clip(3.0, 9.5), 1).tolist(),
+        'depth_km': np.round(rng.gamma(2, 10, n), 1).tolist(),
+        'fault_system': [faults[i] for i in hotspot.tolist()],
+    }
+
+
+def generate_features(disaster_type: str, count: int, seed: int = DEFAULT_SEED) -> Iterator[Dict]:
+    """Yield `count` seeded GeoJSON point features for a disaster type"""
+    spec = LAYER_SPECS[disaster_type]
+    # Each type has its own stream, so adding a type does not change the others
+    rng = np.random.default_rng([seed, DISASTER_TYPES.index(disaster_type)])
+    hotspots = spec['hotspots']
+    severities = spec['severities']
+
+    hotspot = rng.integers(0, len(hotspots), count)
+    anchor_lats = np.array([spot[2] for spot in hotspots])[hotspot]
+    anchor_lons = np.array([spot[3] for spot in hotspots])[hotspot]
+    lats = np.round((anchor_lats + rng.normal(0, SCATTER_DEG, count)).clip(-85, 85), 5).tolist()
+    lons = np.round((anchor_lons + rng.normal(0, SCATTER_DEG, count) + 180) % 360 - 180, 5).tolist()
+
+    weights = np.array([s[2] for s in severities])
+    severity = rng.choice(len(severities), count, p=weights / weights.sum())
+    days = rng.integers(0, DATE_SPAN_DAYS, count)
+    dates = [(FIRST_DATE + timedelta(days=d)).isoformat() for d in range(DATE_SPAN_DAYS)]
+    extra = _type_properties(disaster_type, rng, count, hotspot, severity)
+
+    hotspot = hotspot.tolist()
+    severity = severity.tolist()
+    days = days.tolist()
+    for i in range(count):
+        spot = hotspots[hotspot[i]]
+        level = severities[severity[i]]
+        properties = {
+            'id': f"{spec['prefix']}_{i + 1:07d}",
+            'severity': level[0],
+            'risk_level': level[1],
+            'last_updated': dates[days[i]],
+            'description': spot[4],
+        }
+        for key, values in extra.items():
+            properties[key] = values[i]
+        properties['country'] = spot[1]
+        properties['city'] = spot[0]
+        yield {
+            'type': 'Feature',
+            'geometry': {'type': 'Point', 'coordinates': [lons[i], lats[i]]},
+            'properties': properties
+        }
+
+
+def write_layer(path: str, disaster_type: str, count: int, seed: int = DEFAULT_SEED) -> int:
+    """Write one layer as a FeatureCollection, streaming features; returns the file size in bytes"""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write('{"type":"FeatureCollection","features":[')
+        for i, feature in enumerate(generate_features(disaster_type, count, seed)):
+            if i:
+                f.write(',')
+            f.write(json.dumps(feature, ensure_ascii=False, separators=(',', ':')))
+        f.write(']}')
+    # Atomic, so a running server's layer watcher never sees a partial file
+    os.replace(tmp_path, path)
+    return os.path.getsize(path)
+
+
+def write_layers(data_dir: str, counts: Dict[str, int], seed: int = DEFAULT_SEED) -> Dict[str, int]:
+    """Write <type>_zones.geojson for each type in counts; returns file sizes by type"""
+    os.makedirs(data_dir, exist_ok=True)
+    return {
+        disaster_type: write_layer(os.path.join(data_dir, f"{disaster_type}_zones.geojson"),
+                                   disaster_type, count, seed)
+        for disaster_type, count in counts.items()
+    }
+
+
+def main(argv: Sequence[str] = None):
+    parser = argparse.ArgumentParser(description="Generate seeded synthetic disaster layers")
+    parser.add_argument('--features', type=int, default=10000, help="Features per layer (default: 10000)")
+    parser.add_argument('--types', default=','.join(DISASTER_TYPES),
+                        help="Comma-separated disaster types (default: all)")
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED, help=f"Random seed (default: {DEFAULT_SEED})")
+    parser.add_argument('--out', required=True, help="Directory to write the layers to")
+    args = parser.parse_args(argv)
+
+    types = [t for t in args.types.split(',') if t]
+    unknown = [t for t in types if t not in LAYER_SPECS]
+    if unknown:
+        parser.error(f"Unknown disaster types: {', '.join(unknown)}")
+
+    began = time.perf_counter()
+    sizes = write_layers(args.out, {t: args.features for t in types}, args.seed)
+    elapsed = time.perf_counter() - began
+    for disaster_type, size in sizes.items():
+        print(f"✅ {disaster_type}: {args.features:,} features, {size / 1e6:.1f} MB")
+    print(f"Written to {args.out} in {elapsed:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
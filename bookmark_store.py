@@ -0,0 +1,307 @@
+"""
+SQLite-backed bookmark store
+
+One database file is shared by every worker process. It runs in WAL mode so
+readers never block the single writer, and each thread of each process gets
+its own connection. IDs come from AUTOINCREMENT, so they are unique across
+concurrent writers and never reused. Nearby lookups use an R*Tree index when
+SQLite is built with it, and a (lat, lon) B-tree otherwise. The same file
+holds the bookmark risk watcher's latest assessments and a short log of its
+passes, so every worker serves the same scores.
+"""
+
+import json
+import math
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from spatial_index import EARTH_RADIUS_KM, haversine_distances
+
+# Bookmarks per page by default, and at most
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+MAX_NAME_LENGTH = 200
+
+_KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+_COLUMNS = 'id, name, lat, lon, timestamp'
+
+# Risk watcher passes kept in the log; workers read it to catch up on changes
+RISK_RUNS_KEPT = 100
+
+
+def _row_to_bookmark(row: Tuple) -> Dict:
+    return {'id': row[0], 'name': row[1], 'lat': row[2], 'lon': row[3], 'timestamp': row[4]}
+
+
+class BookmarkStore:
+    """Persistent bookmarks with cursor pagination and radius lookups"""
+
+    def __init__(self, path: Optional[str] = None, busy_timeout: Optional[float] = None):
+        if path is None:
+            path = os.environ.get("BOOKMARK_DB_PATH", os.path.join("data", "bookmarks.db"))
+        if busy_timeout is None:
+            busy_timeout = float(os.environ.get("BOOKMARK_DB_BUSY_TIMEOUT", 30))
+        self.path = path
+        # Seconds a writer waits for the write lock before giving up
+        self.busy_timeout = busy_timeout
+        self.has_rtree = False
+        self._local = threading.local()
+        self._schema_pid: Optional[int] = None
+        self._schema_lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        """This thread's connection, opened on first use and again after a fork"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Autocommit mode; writes use explicit BEGIN IMMEDIATE transactions
+        conn = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None,
+                               check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        self._ensure_schema(conn)
+        return conn
+
+    def _ensure_schema(self, conn: sqlite3.Connection):
+        with self._schema_lock:
+            if self._schema_pid == os.getpid():
+                return
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                conn.execute('''
+                    CREATE TABLE IF NOT EXISTS bookmarks (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        name TEXT,
+                        lat REAL NOT NULL,
+                        lon REAL NOT NULL,
+                        timestamp TEXT NOT NULL
+                    )
+                ''')
+                conn.execute('CREATE INDEX IF NOT EXISTS idx_bookmarks_lat_lon ON bookmarks (lat, lon)')
+                conn.execute('''
+                    CREATE TABLE IF NOT EXISTS bookmark_risk (
+                        bookmark_id INTEGER PRIMARY KEY,
+                        risk_level TEXT NOT NULL,
+                        assessment TEXT NOT NULL
+                    )
+                ''')
+                conn.execute('''
+                    CREATE TABLE IF NOT EXISTS bookmark_risk_runs (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        scored_at TEXT NOT NULL,
+                        duration_s REAL NOT NULL,
+                        bookmarks INTEGER NOT NULL,
+                        changes TEXT NOT NULL
+                    )
+                ''')
+                conn.execute('''
+                    CREATE TABLE IF NOT EXISTS bookmark_risk_requests (
+                        id INTEGER PRIMARY KEY CHECK (id = 1),
+                        requested INTEGER NOT NULL
+                    )
+                ''')
+                try:
+                    conn.execute('''
+                        CREATE VIRTUAL TABLE IF NOT EXISTS bookmarks_rtree
+                        USING rtree(id, min_lat, max_lat, min_lon, max_lon)
+                    ''')
+                    self.has_rtree = True
+                except sqlite3.OperationalError:
+                    # SQLite built without R*Tree; the lat/lon index serves lookups
+                    self.has_rtree = False
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+            self._schema_pid = os.getpid()
+
+    def add(self, name: Optional[str], lat: float, lon: float) -> Dict:
+        """Save a bookmark and return it with its new ID"""
+        timestamp = datetime.now().isoformat()
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            cursor = conn.execute('INSERT INTO bookmarks (name, lat, lon, timestamp) VALUES (?, ?, ?, ?)',
+                                  (name, lat, lon, timestamp))
+            bookmark_id = cursor.lastrowid
+            if self.has_rtree:
+                conn.execute('INSERT INTO bookmarks_rtree VALUES (?, ?, ?, ?, ?)',
+                             (bookmark_id, lat, lat, lon, lon))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return {'id': bookmark_id, 'name': name, 'lat': lat, 'lon': lon, 'timestamp': timestamp}
+
+    def get(self, bookmark_id: int) -> Optional[Dict]:
+        """One bookmark by ID, or None"""
+        row = self._connection().execute(
+            f'SELECT {_COLUMNS} FROM bookmarks WHERE id = ?', (bookmark_id,)
+        ).fetchone()
+        return _row_to_bookmark(row) if row is not None else None
+
+    def list(self, limit: int = DEFAULT_PAGE_SIZE, cursor: int = 0) -> Tuple[List[Dict], Optional[int]]:
+        """
+        One page of bookmarks in ID order, starting after the cursor ID.
+        Returns the page and the cursor for the next one (None on the last page).
+        """
+        limit = min(max(limit, 1), MAX_PAGE_SIZE)
+        rows = self._connection().execute(
+            f'SELECT {_COLUMNS} FROM bookmarks WHERE id > ? ORDER BY id LIMIT ?', (cursor, limit + 1)
+        ).fetchall()
+        page = [_row_to_bookmark(row) for row in rows[:limit]]
+        next_cursor = page[-1]['id'] if len(rows) > limit else None
+        return page, next_cursor
+
+    def all_locations(self) -> Tuple[np.ndarray, List[Optional[str]], np.ndarray, np.ndarray]:
+        """IDs, names, latitudes and longitudes of every bookmark, as arrays for batch scoring"""
+        rows = self._connection().execute('SELECT id, name, lat, lon FROM bookmarks ORDER BY id').fetchall()
+        ids = np.array([row[0] for row in rows], dtype=np.int64)
+        names = [row[1] for row in rows]
+        lats = np.array([row[2] for row in rows], dtype=np.float64)
+        lons = np.array([row[3] for row in rows], dtype=np.float64)
+        return ids, names, lats, lons
+
+    def count(self) -> int:
+        """Number of saved bookmarks"""
+        return self._connection().execute('SELECT COUNT(*) FROM bookmarks').fetchone()[0]
+
+    def near(self, lat: float, lon: float, radius_km: float,
+             limit: int = DEFAULT_PAGE_SIZE) -> List[Dict]:
+        """Bookmarks within radius_km of a point, nearest first, with distance_km added"""
+        limit = min(max(limit, 1), MAX_PAGE_SIZE)
+        rows = []
+        for box in self._search_boxes(lat, lon, radius_km):
+            rows.extend(self._rows_in_box(*box))
+        if not rows:
+            return []
+
+        # The boxes overlap only if they were clamped at a pole; drop duplicates
+        rows = list({row[0]: row for row in rows}.values())
+        distances = haversine_distances(lat, lon, np.array([r[2] for r in rows]), np.array([r[3] for r in rows]))
+        order = np.argsort(distances, kind='stable')
+        results = []
+        for i in order:
+            if distances[i] > radius_km or len(results) >= limit:
+                break
+            bookmark = _row_to_bookmark(rows[i])
+            bookmark['distance_km'] = round(float(distances[i]), 2)
+            results.append(bookmark)
+        return results
+
+    def _search_boxes(self, lat: float, lon: float,
+                      radius_km: float) -> List[Tuple[float, float, float, float]]:
+        """(min_lat, max_lat, min_lon, max_lon) boxes covering a radius, split at the antimeridian"""
+        dlat = radius_km / _KM_PER_DEGREE
+        min_lat, max_lat = max(lat - dlat, -90.0), min(lat + dlat, 90.0)
+        cos_lat = min(math.cos(math.radians(min_lat)), math.cos(math.radians(max_lat)))
+        if min_lat <= -90 or max_lat >= 90 or cos_lat <= 0 or radius_km / (_KM_PER_DEGREE * cos_lat) >= 180:
+            return [(min_lat, max_lat, -180.0, 180.0)]
+
+        dlon = radius_km / (_KM_PER_DEGREE * cos_lat)
+        min_lon, max_lon = lon - dlon, lon + dlon
+        if min_lon < -180:
+            return [(min_lat, max_lat, min_lon + 360, 180.0), (min_lat, max_lat, -180.0, max_lon)]
+        if max_lon > 180:
+            return [(min_lat, max_lat, min_lon, 180.0), (min_lat, max_lat, -180.0, max_lon - 360)]
+        return [(min_lat, max_lat, min_lon, max_lon)]
+
+    def _rows_in_box(self, min_lat: float, max_lat: float, min_lon: float, max_lon: float) -> List[Tuple]:
+        if self.has_rtree:
+            sql = ('SELECT b.id, b.name, b.lat, b.lon, b.timestamp FROM bookmarks_rtree r '
+                   'JOIN bookmarks b ON b.id = r.id '
+                   'WHERE r.min_lat <= ? AND r.max_lat >= ? AND r.min_lon <= ? AND r.max_lon >= ?')
+            params = (max_lat, min_lat, max_lon, min_lon)
+        else:
+            sql = f'SELECT {_COLUMNS} FROM bookmarks WHERE lat BETWEEN ? AND ? AND lon BETWEEN ? AND ?'
+            params = (min_lat, max_lat, min_lon, max_lon)
+        return self._connection().execute(sql, params).fetchall()
+
+    def risk_levels(self) -> Dict[int, str]:
+        """Stored risk level of every scored bookmark, by ID"""
+        return dict(self._connection().execute('SELECT bookmark_id, risk_level FROM bookmark_risk').fetchall())
+
+    def risk_assessments(self) -> Dict[int, Dict]:
+        """Stored risk assessment of every scored bookmark, by ID"""
+        rows = self._connection().execute('SELECT bookmark_id, assessment FROM bookmark_risk').fetchall()
+        return {bookmark_id: json.loads(assessment) for bookmark_id, assessment in rows}
+
+    def save_risk_run(self, assessments: List[Dict], changes: List[Dict], scored_at: str,
+                      duration_s: float) -> int:
+        """Replace the stored assessments with one pass's and log the pass; returns its run ID"""
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute('DELETE FROM bookmark_risk')
+            conn.executemany(
+                'INSERT INTO bookmark_risk (bookmark_id, risk_level, assessment) VALUES (?, ?, ?)',
+                ((a['bookmark_id'], a['risk_level'], json.dumps(a, separators=(',', ':'))) for a in assessments)
+            )
+            cursor = conn.execute(
+                'INSERT INTO bookmark_risk_runs (scored_at, duration_s, bookmarks, changes) VALUES (?, ?, ?, ?)',
+                (scored_at, duration_s, len(assessments), json.dumps(changes, separators=(',', ':')))
+            )
+            run_id = cursor.lastrowid
+            conn.execute('DELETE FROM bookmark_risk_runs WHERE id <= ?', (run_id - RISK_RUNS_KEPT,))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return run_id
+
+    def latest_risk_run(self) -> Optional[Dict]:
+        """ID, time, duration and size of the newest risk pass, or None before the first"""
+        row = self._connection().execute(
+            'SELECT id, scored_at, duration_s, bookmarks FROM bookmark_risk_runs ORDER BY id DESC LIMIT 1'
+        ).fetchone()
+        if row is None:
+            return None
+        return {'id': row[0], 'scored_at': row[1], 'duration_s': row[2], 'bookmarks': row[3]}
+
+    def risk_changes_since(self, run_id: int) -> List[Tuple[int, List[Dict]]]:
+        """(run ID, risk level changes) of the logged passes after run_id, oldest first"""
+        rows = self._connection().execute(
+            'SELECT id, changes FROM bookmark_risk_runs WHERE id > ? ORDER BY id', (run_id,)
+        ).fetchall()
+        return [(row[0], json.loads(row[1])) for row in rows]
+
+    def request_risk_run(self):
+        """Ask whichever process runs the risk watcher for an early pass"""
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute('INSERT INTO bookmark_risk_requests (id, requested) VALUES (1, 1) '
+                         'ON CONFLICT (id) DO UPDATE SET requested = requested + 1')
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def risk_run_requests(self) -> int:
+        """How many early passes have been requested so far"""
+        row = self._connection().execute('SELECT requested FROM bookmark_risk_requests WHERE id = 1').fetchone()
+        return row[0] if row is not None else 0
+
+    def close(self):
+        """Close this thread's connection"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+# Shared by every request thread in the process
+bookmark_store = BookmarkStore()
@@ -0,0 +1,102 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries expire after a per-entry TTL.
+    Expired entries are kept for an extra stale window during which
+    get_or_load serves them immediately and refreshes them in the background.
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.refresh_errors = 0
+        # key -> (value, fresh_until, stale_until)
+        self._entries = OrderedDict()
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return a fresh value or None, without loading"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+            return None
+
+    def set(self, key: Hashable, value: Any, ttl: float, stale_ttl: float = 0):
+        """Store a value that is fresh for ttl seconds and servable stale for stale_ttl more"""
+        now = time.monotonic()
+        with self._lock:
+            self._entries[key] = (value, now + ttl, now + ttl + stale_ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any], ttl: float, stale_ttl: float = 0) -> Any:
+        """
+        Return the cached value for key, calling loader on a miss.
+        A stale value is returned as-is while one background thread refreshes it.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now < entry[2]:
+                self._entries.move_to_end(key)
+                if now < entry[1]:
+                    self.hits += 1
+                    return entry[0]
+
+                self.stale_hits += 1
+                if key not in self._refreshing:
+                    self._refreshing.add(key)
+                    threading.Thread(
+                        target=self._refresh, args=(key, loader, ttl, stale_ttl), daemon=True
+                    ).start()
+                return entry[0]
+            self.misses += 1
+
+        value = loader()
+        self.set(key, value, ttl, stale_ttl)
+        return value
+
+    def _refresh(self, key: Hashable, loader: Callable[[], Any], ttl: float, stale_ttl: float):
+        """Reload a stale entry; on failure the stale value keeps being served"""
+        try:
+            self.set(key, loader(), ttl, stale_ttl)
+        except Exception as e:
+            self.refresh_errors += 1
+            logging.warning(f"Background cache refresh failed for {key}: {str(e)}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def clear(self):
+        """Drop every entry"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        """Cache counters for monitoring"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'stale_hits': self.stale_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'refresh_errors': self.refresh_errors
+            }
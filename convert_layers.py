@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+DisasterMap AI - Layer Converter
+Converts data/*_zones.geojson files to the memory-mapped binary layer format (.dml)
+
+Usage:
+    python convert_layers.py                 # convert every layer in data/
+    python convert_layers.py flood wildfire  # convert selected layers
+    python convert_layers.py --data-dir /srv/disastermap/data
+"""
+
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+
+from layer_format import BINARY_SUFFIX, convert_geojson, open_layer
+from utils import GeoJSONUtils
+
+
+def convert(geojson_path: str) -> bool:
+    """Validate and convert one GeoJSON layer; returns True on success"""
+    start = time.perf_counter()
+    try:
+        with open(geojson_path, 'r') as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"❌ {geojson_path}: {e}")
+        return False
+    if not GeoJSONUtils().validate_geojson(data):
+        print(f"❌ {geojson_path}: not a valid FeatureCollection, skipped")
+        return False
+
+    # Parsed once: the same dicts are validated, converted and counted
+    output_path = convert_geojson(geojson_path, data=data)
+    columns, _ = open_layer(output_path)
+    elapsed = time.perf_counter() - start
+
+    if columns.size != len(data['features']):
+        print(f"❌ {output_path}: wrote {columns.size} of {len(data['features'])} features")
+        return False
+
+    print(f"✅ {geojson_path} -> {output_path}: {columns.size} features, "
+          f"{os.path.getsize(geojson_path):,} -> {os.path.getsize(output_path):,} bytes ({elapsed:.2f}s)")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert GeoJSON disaster layers to the binary layer format")
+    parser.add_argument('types', nargs='*', help="Disaster types to convert (default: all *_zones.geojson files)")
+    parser.add_argument('--data-dir', default='data', help="Directory holding the layer files")
+    args = parser.parse_args()
+
+    if args.types:
+        paths = [os.path.join(args.data_dir, f"{t}_zones.geojson") for t in args.types]
+    else:
+        paths = sorted(glob.glob(os.path.join(args.data_dir, '*_zones.geojson')))
+
+    if not paths:
+        print(f"❌ No *_zones.geojson files found in {args.data_dir}")
+        sys.exit(1)
+
+    failures = [path for path in paths if not convert(path)]
+    if failures:
+        sys.exit(1)
+    print(f"\nConverted {len(paths)} layer(s); GeoJSONUtils will now load the {BINARY_SUFFIX} files.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Server-Sent Events fan-out hub
+
+Published events go into a bounded ring buffer with increasing IDs, and
+every subscriber is a generator that waits on one shared Condition, with no
+queue of its own. Under gunicorn's gthread worker, though, the request
+thread serving a stream stays busy for as long as the stream is open, so
+each worker admits at most max_subscribers streams. Clients over the cap get
+a `fallback` event and should poll instead. Under the gevent worker class
+(monkey-patched threading) each waiter is a greenlet, and the cap can be
+raised to thousands. Clients reconnecting with Last-Event-ID resume from the
+buffer; if they fell too far behind they get a `reset` event and should refetch.
+"""
+
+import json
+import os
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Dict, Iterator, Optional
+
+# Events kept for clients that reconnect with Last-Event-ID
+EVENT_BUFFER_SIZE = 1000
+
+# Seconds between keep-alive comments on an idle stream; also bounds how
+# long a disconnected client's generator lingers
+HEARTBEAT_SECONDS = 15
+
+# Client reconnect delay sent in the stream's retry field, in milliseconds
+RETRY_MS = 5000
+
+# Seconds between polls suggested to clients turned away by the stream cap
+POLL_INTERVAL_SECONDS = 15
+
+
+class EventHub:
+    """Broadcasts events to every SSE subscriber in the process"""
+
+    def __init__(self, capacity: int = EVENT_BUFFER_SIZE, max_subscribers: Optional[int] = None):
+        if max_subscribers is None:
+            max_subscribers = int(os.environ.get("EVENTS_MAX_STREAMS", 2))
+        self._events = deque(maxlen=capacity)
+        self._last_id = 0
+        self._condition = threading.Condition()
+        # Open streams allowed at once; each holds a request thread under gthread
+        self.max_subscribers = max_subscribers
+        self.published = 0
+        self.subscribers = 0
+        self.turned_away = 0
+
+    @property
+    def last_id(self) -> int:
+        return self._last_id
+
+    def publish(self, event_type: str, data: Dict) -> int:
+        """Broadcast an event; returns its ID"""
+        payload = json.dumps({**data, 'published_at': datetime.now().isoformat()}, separators=(',', ':'))
+        with self._condition:
+            self._last_id += 1
+            # Encoded once here, not once per subscriber
+            self._events.append((self._last_id, f"id: {self._last_id}\nevent: {event_type}\ndata: {payload}\n\n"))
+            self.published += 1
+            self._condition.notify_all()
+            return self._last_id
+
+    def _pending(self, after_id: int):
+        """Encoded events newer than after_id; None if some were already dropped from the buffer"""
+        if not self._events or self._events[-1][0] <= after_id:
+            return []
+        if self._events[0][0] > after_id + 1:
+            return None
+        return [encoded for event_id, encoded in self._events if event_id > after_id]
+
+    def stream(self, last_event_id: Optional[int] = None,
+               heartbeat: float = HEARTBEAT_SECONDS) -> Iterator[str]:
+        """
+        SSE stream for one client, starting after last_event_id (or now).
+        Yields encoded events, and a comment line whenever heartbeat seconds pass quietly.
+        With max_subscribers streams already open, it yields a single `fallback`
+        event telling the client to poll, and ends.
+        """
+        cursor = self._last_id if last_event_id is None else last_event_id
+        with self._condition:
+            admitted = self.subscribers < self.max_subscribers
+            if admitted:
+                self.subscribers += 1
+            else:
+                self.turned_away += 1
+        if not admitted:
+            payload = json.dumps({'poll_interval_s': POLL_INTERVAL_SECONDS})
+            yield f"retry: {RETRY_MS}\n\nevent: fallback\ndata: {payload}\n\n"
+            return
+        try:
+            yield f"retry: {RETRY_MS}\n\n"
+            if cursor > self._last_id:
+                # IDs from before a server restart; the client's state is unknown
+                cursor = self._last_id
+                yield f"id: {cursor}\nevent: reset\ndata: {{}}\n\n"
+            while True:
+                with self._condition:
+                    pending = self._pending(cursor)
+                    if pending == []:
+                        self._condition.wait(heartbeat)
+                        pending = self._pending(cursor)
+                    newest = self._last_id
+
+                if pending is None:
+                    yield f"id: {newest}\nevent: reset\ndata: {{}}\n\n"
+                elif pending:
+                    yield ''.join(pending)
+                else:
+                    yield ": keep-alive\n\n"
+                cursor = newest
+        finally:
+            with self._condition:
+                self.subscribers -= 1
+
+    def stats(self) -> Dict:
+        """Hub counters for monitoring"""
+        return {
+            'subscribers': self.subscribers,
+            'max_subscribers': self.max_subscribers,
+            'turned_away': self.turned_away,
+            'published': self.published,
+            'last_event_id': self._last_id,
+            'buffered': len(self._events)
+        }
+
+
+# Shared by every request in the process
+event_hub = EventHub()
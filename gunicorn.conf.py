@@ -0,0 +1,97 @@
+"""
+DisasterMap AI - Gunicorn Configuration
+Production serving profile, picked up automatically from the working directory:
+
+    gunicorn app:app
+
+The app is imported once in the master (preload_app), so the disaster layers,
+their spatial indexes and the DisasterPredictor are built a single time and
+shared copy-on-write by every forked worker. Background threads (layer
+watcher, bookmark risk watcher, tile pre-rendering) are started in each worker
+after the fork, never in the master.
+
+Reload gracefully with `kill -HUP <master pid>`: new workers are forked and the
+old ones finish their in-flight requests within graceful_timeout. Since the
+app is preloaded, HUP does not pick up code changes; for a code deploy send
+USR2 (starts a new master alongside) and then QUIT to the old master. Layer
+files need no reload at all; every worker hot-reloads them.
+
+State that must agree across workers lives outside them: bookmark risk is
+scored by one elected worker and shared through SQLite, and the risk raster is
+a file tagged with the model version that built it. Two admin actions remain
+per process and affect only the worker that serves the request: POST
+/api/ml-model/reload and POST /api/profiler (both report that worker's pid).
+To switch every worker to a new model, start a new master (USR2, then QUIT the
+old one); to profile every worker, start with PROFILER_ENABLED=1.
+"""
+
+import gc
+import multiprocessing
+import os
+
+# Worker class: gthread (default) or gevent. gevent suits many open
+# /api/events streams; with gthread each open stream occupies one thread.
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gthread")
+
+# /api/events streams admitted per worker (see event_hub.py); clients over the
+# cap poll instead. A greenlet per stream is cheap, a thread per stream is not.
+os.environ.setdefault("EVENTS_MAX_STREAMS", "500" if worker_class == "gevent" else "4")
+
+if worker_class == "gevent":
+    # Patch before the app is preloaded, so the locks and conditions it creates
+    # are cooperative in the workers
+    from gevent import monkey
+    monkey.patch_all()
+
+bind = f"{os.environ.get('HOST', '0.0.0.0')}:{os.environ.get('PORT', 5000)}"
+
+# One worker per core: layer queries, tiles and batch predictions are numpy
+# work that holds the GIL for most of a request, so more processes, not more
+# threads, is what scales it. Threads cover requests waiting on the weather API.
+# Every open event stream holds a gthread thread, so each worker gets
+# GUNICORN_THREADS request threads on top of one per admitted stream.
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+threads = int(os.environ.get("GUNICORN_THREADS", 4)) + int(os.environ["EVENTS_MAX_STREAMS"])
+worker_connections = int(os.environ.get("GUNICORN_WORKER_CONNECTIONS", 1000))
+
+preload_app = True
+
+# Seconds before a silent worker is killed and restarted, and how long workers
+# get to finish in-flight requests on reload or shutdown
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 60))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", 30))
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", 5))
+
+# Recycle workers now and then; the jitter keeps them from restarting together
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 10000))
+max_requests_jitter = int(os.environ.get("GUNICORN_MAX_REQUESTS_JITTER", 1000))
+
+loglevel = os.environ.get("LOG_LEVEL", "INFO").lower()
+errorlog = "-"
+# Access logging costs a write per request; enable with GUNICORN_ACCESS_LOG=-
+accesslog = os.environ.get("GUNICORN_ACCESS_LOG") or None
+
+# app.py starts background threads at import unless BACKGROUND_TASKS=0. Threads
+# do not survive a fork, and a lock held by one at fork time stays held in
+# every worker, so they are deferred to post_worker_init instead.
+background_tasks = os.environ.get("BACKGROUND_TASKS", "1") != "0"
+os.environ["BACKGROUND_TASKS"] = "0"
+
+
+def when_ready(server):
+    """In the master, after the app is preloaded and before any worker is forked"""
+    if server.cfg.preload_app:
+        from app import TILE_PRERENDER_ZOOM, prerender_tiles
+        if TILE_PRERENDER_ZOOM >= 0:
+            # Rendered once here, the tile cache is shared by every worker
+            prerender_tiles()
+    # Keep the garbage collector from writing to (and so copying) the pages of
+    # everything loaded so far
+    gc.freeze()
+
+
+def post_worker_init(worker):
+    """In each worker, once the app is loaded"""
+    if background_tasks:
+        from app import start_background_tasks
+        start_background_tasks()
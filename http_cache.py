@@ -0,0 +1,137 @@
+"""
+Conditional and pre-compressed HTTP responses
+
+An EncodedBody carries a response body together with its validators (a
+strong ETag and Last-Modified time) and builds gzip/brotli variants once,
+on first request. Each encoding is a different byte sequence, so each gets
+its own strong ETag: the body's tag with the encoding appended. send_body
+answers If-None-Match / If-Modified-Since with 304 before the body is
+touched, and otherwise sends the best encoding the client accepts.
+"""
+
+import gzip
+import hashlib
+import threading
+from datetime import datetime, timezone
+from typing import Callable, Dict, Optional, Union
+
+from flask import Response, request
+
+try:
+    import brotli
+except ImportError:  # Optional; gzip is always available
+    brotli = None
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 6
+# Bodies smaller than this are sent uncompressed
+MIN_COMPRESS_BYTES = 1024
+
+
+def make_etag(*parts) -> str:
+    """Strong ETag (quoted) derived from version parts such as path, mtime and size"""
+    digest = hashlib.blake2b(repr(parts).encode('utf-8'), digest_size=12).hexdigest()
+    return f'"{digest}"'
+
+
+def encoding_etag(etag: str, encoding: Optional[str]) -> str:
+    """The strong ETag of one encoding of a body, e.g. "abc" -> "abc-gzip"; identity keeps the tag"""
+    if encoding is None:
+        return etag
+    return f'{etag[:-1]}-{encoding}"'
+
+
+def _compress(data: bytes, encoding: str) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+class EncodedBody:
+    """
+    A response body with its validators and lazily built compressed variants.
+    data may be a callable so the body is only produced once a full response is needed.
+    """
+
+    def __init__(self, data: Union[bytes, Callable[[], bytes]], etag: str,
+                 last_modified: Optional[float] = None, mimetype: str = 'application/json'):
+        self._data = data
+        self.etag = etag
+        # Whole seconds, as HTTP dates have no finer resolution
+        self.last_modified = (datetime.fromtimestamp(int(last_modified), timezone.utc)
+                              if last_modified is not None else None)
+        self.mimetype = mimetype
+        self._variants: Dict[str, bytes] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def data(self) -> bytes:
+        if callable(self._data):
+            self._data = self._data()
+        return self._data
+
+    def variant(self, encoding: Optional[str]) -> bytes:
+        """The body in an encoding ('br', 'gzip' or None for identity), compressed once"""
+        if encoding is None:
+            return self.data
+        variant = self._variants.get(encoding)
+        if variant is None:
+            with self._lock:
+                variant = self._variants.get(encoding)
+                if variant is None:
+                    variant = self._variants[encoding] = _compress(self.data, encoding)
+        return variant
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the compressed variants"""
+        return sum(len(v) for v in self._variants.values())
+
+    def not_modified(self) -> Optional[str]:
+        """
+        The ETag to send with a 304 if the current request's validators still
+        match this body, else None. Any encoding's tag matches, as the client
+        holds that variant of the same version.
+        """
+        if request.if_none_match:
+            # If-None-Match takes precedence over If-Modified-Since
+            for encoding in ('br', 'gzip', None):
+                etag = encoding_etag(self.etag, encoding)
+                if request.if_none_match.contains(etag.strip('"')):
+                    return etag
+            return None
+        since = request.if_modified_since
+        if since is not None and self.last_modified is not None and self.last_modified <= since:
+            return self.etag
+        return None
+
+
+def _negotiate_encoding(size: int) -> Optional[str]:
+    if size < MIN_COMPRESS_BYTES:
+        return None
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        return 'br'
+    if accepted['gzip']:
+        return 'gzip'
+    return None
+
+
+def send_body(body: EncodedBody, cache_control: str = 'no-cache') -> Response:
+    """Respond with 304 if the client's copy is current, else with the best encoded variant"""
+    etag = body.not_modified()
+    if etag is not None:
+        response = Response(status=304)
+    else:
+        encoding = _negotiate_encoding(len(body.data))
+        response = Response(body.variant(encoding), mimetype=body.mimetype)
+        if encoding is not None:
+            response.headers['Content-Encoding'] = encoding
+        etag = encoding_etag(body.etag, encoding)
+
+    response.headers['ETag'] = etag
+    if body.last_modified is not None:
+        response.last_modified = body.last_modified
+    response.headers['Cache-Control'] = cache_control
+    response.vary.add('Accept-Encoding')
+    return response
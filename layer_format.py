@@ -0,0 +1,190 @@
+"""
+Binary columnar layer format (.dml)
+
+Layout: an 8-byte magic, a little-endian uint64 header length, a JSON header,
+then 8-byte aligned data blocks. The header describes every block by offset,
+dtype and length, plus the column kinds, category tables, property schemas and
+the sparse (non-Point / unusual) parts of the document.
+
+Files are opened with mmap and every array is a zero-copy NumPy view, so
+opening is near-instant and all processes share one copy via the page cache.
+"""
+
+import json
+import mmap
+import os
+import struct
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from layer_store import CategoricalColumn, ColumnarLayer, NumericColumn, StringTableColumn
+from spatial_index import GridIndex
+
+MAGIC = b'DMLAYER1'
+FORMAT_VERSION = 1
+ALIGNMENT = 8
+BINARY_SUFFIX = '.dml'
+
+
+class _BlockWriter:
+    """Accumulates aligned data blocks and their descriptors"""
+
+    def __init__(self):
+        self.blocks: List[bytes] = []
+        self.offset = 0
+
+    def add(self, data: bytes, dtype: str = 'u1', length: int = None) -> Dict:
+        descriptor = {'offset': self.offset, 'dtype': dtype,
+                      'length': len(data) if length is None else length}
+        padding = (-len(data)) % ALIGNMENT
+        self.blocks.append(data + b'\0' * padding)
+        self.offset += len(data) + padding
+        return descriptor
+
+    def add_array(self, array: np.ndarray) -> Dict:
+        array = np.ascontiguousarray(array)
+        dtype = array.dtype.newbyteorder('<')
+        return self.add(array.astype(dtype, copy=False).tobytes(), dtype.str, len(array))
+
+    def add_strings(self, values: List[str]) -> Tuple[Dict, Dict]:
+        encoded = [v.encode('utf-8') for v in values]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.uint64)
+        np.cumsum([len(e) for e in encoded], out=offsets[1:])
+        return self.add_array(offsets), self.add(b''.join(encoded))
+
+
+def write_layer(columns: ColumnarLayer, path: str):
+    """Write a columnar layer to a .dml file (atomically, via a temp file)"""
+    writer = _BlockWriter()
+    header = {
+        'format_version': FORMAT_VERSION,
+        'size': columns.size,
+        'schemas': [list(schema) if schema is not None else None for schema in columns.schemas],
+        'collection_extras': columns.collection_extras,
+        'blocks': {
+            'lons': writer.add_array(columns.lons),
+            'lats': writer.add_array(columns.lats),
+            'schema_codes': writer.add_array(columns.schema_codes),
+        },
+        'columns': {},
+    }
+
+    # Sparse parts stay JSON; they are rare and decoded once on open
+    header['blocks']['geometries'] = writer.add(
+        json.dumps({str(row): g for row, g in columns.geometries.items()}).encode('utf-8'))
+    header['blocks']['feature_extras'] = writer.add(
+        json.dumps({str(row): e for row, e in columns.feature_extras.items()}).encode('utf-8'))
+
+    # Persist the spatial index order so opening does not re-sort
+    points = columns.point_rows
+    index = GridIndex(columns.lats[points], columns.lons[points], points)
+    header['index'] = {
+        'cell_size': index.cell_size,
+        'lats': writer.add_array(index.lats),
+        'lons': writer.add_array(index.lons),
+        'positions': writer.add_array(index.positions),
+        'order': writer.add_array(index._order),
+        'sorted_cells': writer.add_array(index._sorted_cells),
+    }
+
+    for key, column in columns.columns.items():
+        if isinstance(column, NumericColumn):
+            header['columns'][key] = {'kind': 'numeric', 'values': writer.add_array(column.values)}
+        elif isinstance(column, CategoricalColumn):
+            header['columns'][key] = {'kind': 'categorical', 'categories': column.categories,
+                                      'codes': writer.add_array(column.codes)}
+        else:
+            present = columns.has_property(key)
+            values = list(column.values)
+            plain = all(isinstance(v, str) for v, has in zip(values, present) if has)
+            if plain:
+                texts = [v if has else '' for v, has in zip(values, present)]
+            else:
+                texts = [json.dumps(v) if has else 'null' for v, has in zip(values, present)]
+            offsets, blob = writer.add_strings(texts)
+            header['columns'][key] = {'kind': 'strings', 'json': not plain,
+                                      'offsets': offsets, 'blob': blob}
+
+    header_bytes = json.dumps(header, separators=(',', ':')).encode('utf-8')
+    data_start = len(MAGIC) + 8 + len(header_bytes)
+    data_start += (-data_start) % ALIGNMENT
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(struct.pack('<Q', len(header_bytes)))
+        f.write(header_bytes)
+        f.write(b'\0' * (data_start - f.tell()))
+        for block in writer.blocks:
+            f.write(block)
+    os.replace(tmp_path, path)
+
+
+def open_layer(path: str) -> Tuple[ColumnarLayer, GridIndex]:
+    """Memory-map a .dml file and return its columnar layer and spatial index"""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            raise ValueError(f"{path} is empty")
+        # The mapping stays valid after the file object is closed
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    if buffer[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"{path} is not a DisasterMap layer file")
+    header_length = struct.unpack_from('<Q', buffer, len(MAGIC))[0]
+    header_end = len(MAGIC) + 8 + header_length
+    header = json.loads(bytes(buffer[len(MAGIC) + 8:header_end]))
+    if header.get('format_version') != FORMAT_VERSION:
+        raise ValueError(f"{path} has unsupported format version {header.get('format_version')}")
+    data_start = header_end + (-header_end) % ALIGNMENT
+    view = memoryview(buffer)
+
+    def array(descriptor: Dict) -> np.ndarray:
+        return np.frombuffer(buffer, dtype=np.dtype(descriptor['dtype']),
+                             count=descriptor['length'], offset=data_start + descriptor['offset'])
+
+    def raw(descriptor: Dict) -> memoryview:
+        start = data_start + descriptor['offset']
+        return view[start:start + descriptor['length']]
+
+    blocks = header['blocks']
+    columns = {}
+    for key, spec in header['columns'].items():
+        if spec['kind'] == 'numeric':
+            columns[key] = NumericColumn(array(spec['values']))
+        elif spec['kind'] == 'categorical':
+            columns[key] = CategoricalColumn(array(spec['codes']), spec['categories'])
+        else:
+            columns[key] = StringTableColumn(array(spec['offsets']), raw(spec['blob']), spec['json'])
+
+    layer = ColumnarLayer(
+        array(blocks['lons']),
+        array(blocks['lats']),
+        columns,
+        [tuple(schema) if schema is not None else None for schema in header['schemas']],
+        array(blocks['schema_codes']),
+        geometries={int(row): g for row, g in json.loads(bytes(raw(blocks['geometries']))).items()},
+        feature_extras={int(row): e for row, e in json.loads(bytes(raw(blocks['feature_extras']))).items()},
+        collection_extras=header['collection_extras'],
+        mapped=True
+    )
+
+    spec = header['index']
+    index = GridIndex(array(spec['lats']), array(spec['lons']), array(spec['positions']),
+                      spec['cell_size'], order=array(spec['order']),
+                      sorted_cells=array(spec['sorted_cells']))
+    return layer, index
+
+
+def convert_geojson(geojson_path: str, output_path: str = None, data: Dict = None) -> str:
+    """
+    Convert a GeoJSON FeatureCollection file to the binary layer format.
+    Pass data when the file has already been parsed to skip reading it again.
+    """
+    if output_path is None:
+        output_path = os.path.splitext(geojson_path)[0] + BINARY_SUFFIX
+    if data is None:
+        with open(geojson_path, 'r') as f:
+            data = json.load(f)
+    write_layer(ColumnarLayer.from_geojson(data), output_path)
+    return output_path
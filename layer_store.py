@@ -0,0 +1,337 @@
+import json
+import sys
+from collections.abc import Hashable, Sequence as SequenceABC
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+# Properties we know are low-cardinality labels in the disaster schema
+CATEGORICAL_KEYS = ('severity', 'risk_level', 'country')
+
+# Sentinel for "key not present" while a column is being built
+_MISSING = object()
+
+
+class NumericColumn:
+    """Integer or float property stored as a NumPy array"""
+
+    def __init__(self, values: np.ndarray):
+        self.values = values
+        self._python_type = int if values.dtype.kind == 'i' else float
+
+    def value(self, row: int) -> Any:
+        return self._python_type(self.values[row])
+
+    @property
+    def nbytes(self) -> int:
+        return self.values.nbytes
+
+
+class CategoricalColumn:
+    """String property stored as small integer codes into a category table"""
+
+    def __init__(self, codes: np.ndarray, categories: List[str]):
+        self.codes = codes
+        self.categories = categories
+        self._lookup = {category: code for code, category in enumerate(categories)}
+
+    def value(self, row: int) -> Any:
+        return self.categories[self.codes[row]]
+
+    def code_of(self, category: str) -> int:
+        """Code for a category, or -1 if the layer never uses it"""
+        return self._lookup.get(category, -1)
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes + sum(sys.getsizeof(c) for c in self.categories)
+
+
+class ObjectColumn:
+    """Any other property, kept as a list with strings interned"""
+
+    def __init__(self, values: List[Any]):
+        self.values = values
+
+    def value(self, row: int) -> Any:
+        return self.values[row]
+
+    @property
+    def nbytes(self) -> int:
+        distinct = {id(v): v for v in self.values if isinstance(v, str)}
+        return 8 * len(self.values) + sum(sys.getsizeof(v) for v in distinct.values())
+
+
+class StringTableColumn:
+    """
+    Property values in a string table: row i is blob[offsets[i]:offsets[i + 1]].
+    The blob is usually a memory-mapped file, so values are decoded on access.
+    Values are raw UTF-8 strings, or JSON text when encoded_json is set.
+    """
+
+    def __init__(self, offsets: np.ndarray, blob: memoryview, encoded_json: bool = False):
+        self.offsets = offsets
+        self.blob = blob
+        self.encoded_json = encoded_json
+        self.values = _StringTableValues(self)
+
+    def value(self, row: int) -> Any:
+        text = str(self.blob[self.offsets[row]:self.offsets[row + 1]], 'utf-8')
+        return json.loads(text) if self.encoded_json else text
+
+    @property
+    def nbytes(self) -> int:
+        # Lives in the page cache, shared by every process mapping the file
+        return 0
+
+
+class _StringTableValues(SequenceABC):
+    """List-like view over a StringTableColumn"""
+
+    def __init__(self, column: StringTableColumn):
+        self._column = column
+
+    def __len__(self) -> int:
+        return len(self._column.offsets) - 1
+
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            return [self._column.value(r) for r in range(*row.indices(len(self)))]
+        return self._column.value(row)
+
+
+def _build_column(key: str, raw: List[Any]):
+    """Pick the most compact column type that round-trips every present value"""
+    present = [v for v in raw if v is not _MISSING]
+
+    if present and all(type(v) is int for v in present):
+        if all(-2**63 <= v < 2**63 for v in present):
+            return NumericColumn(np.array([0 if v is _MISSING else v for v in raw], dtype=np.int64))
+    elif present and all(type(v) is float for v in present):
+        return NumericColumn(np.array([np.nan if v is _MISSING else v for v in raw], dtype=np.float64))
+    elif present and all(type(v) is str for v in present):
+        categories = list(dict.fromkeys(present))
+        if key in CATEGORICAL_KEYS or len(categories) <= len(raw) // 2:
+            dtype = np.int16 if len(categories) < 2**15 else np.int32
+            lookup = {category: code for code, category in enumerate(categories)}
+            codes = np.array([-1 if v is _MISSING else lookup[v] for v in raw], dtype=dtype)
+            return CategoricalColumn(codes, categories)
+
+    return ObjectColumn([
+        None if v is _MISSING else (sys.intern(v) if type(v) is str else v)
+        for v in raw
+    ])
+
+
+def _point_coordinates(geometry: Any) -> Optional[tuple]:
+    """(lon, lat) of a Point geometry, or None for anything else"""
+    if not isinstance(geometry, dict) or geometry.get('type') != 'Point':
+        return None
+    coordinates = geometry.get('coordinates')
+    if (not isinstance(coordinates, list) or len(coordinates) < 2
+            or not all(type(c) in (int, float) for c in coordinates[:2])):
+        return None
+    return coordinates[0], coordinates[1]
+
+
+def _is_plain_point(geometry: Dict) -> bool:
+    """True for a 2D Point with float coordinates, which the arrays reproduce exactly"""
+    return (
+        geometry.keys() == {'type', 'coordinates'}
+        and len(geometry['coordinates']) == 2
+        and all(type(c) is float for c in geometry['coordinates'])
+    )
+
+
+class ColumnarLayer:
+    """
+    Struct-of-arrays representation of a disaster FeatureCollection.
+    Point coordinates and properties live in NumPy arrays or interned columns;
+    GeoJSON dicts are only materialized for the rows a response returns.
+    """
+
+    def __init__(self, lons: np.ndarray, lats: np.ndarray, columns: Dict[str, Any],
+                 schemas: List[Optional[tuple]], schema_codes: np.ndarray,
+                 geometries: Optional[Dict[int, Any]] = None,
+                 feature_extras: Optional[Dict[int, Dict]] = None,
+                 collection_extras: Optional[Dict] = None,
+                 mapped: bool = False):
+        # NaN coordinates mark rows whose geometry is not a Point
+        self.lons = lons
+        self.lats = lats
+        self.columns = columns
+        # Property key order per row; None means "properties": null
+        self.schemas = schemas
+        self.schema_codes = schema_codes
+        # Rarely used parts of the document, kept sparse by row and shared read-only
+        self.geometries = geometries or {}
+        self.feature_extras = feature_extras or {}
+        self.collection_extras = collection_extras or {}
+        # Arrays are views into a memory-mapped file rather than heap memory
+        self.mapped = mapped
+        self.size = len(lons)
+
+    @classmethod
+    def from_geojson(cls, data: Dict) -> 'ColumnarLayer':
+        """Build a columnar layer from a parsed FeatureCollection"""
+        features = data.get('features', [])
+        n = len(features)
+        lons = np.full(n, np.nan)
+        lats = np.full(n, np.nan)
+        geometries = {}
+        feature_extras = {}
+        schema_lookup = {}
+        schemas = []
+        schema_codes = np.zeros(n, dtype=np.int32)
+        raw_columns: Dict[str, List[Any]] = {}
+
+        for row, feature in enumerate(features):
+            geometry = feature.get('geometry')
+            point = _point_coordinates(geometry)
+            if point is not None:
+                lons[row], lats[row] = point
+            if point is None or not _is_plain_point(geometry):
+                geometries[row] = geometry
+
+            extras = {k: v for k, v in feature.items() if k not in ('type', 'geometry', 'properties')}
+            if extras:
+                feature_extras[row] = extras
+
+            properties = feature.get('properties')
+            schema = tuple(properties) if properties is not None else None
+            if schema not in schema_lookup:
+                schema_lookup[schema] = len(schemas)
+                schemas.append(schema)
+            schema_codes[row] = schema_lookup[schema]
+
+            for key, value in (properties or {}).items():
+                column = raw_columns.get(key)
+                if column is None:
+                    column = raw_columns[key] = [_MISSING] * n
+                column[row] = value
+
+        columns = {key: _build_column(key, raw) for key, raw in raw_columns.items()}
+        collection_extras = {k: v for k, v in data.items() if k not in ('type', 'features')}
+        return cls(lons, lats, columns, schemas, schema_codes, geometries,
+                   feature_extras, collection_extras)
+
+    @property
+    def property_keys(self) -> List[str]:
+        """Every property key used in the layer, in order of first appearance"""
+        return list(self.columns)
+
+    @property
+    def point_rows(self) -> np.ndarray:
+        """Rows whose geometry is a Point"""
+        return np.flatnonzero(~np.isnan(self.lons))
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate heap memory held by the layer"""
+        total = 0
+        if not self.mapped:
+            total += self.lons.nbytes + self.lats.nbytes + self.schema_codes.nbytes
+            total += sum(column.nbytes for column in self.columns.values())
+        # Sparse parts are rare; charge a flat estimate per entry
+        total += 512 * (len(self.geometries) + len(self.feature_extras))
+        return total
+
+    def properties(self, row: int) -> Optional[Dict]:
+        """Materialize the properties dict of one row"""
+        schema = self.schemas[self.schema_codes[row]]
+        if schema is None:
+            return None
+        return {key: self.columns[key].value(row) for key in schema}
+
+    def feature(self, row: int) -> Dict:
+        """Materialize one row as a GeoJSON Feature"""
+        row = int(row)
+        geometry = self.geometries.get(row)
+        if geometry is None and row not in self.geometries:
+            geometry = {"type": "Point", "coordinates": [float(self.lons[row]), float(self.lats[row])]}
+        feature = {"type": "Feature", "geometry": geometry, "properties": self.properties(row)}
+        if row in self.feature_extras:
+            feature.update(self.feature_extras[row])
+        return feature
+
+    def iter_features(self, rows: Optional[Iterable[int]] = None) -> Iterable[Dict]:
+        """Materialize features lazily, for all rows or the given ones"""
+        for row in range(self.size) if rows is None else rows:
+            yield self.feature(row)
+
+    def to_geojson(self, rows: Optional[Iterable[int]] = None) -> Dict:
+        """Materialize a FeatureCollection, for all rows or the given ones"""
+        return {
+            "type": "FeatureCollection",
+            **self.collection_extras,
+            "features": list(self.iter_features(rows))
+        }
+
+    def has_property(self, key: str) -> np.ndarray:
+        """Boolean mask of the rows that carry a property"""
+        has_key = np.array([schema is not None and key in schema for schema in self.schemas], dtype=bool)
+        if not len(has_key):
+            return np.zeros(self.size, dtype=bool)
+        return has_key[self.schema_codes]
+
+    def filter_rows(self, filters: Dict[str, Sequence[Any]], rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Boolean mask of the rows whose properties match every filter,
+        over all rows or just the given ones.
+        Each filter maps a property key to the list of accepted values.
+        """
+        size = self.size if rows is None else len(rows)
+        mask = np.ones(size, dtype=bool)
+        for key, accepted in filters.items():
+            column = self.columns.get(key)
+            if column is None:
+                return np.zeros(size, dtype=bool)
+
+            if isinstance(column, CategoricalColumn):
+                codes = [column.code_of(value) for value in accepted]
+                values = column.codes if rows is None else column.codes[rows]
+                mask &= np.isin(values, [c for c in codes if c >= 0])
+            elif isinstance(column, NumericColumn):
+                numbers = []
+                for value in accepted:
+                    try:
+                        numbers.append(float(value))
+                    except (TypeError, ValueError):
+                        continue
+                values = column.values if rows is None else column.values[rows]
+                mask &= np.isin(values, numbers)
+            else:
+                accepted_set = set(accepted)
+                values = column.values if rows is None else (column.values[row] for row in rows)
+                mask &= np.array([isinstance(v, Hashable) and v in accepted_set for v in values], dtype=bool)
+
+            present = self.has_property(key)
+            mask &= present if rows is None else present[rows]
+        return mask
+
+    def value_counts(self, key: str, rows: Optional[np.ndarray] = None) -> Dict[Any, int]:
+        """Count rows per value of a property, skipping rows without it"""
+        column = self.columns.get(key)
+        if column is None:
+            return {}
+        present = self.has_property(key)
+        if rows is not None:
+            present = present[rows]
+
+        if isinstance(column, CategoricalColumn):
+            codes = column.codes if rows is None else column.codes[rows]
+            codes = codes[present & (codes >= 0)]
+            counts = np.bincount(codes, minlength=len(column.categories))
+            return {category: int(count) for category, count in zip(column.categories, counts) if count}
+
+        if isinstance(column, NumericColumn):
+            values = column.values if rows is None else column.values[rows]
+            unique, counts = np.unique(values[present], return_counts=True)
+            return {column._python_type(v): int(c) for v, c in zip(unique, counts)}
+
+        values = column.values if rows is None else [column.values[row] for row in rows]
+        counts: Dict[Any, int] = {}
+        for value, has_value in zip(values, present):
+            if has_value and isinstance(value, Hashable):
+                counts[value] = counts.get(value, 0) + 1
+        return counts
@@ -0,0 +1,160 @@
+"""
+Hot reload of the disaster layers in data/
+
+A polling thread watches each layer's backing file. Once a change has
+settled (same mtime and size on two consecutive polls, so half-written
+files are skipped), the new version is parsed, validated with
+GeoJSONUtils.validate_geojson, and fully built (columns, spatial index,
+aggregates, payload) off the request path. It is then swapped in with a
+single reference update. If the new file fails to load, the old version
+stays in place and the file is not retried until it changes again.
+"""
+
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+from utils import DISASTER_TYPES, CachedLayer, GeoJSONUtils
+
+# (path, mtime_ns, size) of a layer file
+FileVersion = Tuple[str, int, int]
+
+
+class LayerWatcher:
+    """Keeps a GeoJSONUtils' layers current, reloading changed files in the background"""
+
+    def __init__(self, geojson_utils: GeoJSONUtils, interval: Optional[float] = None):
+        if interval is None:
+            interval = float(os.environ.get("LAYER_WATCH_INTERVAL", 2))
+        self.geojson_utils = geojson_utils
+        self.interval = interval
+        self.reloads = 0
+        self.failures = 0
+        self.last_error: Optional[str] = None
+        self.last_reload: Optional[str] = None
+        self._current: Dict[str, Optional[FileVersion]] = {}
+        self._seen: Dict[str, Optional[FileVersion]] = {}
+        self._failed: Dict[str, FileVersion] = {}
+        self._listeners: List[Callable] = []
+        self._check_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._thread_pid: Optional[int] = None
+
+    def add_listener(self, listener: Callable[[str, Optional[CachedLayer], Optional[CachedLayer]], None]):
+        """Call listener(disaster_type, old_layer, new_layer) after each swap"""
+        self._listeners.append(listener)
+
+    def load(self):
+        """Load every layer now, if that has not happened yet"""
+        if not self._current:
+            self.check_once(initial=True)
+
+    def start(self):
+        """
+        Load every layer now, then keep watching from a background thread.
+        Safe to call again, e.g. in a forked child, where the thread must be restarted.
+        """
+        self.load()
+        if self._thread is not None and self._thread_pid == os.getpid() and self._thread.is_alive():
+            return
+        self._thread_pid = os.getpid()
+        self._thread = threading.Thread(target=self._loop, name='layer-watcher', daemon=True)
+        self._thread.start()
+
+    def _loop(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.check_once()
+            except Exception as e:
+                logging.error(f"Layer watcher check failed: {str(e)}")
+
+    def _stat(self, disaster_type: str) -> Optional[FileVersion]:
+        path = self.geojson_utils._layer_path(disaster_type)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return path, stat.st_mtime_ns, stat.st_size
+
+    def check_once(self, initial: bool = False) -> List[str]:
+        """Reload layers whose files changed; returns the disaster types that were swapped"""
+        swapped = []
+        with self._check_lock:
+            for disaster_type in DISASTER_TYPES:
+                version = self._stat(disaster_type)
+                seen = self._seen.get(disaster_type)
+                self._seen[disaster_type] = version
+                if disaster_type in self._current and version == self._current[disaster_type]:
+                    continue
+                # Wait until the file stops changing, unless this is the first load
+                if not initial and version != seen:
+                    continue
+                if version is not None and self._failed.get(disaster_type) == version:
+                    continue
+                if self._swap(disaster_type, version, notify=not initial):
+                    swapped.append(disaster_type)
+        return swapped
+
+    def _swap(self, disaster_type: str, version: Optional[FileVersion], notify: bool = True) -> bool:
+        new_layer = None
+        if version is not None:
+            try:
+                # The version being replaced, if still resident, so its aggregates can be updated
+                current = self._current.get(disaster_type)
+                previous = self.geojson_utils.cache.peek(current[0]) if current is not None else None
+                new_layer = CachedLayer.from_file(*version, validate=self.geojson_utils.validate_geojson,
+                                                  previous=previous)
+                # Encode now so the first request after the swap does not pay for it
+                new_layer.payload
+            except Exception as e:
+                self._failed[disaster_type] = version
+                self.failures += 1
+                self.last_error = f"{version[0]}: {str(e)}"
+                if disaster_type in self._current:
+                    logging.error(f"Keeping previous {disaster_type} layer; failed to load {version[0]}: {str(e)}")
+                else:
+                    # Nothing valid to fall back on: serve the layer as empty
+                    logging.error(f"No valid {disaster_type} layer; failed to load {version[0]}: {str(e)}")
+                    self.geojson_utils.set_layer(disaster_type, None)
+                    self._current[disaster_type] = None
+                return False
+
+        old_layer = self.geojson_utils.get_layer(disaster_type) if disaster_type in self._current else None
+        self.geojson_utils.set_layer(disaster_type, new_layer)
+        self._current[disaster_type] = version
+        self._failed.pop(disaster_type, None)
+        if old_layer is None and new_layer is None:
+            return False
+
+        self.reloads += 1
+        self.last_reload = datetime.now().isoformat()
+        if version is not None:
+            logging.info(f"Loaded {disaster_type} layer from {version[0]}: {new_layer.columns.size} features")
+        if not notify:
+            return True
+        for listener in list(self._listeners):
+            try:
+                listener(disaster_type, old_layer, new_layer)
+            except Exception as e:
+                logging.error(f"Layer watcher listener failed: {str(e)}")
+        return True
+
+    def status(self) -> Dict:
+        """Watcher state for monitoring"""
+        return {
+            'running': self._thread is not None and self._thread_pid == os.getpid() and self._thread.is_alive(),
+            'interval_s': self.interval,
+            'reloads': self.reloads,
+            'failures': self.failures,
+            'last_reload': self.last_reload,
+            'last_error': self.last_error,
+            'layers': {
+                disaster_type: ({'path': version[0], 'mtime_ns': version[1], 'size': version[2]}
+                                if version is not None else None)
+                for disaster_type, version in self._current.items()
+            }
+        }
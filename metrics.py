@@ -0,0 +1,241 @@
+"""
+In-process metrics in the Prometheus text exposition format
+
+Counters, histograms and gauges are registered once at import time on the
+shared `registry` and updated on the hot path. An update is a dict lookup
+plus a few arithmetic operations under a per-series lock, so instrumentation
+stays on in production. Values are per process: under gunicorn each worker
+reports its own series, so scrape every worker or sum on the Prometheus side.
+"""
+
+import bisect
+import logging
+import math
+import threading
+import time
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Upper bounds, in seconds, of the default latency buckets
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra is not None:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Timer:
+    """Context manager observing its elapsed time on a histogram series"""
+
+    __slots__ = ('_series', '_started')
+
+    def __init__(self, series: '_HistogramSeries'):
+        self._series = series
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._series.observe(time.perf_counter() - self._started)
+        return False
+
+
+class _CounterSeries:
+    __slots__ = ('value', '_lock')
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self.value += amount
+
+
+class _HistogramSeries:
+    __slots__ = ('buckets', 'counts', 'sum', '_lock')
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        # One slot per bucket plus +Inf; cumulated only when rendered
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+
+    def time(self) -> _Timer:
+        """Time a block: `with series.time(): ...`"""
+        return _Timer(self)
+
+
+class _Metric:
+    """A named metric family; one series per combination of label values"""
+
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._series: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._unlabelled = self.labels()
+
+    def _new_series(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        """The series for these label values, created on first use"""
+        key = tuple(str(value) for value in values)
+        series = self._series.get(key)
+        if series is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {key}")
+            with self._lock:
+                series = self._series.setdefault(key, self._new_series())
+        return series
+
+    def _samples(self) -> Iterator[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {_escape(self.documentation)}', f'# TYPE {self.name} {self.kind}']
+        lines.extend(self._samples())
+        return lines
+
+
+class Counter(_Metric):
+    """Monotonically increasing count"""
+
+    kind = 'counter'
+
+    def _new_series(self):
+        return _CounterSeries()
+
+    def inc(self, amount: float = 1):
+        self._unlabelled.inc(amount)
+
+    def _samples(self):
+        for values, series in sorted(self._series.items()):
+            yield f'{self.name}{_format_labels(self.labelnames, values)} {_format_value(series.value)}'
+
+
+class Histogram(_Metric):
+    """Distribution of observations, e.g. latencies in seconds, over fixed buckets"""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_series(self):
+        return _HistogramSeries(self.buckets)
+
+    def observe(self, value: float):
+        self._unlabelled.observe(value)
+
+    def time(self) -> _Timer:
+        return self._unlabelled.time()
+
+    def _samples(self):
+        for values, series in sorted(self._series.items()):
+            with series._lock:
+                counts = list(series.counts)
+                total = series.sum
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, values, ('le', _format_value(bound)))
+                yield f'{self.name}_bucket{labels} {cumulative}'
+            labels = _format_labels(self.labelnames, values)
+            yield f'{self.name}_sum{labels} {_format_value(total)}'
+            yield f'{self.name}_count{labels} {cumulative}'
+
+
+class Gauge(_Metric):
+    """A value read when metrics are rendered, e.g. a cache size"""
+
+    kind = 'gauge'
+
+    def __init__(self, name: str, documentation: str, function: Callable[[], float]):
+        self.function = function
+        super().__init__(name, documentation)
+
+    def _new_series(self):
+        return None
+
+    def _samples(self):
+        try:
+            value = float(self.function())
+        except Exception as e:
+            # One broken gauge must not take the whole endpoint down
+            logging.error(f"Gauge {self.name} failed: {str(e)}")
+            return
+        yield f'{self.name} {_format_value(value)}'
+
+
+class MetricsRegistry:
+    """Every metric of the process, rendered together for /metrics"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                # Re-imports (e.g. the dev server's reloader) get the same metric back
+                if type(existing) is not type(metric) or existing.labelnames != metric.labelnames:
+                    raise ValueError(f"Metric {metric.name} already registered differently")
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge(self, name: str, documentation: str, function: Callable[[], float]) -> Gauge:
+        gauge = self._register(Gauge(name, documentation, function))
+        gauge.function = function
+        return gauge
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+# Shared by every module in the process
+registry = MetricsRegistry()
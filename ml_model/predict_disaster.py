@@ -4,20 +4,87 @@ Placeholder implementation for disaster risk classification
 """
 
 import numpy as np
+import hashlib
 import logging
-from typing import Dict, Tuple
+import os
+import sys
+from typing import Dict, Optional, Tuple
 import random
 from datetime import datetime
 
+if not __package__:
+    # Run directly (python ml_model/predict_disaster.py): the repo root holds
+    # the metrics module and the ml_model package
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from metrics import registry as metrics_registry
+from ml_model.feature_store import FeatureStore, feature_store as shared_feature_store
+
+# Where prediction time goes, per stage, for single and batch predictions
+PREDICT_STAGE_SECONDS = metrics_registry.histogram(
+    'ml_predict_stage_seconds', 'Duration of DisasterPredictor prediction stages', ('mode', 'stage')
+)
+PREDICTIONS = metrics_registry.counter(
+    'ml_predictions_total', 'DisasterPredictor calls by mode and outcome', ('mode', 'outcome')
+)
+PREDICTED_POINTS = metrics_registry.counter(
+    'ml_predicted_points_total', 'Coordinates scored by DisasterPredictor', ('mode',)
+)
+
+# Feature store namespace of the environmental features columns 4-9
+ENVIRONMENT_FEATURES = 'environment'
+
+# Satellite readings returned by get_satellite_data, in stored column order
+SATELLITE_BANDS = ('ndvi', 'ndwi', 'land_surface_temperature', 'precipitation', 'cloud_cover')
+
+# Normalized feature columns, 0 to 1, behind each hazard's `factors`
+FACTOR_INPUTS = ('vegetation', 'water_proximity', 'elevation', 'temperature', 'precipitation')
+
+
+def hazard_factors(inputs: Dict[str, float], scores: Dict[str, float]) -> Dict[str, Dict[str, float]]:
+    """Per-hazard `factors`, as the scalar predictors report them, from FACTOR_INPUTS and hazard scores"""
+    return {
+        'flood': {
+            'elevation': inputs['elevation'],
+            'water_proximity': inputs['water_proximity'],
+            'precipitation': inputs['precipitation']
+        },
+        'wildfire': {
+            'vegetation': inputs['vegetation'],
+            'temperature': inputs['temperature'],
+            'dryness': 1 - inputs['precipitation']
+        },
+        'drought': {
+            'precipitation_deficit': 1 - inputs['precipitation'],
+            'temperature': inputs['temperature'],
+            'vegetation_stress': 1 - inputs['vegetation']
+        },
+        'earthquake': {
+            'seismic_zone': float(scores['earthquake'] > 0.4),
+            'fault_proximity': float(scores['earthquake'] > 0.3),
+            'historical_activity': float(scores['earthquake'] > 0.2)
+        }
+    }
+
 class DisasterPredictor:
     """
     Placeholder ML model for disaster risk prediction
     In production, this would use real satellite imagery and trained models
     """
     
-    def __init__(self):
+    # Names the trained weights; fingerprint() adds a hash of their contents
+    model_version = 'placeholder-1'
+    
+    # Trained weight files, e.g. 'models/flood_classifier.h5'
+    model_files: Tuple[str, ...] = ()
+    
+    # Identifies the feature extraction; bump it when extraction changes so stored features are recomputed
+    feature_extractor_version = 'placeholder-features-1'
+    
+    def __init__(self, feature_store: Optional[FeatureStore] = None):
         self.model_loaded = False
         self.feature_extractors = {}
+        self.feature_store = feature_store if feature_store is not None else shared_feature_store
         
         # Simulate model loading
         self._load_model()
@@ -43,6 +110,23 @@ class DisasterPredictor:
             logging.error(f"Failed to load ML models: {str(e)}")
             self.model_loaded = False
     
+    def fingerprint(self) -> str:
+        """
+        Identity of the loaded model: model_version plus a hash of the weight
+        files and the feature extractor version. Equal in every process that
+        loads the same model, so precomputed output such as the risk raster is
+        keyed on it.
+        """
+        digest = hashlib.sha256(
+            f"{type(self).__module__}.{type(self).__qualname__}\0{self.model_version}\0"
+            f"{self.feature_extractor_version}".encode('utf-8')
+        )
+        for path in self.model_files:
+            with open(path, 'rb') as f:
+                for block in iter(lambda: f.read(1 << 20), b''):
+                    digest.update(block)
+        return f"{self.model_version}-{digest.hexdigest()[:12]}"
+    
     def predict_risk(self, lat: float, lon: float) -> Dict:
         """
         Predict disaster risk for given coordinates
@@ -55,6 +139,7 @@ class DisasterPredictor:
             Dictionary containing risk assessment
         """
         if not self.model_loaded:
+            PREDICTIONS.labels('single', 'unavailable').inc()
             return {
                 'risk_level': 'unknown',
                 'confidence': 0.0,
@@ -64,16 +149,21 @@ class DisasterPredictor:
         
         try:
             # Extract features from coordinates (placeholder)
-            features = self._extract_features(lat, lon)
+            with PREDICT_STAGE_SECONDS.labels('single', 'extract_features').time():
+                features = self._extract_features(lat, lon)
             
             # Get predictions for each disaster type
             predictions = {}
             
             # Simulate ML predictions
-            flood_risk = self._predict_flood_risk(features)
-            fire_risk = self._predict_fire_risk(features)
-            drought_risk = self._predict_drought_risk(features)
-            earthquake_risk = self._predict_earthquake_risk(features)
+            with PREDICT_STAGE_SECONDS.labels('single', 'flood').time():
+                flood_risk = self._predict_flood_risk(features)
+            with PREDICT_STAGE_SECONDS.labels('single', 'wildfire').time():
+                fire_risk = self._predict_fire_risk(features)
+            with PREDICT_STAGE_SECONDS.labels('single', 'drought').time():
+                drought_risk = self._predict_drought_risk(features)
+            with PREDICT_STAGE_SECONDS.labels('single', 'earthquake').time():
+                earthquake_risk = self._predict_earthquake_risk(features)
             
             predictions = {
                 'flood': flood_risk,
@@ -83,8 +173,11 @@ class DisasterPredictor:
             }
             
             # Calculate overall risk
-            overall_risk, confidence = self._calculate_overall_risk(predictions)
+            with PREDICT_STAGE_SECONDS.labels('single', 'overall').time():
+                overall_risk, confidence = self._calculate_overall_risk(predictions)
             
+            PREDICTIONS.labels('single', 'ok').inc()
+            PREDICTED_POINTS.labels('single').inc()
             return {
                 'risk_level': overall_risk,
                 'confidence': confidence,
@@ -95,6 +188,7 @@ class DisasterPredictor:
             
         except Exception as e:
             logging.error(f"ML prediction error: {str(e)}")
+            PREDICTIONS.labels('single', 'error').inc()
             return {
                 'risk_level': 'unknown',
                 'confidence': 0.0,
@@ -102,9 +196,114 @@ class DisasterPredictor:
                 'error': str(e)
             }
     
+    def predict_risk_batch(self, lats, lons, factor_inputs: bool = False) -> Dict:
+        """
+        Predict disaster risk for many coordinates at once
+        
+        Args:
+            lats: Sequence or array of latitudes
+            lons: Sequence or array of longitudes, same length as lats
+            factor_inputs: Also return the FACTOR_INPUTS columns, for hazard_factors
+            
+        Returns:
+            Dictionary of per-point lists (column oriented) containing risk assessments
+        """
+        lats = np.asarray(lats, dtype=np.float64).ravel()
+        lons = np.asarray(lons, dtype=np.float64).ravel()
+        if lats.shape != lons.shape:
+            raise ValueError("lats and lons must have the same length")
+        
+        if not self.model_loaded:
+            PREDICTIONS.labels('batch', 'unavailable').inc()
+            return {
+                'count': len(lats),
+                'risk_level': ['unknown'] * len(lats),
+                'confidence': [0.0] * len(lats),
+                'predictions': {},
+                'error': 'Models not available'
+            }
+        
+        with PREDICT_STAGE_SECONDS.labels('batch', 'extract_features').time():
+            features = self._extract_features_batch(lats, lons)
+        
+        # One column per hazard, in the same order as the overall weights
+        with PREDICT_STAGE_SECONDS.labels('batch', 'hazards').time():
+            scores = np.column_stack([
+                self._predict_flood_risk_batch(features),
+                self._predict_fire_risk_batch(features),
+                self._predict_drought_risk_batch(features),
+                self._predict_earthquake_risk_batch(features),
+            ])
+        with PREDICT_STAGE_SECONDS.labels('batch', 'overall').time():
+            overall_scores, confidence = self._calculate_overall_risk_batch(scores)
+        
+        with PREDICT_STAGE_SECONDS.labels('batch', 'serialize').time():
+            predictions = {}
+            for column, disaster_type in enumerate(('flood', 'wildfire', 'drought', 'earthquake')):
+                predictions[disaster_type] = {
+                    'risk_score': scores[:, column].tolist(),
+                    'risk_level': self._scores_to_levels(scores[:, column]).tolist()
+                }
+            overall_levels = self._scores_to_levels(overall_scores).tolist()
+            overall_score_list = overall_scores.tolist()
+            confidence = confidence.tolist()
+        
+        PREDICTIONS.labels('batch', 'ok').inc()
+        PREDICTED_POINTS.labels('batch').inc(len(lats))
+        result = {
+            'count': len(lats),
+            'risk_level': overall_levels,
+            'risk_score': overall_score_list,
+            'confidence': confidence,
+            'predictions': predictions,
+            'features_extracted': features.shape[1],
+            'timestamp': datetime.now().isoformat()
+        }
+        if factor_inputs:
+            result['factor_inputs'] = {
+                name: column.tolist()
+                for name, column in zip(FACTOR_INPUTS, self._factor_inputs_batch(features).T)
+            }
+        return result
+    
     def _extract_features(self, lat: float, lon: float) -> np.ndarray:
         """
         Extract features from coordinates for ML prediction
+        Location columns come from the exact point; environmental columns are
+        shared by its geohash cell and read from the feature store
+        """
+        environment = self.feature_store.get(ENVIRONMENT_FEATURES, self.feature_extractor_version,
+                                             lat, lon, self._extract_environment_batch)
+        
+        features = np.array([
+            lat,
+            lon,
+            abs(lat),  # Distance from equator
+            abs(lon),  # Distance from prime meridian
+            *environment
+        ])
+        
+        return features
+    
+    def _extract_features_batch(self, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+        """
+        Extract an (N, 10) feature matrix, one row per coordinate,
+        with the same columns as _extract_features
+        """
+        environment = self.feature_store.get_many(ENVIRONMENT_FEATURES, self.feature_extractor_version,
+                                                  lats, lons, self._extract_environment_batch)
+        
+        return np.column_stack([
+            lats,
+            lons,
+            np.abs(lats),  # Distance from equator
+            np.abs(lons),  # Distance from prime meridian
+            environment
+        ])
+    
+    def _extract_environment_batch(self, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+        """
+        Environmental features, columns 4-9 of the feature matrix, for an array of cell centres
         In production, this would process satellite imagery and environmental data
         """
         # Placeholder feature extraction
@@ -113,21 +312,83 @@ class DisasterPredictor:
         # - Extract NDVI, NDWI, temperature, precipitation data
         # - Process topographical information
         # - Calculate distance to water bodies, urban areas, etc.
+        n = len(lats)
+        rng = np.random.default_rng()
         
-        features = np.array([
-            lat,
-            lon,
-            abs(lat),  # Distance from equator
-            abs(lon),  # Distance from prime meridian
-            random.uniform(0, 1),  # Simulated vegetation index
-            random.uniform(0, 1),  # Simulated water index
-            random.uniform(0, 100),  # Simulated elevation
-            random.uniform(0, 50),  # Simulated temperature
-            random.uniform(0, 200),  # Simulated precipitation
-            random.uniform(0, 1),   # Simulated urbanization index
+        return np.column_stack([
+            rng.uniform(0, 1, n),  # Simulated vegetation index
+            rng.uniform(0, 1, n),  # Simulated water index
+            rng.uniform(0, 100, n),  # Simulated elevation
+            rng.uniform(0, 50, n),  # Simulated temperature
+            rng.uniform(0, 200, n),  # Simulated precipitation
+            rng.uniform(0, 1, n),   # Simulated urbanization index
         ])
+    
+    def prefetch_features(self, bbox: Tuple[float, float, float, float], date_range: int = 30) -> Dict:
+        """
+        Extract and store the environmental and satellite features of every
+        geohash cell in a (min_lon, min_lat, max_lon, max_lat) bbox ahead of
+        the predictions that will need them
+        """
+        return {
+            'environment': self.feature_store.prefetch(ENVIRONMENT_FEATURES, self.feature_extractor_version,
+                                                       bbox, self._extract_environment_batch),
+            'satellite': self.feature_store.prefetch(f'satellite-{date_range}d', self.feature_extractor_version,
+                                                     bbox, self._fetch_satellite_batch)
+        }
+    
+    def _factor_inputs_batch(self, features: np.ndarray) -> np.ndarray:
+        """(N, 5) FACTOR_INPUTS columns, normalized as in the hazard predictors"""
+        return np.column_stack([
+            features[:, 4],  # Vegetation index
+            features[:, 5],  # Water index
+            features[:, 6] / 100.0,  # Elevation
+            features[:, 7] / 50.0,  # Temperature
+            features[:, 8] / 200.0,  # Precipitation
+        ])
+    
+    def _noise(self, n: int) -> np.ndarray:
+        """Per-point model noise, matching the scalar predictors"""
+        return np.random.default_rng().uniform(-0.2, 0.2, n)
+    
+    def _predict_flood_risk_batch(self, features: np.ndarray) -> np.ndarray:
+        """Vectorized flood risk scores for a feature matrix"""
+        elevation_factor = features[:, 6] / 100.0
+        water_index = features[:, 5]
+        precipitation = features[:, 8] / 200.0
         
-        return features
+        risk_score = (1 - elevation_factor) * 0.4 + water_index * 0.3 + precipitation * 0.3
+        return np.clip(risk_score + self._noise(len(features)), 0, 1)
+    
+    def _predict_fire_risk_batch(self, features: np.ndarray) -> np.ndarray:
+        """Vectorized wildfire risk scores for a feature matrix"""
+        vegetation_index = features[:, 4]
+        temperature = features[:, 7] / 50.0
+        precipitation = features[:, 8] / 200.0
+        
+        risk_score = vegetation_index * 0.4 + temperature * 0.4 + (1 - precipitation) * 0.2
+        return np.clip(risk_score + self._noise(len(features)), 0, 1)
+    
+    def _predict_drought_risk_batch(self, features: np.ndarray) -> np.ndarray:
+        """Vectorized drought risk scores for a feature matrix"""
+        precipitation = features[:, 8] / 200.0
+        temperature = features[:, 7] / 50.0
+        vegetation_index = features[:, 4]
+        
+        risk_score = (1 - precipitation) * 0.5 + temperature * 0.3 + (1 - vegetation_index) * 0.2
+        return np.clip(risk_score + self._noise(len(features)), 0, 1)
+    
+    def _predict_earthquake_risk_batch(self, features: np.ndarray) -> np.ndarray:
+        """Vectorized earthquake risk scores for a feature matrix"""
+        lat, lon = features[:, 0], features[:, 1]
+        
+        # Same simplified seismic zones as _predict_earthquake_risk
+        risk_score = np.full(len(features), 0.3)
+        risk_score += 0.5 * ((-125 < lon) & (lon < -115) & (32 < lat) & (lat < 42))  # California coast
+        risk_score += 0.3 * ((-92 < lon) & (lon < -87) & (33 < lat) & (lat < 40))  # New Madrid zone
+        risk_score += 0.4 * ((-180 < lon) & (lon < -130) & (55 < lat) & (lat < 72))  # Alaska
+        
+        return np.clip(risk_score + self._noise(len(features)), 0, 1)
     
     def _predict_flood_risk(self, features: np.ndarray) -> Dict:
         """Predict flood risk based on features"""
@@ -238,6 +499,19 @@ class DisasterPredictor:
         
         return risk_level, float(confidence)
     
+    def _calculate_overall_risk_batch(self, scores: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Overall scores and confidences for an (N, 4) hazard score matrix"""
+        weights = np.array([0.3, 0.3, 0.2, 0.2])  # flood, fire, drought, earthquake
+        
+        overall_scores = scores @ weights
+        confidence = 1 - np.std(scores, axis=1)
+        
+        return overall_scores, confidence
+    
+    def _scores_to_levels(self, scores: np.ndarray) -> np.ndarray:
+        """Vectorized _score_to_level"""
+        return np.where(scores >= 0.7, 'high', np.where(scores >= 0.4, 'medium', 'low'))
+    
     def _score_to_level(self, score: float) -> str:
         """Convert numerical score to risk level"""
         if score >= 0.7:
@@ -249,7 +523,23 @@ class DisasterPredictor:
     
     def get_satellite_data(self, lat: float, lon: float, date_range: int = 30) -> Dict:
         """
-        Placeholder for satellite data retrieval
+        Satellite readings for the geohash cell holding a point, fetched once
+        per cell, day and date range and then served from the feature store.
+        The response has the same fields and formats as a direct fetch.
+        """
+        values = self.feature_store.get(f'satellite-{date_range}d', self.feature_extractor_version,
+                                        lat, lon, self._fetch_satellite_batch)
+        
+        result = {band: float(value) for band, value in zip(SATELLITE_BANDS, values)}
+        result.update({
+            'data_source': 'simulated',
+            'acquisition_date': datetime.now().isoformat()
+        })
+        return result
+    
+    def _fetch_satellite_batch(self, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+        """
+        Placeholder for satellite data retrieval, one SATELLITE_BANDS row per cell centre
         In production, this would interface with satellite data APIs
         """
         # This would integrate with services like:
@@ -257,16 +547,16 @@ class DisasterPredictor:
         # - ESA Copernicus
         # - Google Earth Engine
         # - Planet Labs
+        n = len(lats)
+        rng = np.random.default_rng()
         
-        return {
-            'ndvi': random.uniform(0, 1),
-            'ndwi': random.uniform(0, 1),
-            'land_surface_temperature': random.uniform(250, 350),
-            'precipitation': random.uniform(0, 200),
-            'cloud_cover': random.uniform(0, 100),
-            'data_source': 'simulated',
-            'acquisition_date': datetime.now().isoformat()
-        }
+        return np.column_stack([
+            rng.uniform(0, 1, n),  # NDVI
+            rng.uniform(0, 1, n),  # NDWI
+            rng.uniform(250, 350, n),  # Land surface temperature
+            rng.uniform(0, 200, n),  # Precipitation
+            rng.uniform(0, 100, n),  # Cloud cover
+        ])
     
     def retrain_model(self, training_data: Dict):
         """
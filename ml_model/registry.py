@@ -0,0 +1,105 @@
+"""
+Model Registry
+Loads disaster predictors once per process and shares them across requests and threads
+"""
+
+import logging
+import os
+import threading
+from datetime import datetime
+from typing import Callable, Dict, Optional, Tuple
+
+from ml_model.predict_disaster import DisasterPredictor
+
+# Points used to exercise a freshly loaded model before it serves traffic
+WARM_UP_POINTS = [
+    (40.7128, -74.0060),   # New York
+    (35.6762, 139.6503),   # Tokyo
+    (-33.8688, 151.2093),  # Sydney
+]
+
+
+class ModelRegistry:
+    """
+    Process-wide holder of the active DisasterPredictor.
+    The predictor is loaded once, either eagerly via preload() or lazily on
+    first use, and replaced atomically by reload(): requests already holding
+    the previous predictor finish with it, new requests get the new one.
+    """
+
+    def __init__(self, factory: Callable[[], DisasterPredictor] = DisasterPredictor):
+        self._factory = factory
+        self._predictor: Optional[DisasterPredictor] = None
+        self._load_lock = threading.Lock()
+        self.version = 0
+        self.loaded_at: Optional[str] = None
+        # DisasterPredictor.fingerprint() of the active model, the same in every worker that loaded it
+        self.model_version: Optional[str] = None
+
+    def get(self) -> DisasterPredictor:
+        """Return the active predictor, loading it on first use"""
+        predictor = self._predictor
+        if predictor is None:
+            with self._load_lock:
+                # Another thread may have loaded it while we waited
+                if self._predictor is None:
+                    self._activate(self._build(self._factory))
+                predictor = self._predictor
+        return predictor
+
+    @property
+    def factory(self) -> Callable[[], DisasterPredictor]:
+        """Callable that builds the active model; also used by risk raster build workers"""
+        return self._factory
+
+    def preload(self) -> DisasterPredictor:
+        """Load and warm up the predictor at worker startup"""
+        return self.get()
+
+    def reload(self, factory: Optional[Callable[[], DisasterPredictor]] = None) -> DisasterPredictor:
+        """
+        Load a new model version and swap it in atomically.
+        The current predictor stays active if the new one fails to load.
+        """
+        with self._load_lock:
+            factory = factory or self._factory
+            built = self._build(factory)
+            self._factory = factory
+            self._activate(built)
+            return built[0]
+
+    def _build(self, factory: Callable[[], DisasterPredictor]) -> Tuple[DisasterPredictor, str]:
+        """Construct and warm up a predictor without exposing it yet; returns it with its fingerprint"""
+        predictor = factory()
+        if not predictor.model_loaded:
+            raise RuntimeError("Disaster prediction models failed to load")
+        self.warm_up(predictor)
+        return predictor, predictor.fingerprint()
+
+    def _activate(self, built: Tuple[DisasterPredictor, str]):
+        predictor, self.model_version = built
+        # A single reference assignment, so readers see either version whole
+        self._predictor = predictor
+        self.version += 1
+        self.loaded_at = datetime.now().isoformat()
+        logging.info(f"Disaster prediction model version {self.version} ({self.model_version}) active")
+
+    def warm_up(self, predictor: DisasterPredictor):
+        """Run a few predictions so first real requests don't pay one-off costs"""
+        for lat, lon in WARM_UP_POINTS:
+            predictor.predict_risk(lat, lon)
+        predictor.predict_risk_batch([p[0] for p in WARM_UP_POINTS], [p[1] for p in WARM_UP_POINTS])
+
+    def status(self) -> Dict:
+        """Registry state for monitoring"""
+        return {
+            'pid': os.getpid(),
+            'loaded': self._predictor is not None,
+            'version': self.version,
+            'model_version': self.model_version,
+            'loaded_at': self.loaded_at
+        }
+
+
+# Shared by every request handled by this process
+model_registry = ModelRegistry()
@@ -0,0 +1,409 @@
+"""
+Precomputed global risk raster (.dmr)
+
+The predictor is evaluated once over a regular lat/lon grid and the hazard,
+overall and confidence scores are stored as uint8 bands (score * 255),
+interleaved per grid node. A point lookup reads the four surrounding nodes
+of a memory-mapped file and interpolates them bilinearly, so it costs the
+same whatever the model does per point.
+
+Layout: an 8-byte magic, a little-endian uint64 header length, a JSON header,
+padding to an 8-byte boundary, then a (rows, cols, bands) uint8 array. Rows
+run from latitude -90 to 90 inclusive; columns from longitude -180 in steps of
+the resolution, wrapping at the antimeridian.
+
+Besides the scores, the normalized feature columns behind each hazard's
+`factors` are stored as bands too, so lookups answer in the same shape as
+DisasterPredictor.predict_risk.
+
+Builds split the grid into row chunks that a pool of worker processes
+evaluates and writes straight into the new file, which then replaces the old
+one atomically. The pool runs in a separate `python -m ml_model.risk_raster`
+process, so pool workers import only ml_model, never the server's __main__.
+"""
+
+import fcntl
+import json
+import logging
+import mmap
+import multiprocessing
+import os
+import pickle
+import struct
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+from ml_model.feature_store import FeatureStore
+from ml_model.predict_disaster import FACTOR_INPUTS, PREDICTIONS, DisasterPredictor, hazard_factors
+
+MAGIC = b'DMRASTR1'
+FORMAT_VERSION = 2
+ALIGNMENT = 8
+RASTER_SUFFIX = '.dmr'
+
+HAZARDS = ('flood', 'wildfire', 'drought', 'earthquake')
+BANDS = HAZARDS + ('overall', 'confidence') + FACTOR_INPUTS
+
+# Spare header bytes, so fields known only after the build fit in place
+HEADER_RESERVE = 64
+
+# Grid rows evaluated per worker task
+CHUNK_ROWS = 16
+
+# Seconds between checks for a raster rebuilt by another process
+CHECK_INTERVAL = 1.0
+
+
+def grid_shape(resolution_deg: float) -> Tuple[int, int]:
+    """(rows, cols) of the grid; the resolution must divide 180 degrees evenly"""
+    rows = 180 / resolution_deg
+    if resolution_deg <= 0 or abs(rows - round(rows)) > 1e-9:
+        raise ValueError(f"Raster resolution must divide 180 degrees evenly, got {resolution_deg}")
+    return int(round(rows)) + 1, 2 * int(round(rows))
+
+
+def _quantize(scores) -> np.ndarray:
+    return np.rint(np.clip(np.asarray(scores, dtype=np.float64), 0, 1) * 255).astype(np.uint8)
+
+
+def _score_to_level(score: float) -> str:
+    # Same thresholds as DisasterPredictor._score_to_level
+    if score >= 0.7:
+        return 'high'
+    if score >= 0.4:
+        return 'medium'
+    return 'low'
+
+
+# Predictor of a build worker process, created once by _init_worker
+_worker_predictor: Optional[DisasterPredictor] = None
+
+
+def _init_worker(factory: Callable[[], DisasterPredictor]):
+    global _worker_predictor
+    _worker_predictor = factory()
+    # Every grid node falls in its own geohash cell and is never looked up
+    # again, so storing its features would only grow the shared day files
+    _worker_predictor.feature_store = FeatureStore(enabled=False)
+
+
+def _fill_rows(task: Tuple) -> int:
+    """Evaluate grid rows [row_start, row_end) and write them into the raster file; returns the feature count"""
+    path, offset, rows, cols, resolution, row_start, row_end = task
+    lats = -90 + np.arange(row_start, row_end) * resolution
+    lons = -180 + np.arange(cols) * resolution
+    result = _worker_predictor.predict_risk_batch(np.repeat(lats, cols), np.tile(lons, len(lats)),
+                                                  factor_inputs=True)
+
+    block = np.empty((len(lats) * cols, len(BANDS)), dtype=np.uint8)
+    for band, hazard in enumerate(HAZARDS):
+        block[:, band] = _quantize(result['predictions'][hazard]['risk_score'])
+    block[:, BANDS.index('overall')] = _quantize(result['risk_score'])
+    block[:, BANDS.index('confidence')] = _quantize(result['confidence'])
+    for name in FACTOR_INPUTS:
+        block[:, BANDS.index(name)] = _quantize(result['factor_inputs'][name])
+
+    data = np.memmap(path, dtype=np.uint8, mode='r+', offset=offset, shape=(rows, cols, len(BANDS)))
+    data[row_start:row_end] = block.reshape(len(lats), cols, len(BANDS))
+    data.flush()
+    del data
+    return result['features_extracted']
+
+
+def _header_bytes(header: Dict, size: int) -> bytes:
+    encoded = json.dumps(header).encode('utf-8')
+    if len(encoded) > size:
+        raise ValueError("Risk raster header outgrew its reserved space")
+    return encoded + b' ' * (size - len(encoded))
+
+
+def build_raster(path: str, factory: Callable[[], DisasterPredictor], model_version: str,
+                 resolution_deg: float, processes: int = 1) -> Dict:
+    """Evaluate the predictor over the whole grid into a new raster file; returns its header"""
+    rows, cols = grid_shape(resolution_deg)
+    header = {
+        'format_version': FORMAT_VERSION,
+        'resolution_deg': resolution_deg,
+        'rows': rows,
+        'cols': cols,
+        'bands': list(BANDS),
+        'scale': 255,
+        'model_version': model_version,
+        'built_at': datetime.now().isoformat(),
+        'features_extracted': None,
+    }
+    header_size = len(json.dumps(header)) + HEADER_RESERVE
+    header_size += (-(len(MAGIC) + 8 + header_size)) % ALIGNMENT
+    offset = len(MAGIC) + 8 + header_size
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(struct.pack('<Q', header_size))
+        f.write(_header_bytes(header, header_size))
+        f.truncate(offset + rows * cols * len(BANDS))
+
+    tasks = [(tmp_path, offset, rows, cols, resolution_deg, start, min(start + CHUNK_ROWS, rows))
+             for start in range(0, rows, CHUNK_ROWS)]
+    try:
+        if processes > 1:
+            # Spawned, not forked, in case the caller runs threads
+            context = multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(max_workers=processes, mp_context=context,
+                                     initializer=_init_worker, initargs=(factory,)) as pool:
+                feature_counts = set(pool.map(_fill_rows, tasks))
+        else:
+            _init_worker(factory)
+            feature_counts = {_fill_rows(task) for task in tasks}
+        header['features_extracted'] = feature_counts.pop()
+        with open(tmp_path, 'r+b') as f:
+            f.seek(len(MAGIC) + 8)
+            f.write(_header_bytes(header, header_size))
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return header
+
+
+def build_raster_isolated(path: str, factory: Callable[[], DisasterPredictor], model_version: str,
+                          resolution_deg: float, processes: int = 1) -> Dict:
+    """
+    build_raster, with any process pool started from a fresh `python -m
+    ml_model.risk_raster` launcher. Spawned workers re-import their parent's
+    __main__; started from the server, that would be app.py or main.py.
+    """
+    if processes <= 1:
+        return build_raster(path, factory, model_version, resolution_deg)
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [root, env.get('PYTHONPATH')]))
+    launcher = subprocess.run(
+        [sys.executable, '-m', 'ml_model.risk_raster', path, model_version, str(resolution_deg), str(processes)],
+        input=pickle.dumps(factory), stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env
+    )
+    if launcher.returncode != 0:
+        lines = launcher.stderr.decode('utf-8', 'replace').strip().splitlines()
+        raise RuntimeError(lines[-1] if lines else f"Raster build exited with status {launcher.returncode}")
+    return json.loads(launcher.stdout)
+
+
+class _OpenRaster:
+    """A mapped raster file"""
+
+    def __init__(self, path: str):
+        with open(path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.mm[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a risk raster")
+        (header_length,) = struct.unpack_from('<Q', self.mm, len(MAGIC))
+        start = len(MAGIC) + 8
+        self.header = json.loads(self.mm[start:start + header_length])
+        if self.header['format_version'] != FORMAT_VERSION or tuple(self.header['bands']) != BANDS:
+            raise ValueError(f"{path} has an unsupported raster layout")
+        self.version = (stat.st_mtime_ns, stat.st_size)
+        self.rows = self.header['rows']
+        self.cols = self.header['cols']
+        self.resolution = self.header['resolution_deg']
+        self.data = np.frombuffer(self.mm, dtype=np.uint8, count=self.rows * self.cols * len(BANDS),
+                                  offset=start + header_length).reshape(self.rows, self.cols, len(BANDS))
+
+    def sample(self, lat: float, lon: float) -> np.ndarray:
+        """Bilinearly interpolated band scores, 0 to 1, at a point"""
+        row = (min(max(lat, -90.0), 90.0) + 90.0) / self.resolution
+        col = ((lon + 180.0) % 360.0) / self.resolution
+        i = min(int(row), self.rows - 2)
+        j = int(col) % self.cols
+        fy = row - i
+        fx = col - int(col)
+        j1 = (j + 1) % self.cols
+        data = self.data
+        top = data[i, j] * (1 - fx) + data[i, j1] * fx
+        bottom = data[i + 1, j] * (1 - fx) + data[i + 1, j1] * fx
+        return (top * (1 - fy) + bottom * fy) / self.header['scale']
+
+
+class RiskRaster:
+    """
+    The process's view of the risk raster file: lookups, staleness and rebuilds.
+    A raster only answers for the model version it was built from, the
+    registry's DisasterPredictor.fingerprint(); otherwise lookup() returns None
+    and callers fall back to the live predictor. Workers holding another model,
+    e.g. after a reload in a different worker, thus never serve its raster.
+    """
+
+    def __init__(self, path: Optional[str] = None, resolution_deg: Optional[float] = None,
+                 processes: Optional[int] = None):
+        if path is None:
+            path = os.environ.get("RISK_RASTER_PATH", os.path.join("data", f"risk_raster{RASTER_SUFFIX}"))
+        if resolution_deg is None:
+            resolution_deg = float(os.environ.get("RISK_RASTER_RESOLUTION", 0.25))
+        if processes is None:
+            processes = int(os.environ.get("RISK_RASTER_PROCESSES", os.cpu_count() or 1))
+        grid_shape(resolution_deg)
+        self.path = path
+        self.resolution_deg = resolution_deg
+        self.processes = processes
+        self.builds = 0
+        self.last_build_seconds: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self._raster: Optional[_OpenRaster] = None
+        self._checked_at = 0.0
+        self._open_lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._building = False
+        self._pending: Optional[Tuple[Callable, str]] = None
+
+    def _current(self, model_version: Optional[str]) -> Optional[_OpenRaster]:
+        """
+        The mapped raster if it was built by model_version (any model when None),
+        re-mapped when another process replaced the file
+        """
+        now = time.monotonic()
+        if now - self._checked_at >= CHECK_INTERVAL:
+            self._checked_at = now
+            self._refresh()
+        raster = self._raster
+        if raster is None or (model_version is not None and raster.header['model_version'] != model_version):
+            return None
+        return raster
+
+    def _refresh(self):
+        with self._open_lock:
+            try:
+                stat = os.stat(self.path)
+            except FileNotFoundError:
+                self._raster = None
+                return
+            if self._raster is not None and self._raster.version == (stat.st_mtime_ns, stat.st_size):
+                return
+            try:
+                self._raster = _OpenRaster(self.path)
+            except (OSError, ValueError, KeyError) as e:
+                self.last_error = str(e)
+                logging.error(f"Failed to open risk raster {self.path}: {str(e)}")
+                self._raster = None
+
+    def is_current(self, model_version: str) -> bool:
+        """Whether lookups for this model version can be answered from the raster"""
+        return self._current(model_version) is not None
+
+    def lookup(self, lat: float, lon: float, model_version: str) -> Optional[Dict]:
+        """Risk assessment at a point shaped like predict_risk's, or None if no raster for this model version"""
+        raster = self._current(model_version)
+        if raster is None:
+            return None
+        scores = [round(float(score), 4) for score in raster.sample(lat, lon)]
+        factors = hazard_factors(
+            {name: scores[BANDS.index(name)] for name in FACTOR_INPUTS},
+            {hazard: scores[band] for band, hazard in enumerate(HAZARDS)}
+        )
+        PREDICTIONS.labels('raster', 'ok').inc()
+        return {
+            'risk_level': _score_to_level(scores[BANDS.index('overall')]),
+            'confidence': scores[BANDS.index('confidence')],
+            'predictions': {
+                hazard: {'risk_score': scores[band],
+                         'risk_level': _score_to_level(scores[band]),
+                         'factors': {name: round(value, 4) for name, value in factors[hazard].items()}}
+                for band, hazard in enumerate(HAZARDS)
+            },
+            'features_extracted': raster.header['features_extracted'],
+            'source': 'raster',
+            'resolution_deg': raster.resolution,
+            'timestamp': raster.header['built_at']
+        }
+
+    def rebuild(self, factory: Callable[[], DisasterPredictor], model_version: str) -> bool:
+        """
+        Build the raster for a model version. Called while a build is running in
+        this process, the request is queued and built next; returns False without
+        building if another process (gunicorn worker) holds the build lock.
+        """
+        with self._build_lock:
+            if self._building:
+                self._pending = (factory, model_version)
+                return False
+            self._building = True
+        built = False
+        try:
+            while True:
+                built = self._build(factory, model_version)
+                with self._build_lock:
+                    if self._pending is None:
+                        self._building = False
+                        return built
+                    factory, model_version = self._pending
+                    self._pending = None
+        except BaseException:
+            with self._build_lock:
+                self._building = False
+            raise
+
+    def _build(self, factory: Callable[[], DisasterPredictor], model_version: str) -> bool:
+        lock_path = self.path + '.lock'
+        try:
+            directory = os.path.dirname(lock_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(lock_path, 'w') as lock_file:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    logging.info("Risk raster is being built by another process")
+                    return False
+                started = time.perf_counter()
+                build_raster_isolated(self.path, factory, model_version, self.resolution_deg, self.processes)
+                self.last_build_seconds = round(time.perf_counter() - started, 3)
+                self.builds += 1
+                self.last_error = None
+                self._checked_at = 0.0
+                self._refresh()
+                logging.info(f"Built risk raster for model {model_version} in {self.last_build_seconds}s")
+                return True
+        except Exception as e:
+            self.last_error = str(e)
+            logging.error(f"Risk raster build failed: {str(e)}")
+            return False
+
+    def rebuild_async(self, factory: Callable[[], DisasterPredictor], model_version: str):
+        """rebuild() in a background thread"""
+        threading.Thread(target=self.rebuild, args=(factory, model_version),
+                         name='risk-raster', daemon=True).start()
+
+    def status(self) -> Dict:
+        """Raster state for monitoring"""
+        raster = self._current(None)
+        return {
+            'path': self.path,
+            'available': raster is not None,
+            'model_version': raster.header['model_version'] if raster is not None else None,
+            'resolution_deg': raster.resolution if raster is not None else self.resolution_deg,
+            'built_at': raster.header['built_at'] if raster is not None else None,
+            'building': self._building,
+            'builds': self.builds,
+            'last_build_seconds': self.last_build_seconds,
+            'last_error': self.last_error
+        }
+
+
+if __name__ == "__main__":
+    # Build launcher for build_raster_isolated: argv names the raster, stdin holds the pickled factory
+    logging.basicConfig(level=os.environ.get("LOG_LEVEL", "INFO"))
+    raster_path, version, resolution, pool_size = sys.argv[1:5]
+    built = build_raster(raster_path, pickle.loads(sys.stdin.buffer.read()), version,
+                         float(resolution), int(pool_size))
+    print(json.dumps(built))
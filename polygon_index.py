@@ -0,0 +1,394 @@
+"""
+Polygon and MultiPolygon zones of a layer, indexed for point queries
+
+Every ring of every polygon feature is packed into flat vertex arrays, with
+each feature's rings contiguous, and feature bounding boxes go into a packed
+STR-tree. A query prunes features by bounding box through the tree, then runs
+the exact even-odd point-in-polygon test and the point-to-edge distance over
+all edges of the remaining candidates at once.
+"""
+
+import math
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from spatial_index import EARTH_RADIUS_KM, concat_ranges, paired_haversine_distances
+
+# Entries per STR-tree node
+STR_NODE_CAPACITY = 16
+
+POLYGON_TYPES = ('Polygon', 'MultiPolygon')
+
+
+def _lon_spans(min_lon: float, max_lon: float) -> List[Tuple[float, float]]:
+    """Longitude intervals of a bbox; wraps to [-180, 180] and splits at the antimeridian"""
+    if max_lon - min_lon >= 360:
+        return [(-180.0, 180.0)]
+    min_lon = (min_lon + 180) % 360 - 180
+    max_lon = (max_lon + 180) % 360 - 180
+    if max_lon == -180 and min_lon > max_lon:
+        max_lon = 180.0
+    if min_lon <= max_lon:
+        return [(min_lon, max_lon)]
+    return [(min_lon, 180.0), (-180.0, max_lon)]
+
+
+class STRTree:
+    """
+    Sort-Tile-Recursive packed R-tree over bounding boxes.
+    Built once in bulk: leaves are tiles of boxes sorted into vertical slabs
+    by centre longitude, then by centre latitude within each slab, and each
+    upper level groups consecutive nodes. Every level is a flat box array
+    where node i covers children [i * capacity, (i + 1) * capacity) of the
+    level below, so queries descend level by level with vectorized tests.
+    """
+
+    def __init__(self, boxes: np.ndarray, capacity: int = STR_NODE_CAPACITY):
+        boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        self.capacity = capacity
+        self.size = len(boxes)
+        self.order = self._pack(boxes)
+        levels = [boxes[self.order]]
+        while len(levels[-1]) > capacity:
+            children = levels[-1]
+            starts = np.arange(0, len(children), capacity)
+            levels.append(np.column_stack([
+                np.minimum.reduceat(children[:, 0], starts),
+                np.minimum.reduceat(children[:, 1], starts),
+                np.maximum.reduceat(children[:, 2], starts),
+                np.maximum.reduceat(children[:, 3], starts),
+            ]))
+        # Root level first
+        self.levels = levels[::-1]
+
+    def _pack(self, boxes: np.ndarray) -> np.ndarray:
+        """Leaf order of the boxes: slabs by centre longitude, then centre latitude"""
+        if self.size == 0:
+            return np.empty(0, dtype=np.int64)
+        center_x = (boxes[:, 0] + boxes[:, 2]) / 2
+        center_y = (boxes[:, 1] + boxes[:, 3]) / 2
+        n_leaves = math.ceil(self.size / self.capacity)
+        slab_size = math.ceil(math.sqrt(n_leaves)) * self.capacity
+        rank = np.empty(self.size, dtype=np.int64)
+        rank[np.argsort(center_x, kind='stable')] = np.arange(self.size)
+        return np.lexsort((center_y, rank // slab_size))
+
+    @property
+    def nbytes(self) -> int:
+        return self.order.nbytes + sum(level.nbytes for level in self.levels)
+
+    def query(self, min_lon: float, min_lat: float, max_lon: float, max_lat: float) -> np.ndarray:
+        """Indices of the boxes intersecting a bbox, in ascending order"""
+        if self.size == 0:
+            return np.empty(0, dtype=np.int64)
+        nodes = np.arange(len(self.levels[0]))
+        for depth, boxes in enumerate(self.levels):
+            candidates = boxes[nodes]
+            nodes = nodes[(candidates[:, 0] <= max_lon) & (candidates[:, 2] >= min_lon)
+                          & (candidates[:, 1] <= max_lat) & (candidates[:, 3] >= min_lat)]
+            if depth + 1 < len(self.levels):
+                starts = nodes * self.capacity
+                nodes = concat_ranges(starts, np.minimum(starts + self.capacity, len(self.levels[depth + 1])))
+        return np.sort(self.order[nodes])
+
+    def query_batch(self, boxes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        query() for many bboxes at once, descending the tree for all of them together.
+        Returns matching (box, index) pairs as two arrays, grouped by box.
+        """
+        boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        if self.size == 0 or len(boxes) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        roots = len(self.levels[0])
+        queries = np.repeat(np.arange(len(boxes)), roots)
+        nodes = np.tile(np.arange(roots), len(boxes))
+        for depth, level in enumerate(self.levels):
+            candidates, query_boxes = level[nodes], boxes[queries]
+            keep = ((candidates[:, 0] <= query_boxes[:, 2]) & (candidates[:, 2] >= query_boxes[:, 0])
+                    & (candidates[:, 1] <= query_boxes[:, 3]) & (candidates[:, 3] >= query_boxes[:, 1]))
+            queries, nodes = queries[keep], nodes[keep]
+            if depth + 1 < len(self.levels):
+                starts = nodes * self.capacity
+                stops = np.minimum(starts + self.capacity, len(self.levels[depth + 1]))
+                queries = np.repeat(queries, stops - starts)
+                nodes = concat_ranges(starts, stops)
+        return queries, self.order[nodes]
+
+
+def _polygon_rings(geometry: Any) -> Optional[List[np.ndarray]]:
+    """Closed (k, 2) lon/lat arrays of every ring of a Polygon or MultiPolygon, or None"""
+    if not isinstance(geometry, dict) or geometry.get('type') not in POLYGON_TYPES:
+        return None
+    polygons = geometry.get('coordinates')
+    if geometry['type'] == 'Polygon':
+        polygons = [polygons]
+    rings = []
+    try:
+        for polygon in polygons:
+            for ring in polygon:
+                try:
+                    vertices = np.array(ring, dtype=np.float64)
+                except ValueError:
+                    # Positions of mixed dimensions, e.g. some with an altitude
+                    vertices = np.array([position[:2] for position in ring], dtype=np.float64)
+                if vertices.ndim != 2 or vertices.shape[1] < 2:
+                    continue
+                vertices = vertices[:, :2]
+                if not np.isfinite(vertices).all():
+                    continue
+                if len(vertices) and not np.array_equal(vertices[0], vertices[-1]):
+                    vertices = np.vstack([vertices, vertices[:1]])
+                # A ring needs three distinct vertices plus the closing one
+                if len(vertices) >= 4:
+                    rings.append(vertices)
+    except (TypeError, ValueError, IndexError):
+        return None
+    return rings or None
+
+
+class PolygonIndex:
+    """
+    The Polygon and MultiPolygon features of a layer.
+    Row i of the index is feature positions[i] of the layer. Its rings are
+    vertices [vertex_offsets[i], vertex_offsets[i + 1]) of the packed vertex
+    arrays; edge j joins vertex j to vertex j + 1 unless edge_valid[j] is
+    False, which marks the step from one ring to the next.
+    """
+
+    def __init__(self, positions: np.ndarray, bboxes: np.ndarray, vertex_lons: np.ndarray,
+                 vertex_lats: np.ndarray, vertex_offsets: np.ndarray, edge_valid: np.ndarray):
+        self.positions = np.asarray(positions, dtype=np.int64)
+        self.bboxes = np.asarray(bboxes, dtype=np.float64).reshape(-1, 4)
+        self.vertex_lons = vertex_lons
+        self.vertex_lats = vertex_lats
+        self.vertex_offsets = vertex_offsets
+        self.edge_valid = edge_valid
+        self.size = len(self.positions)
+        self.tree = STRTree(self.bboxes)
+
+    @classmethod
+    def from_geometries(cls, geometries: Dict[int, Any]) -> 'PolygonIndex':
+        """Index the polygonal geometries among a layer's sparse geometries by row"""
+        positions, rings, rings_per_feature = [], [], []
+        for row in sorted(geometries):
+            feature_rings = _polygon_rings(geometries[row])
+            if feature_rings is None:
+                continue
+            positions.append(row)
+            rings.extend(feature_rings)
+            rings_per_feature.append(len(feature_rings))
+        if not positions:
+            return cls(np.empty(0, dtype=np.int64), np.empty((0, 4)), np.empty(0), np.empty(0),
+                       np.zeros(1, dtype=np.int64), np.empty(0, dtype=bool))
+
+        packed = np.concatenate(rings)
+        ring_ends = np.cumsum([len(ring) for ring in rings])
+        edge_valid = np.ones(len(packed), dtype=bool)
+        # The last vertex of each ring does not start an edge
+        edge_valid[ring_ends - 1] = False
+        vertex_offsets = np.concatenate([[0], ring_ends[np.cumsum(rings_per_feature) - 1]]).astype(np.int64)
+
+        lons = np.ascontiguousarray(packed[:, 0])
+        lats = np.ascontiguousarray(packed[:, 1])
+        starts = vertex_offsets[:-1]
+        bboxes = np.column_stack([np.minimum.reduceat(lons, starts), np.minimum.reduceat(lats, starts),
+                                  np.maximum.reduceat(lons, starts), np.maximum.reduceat(lats, starts)])
+        return cls(np.array(positions, dtype=np.int64), bboxes, lons, lats, vertex_offsets, edge_valid)
+
+    @property
+    def nbytes(self) -> int:
+        return (self.positions.nbytes + self.bboxes.nbytes + self.vertex_lons.nbytes + self.vertex_lats.nbytes
+                + self.vertex_offsets.nbytes + self.edge_valid.nbytes + self.tree.nbytes)
+
+    def query_bbox(self, min_lon: float, min_lat: float, max_lon: float, max_lat: float) -> np.ndarray:
+        """
+        Index rows of the polygons whose bounding box intersects a bbox, in ascending order.
+        Longitudes outside [-180, 180) are wrapped; min_lon > max_lon crosses the antimeridian.
+        """
+        spans = _lon_spans(min_lon, max_lon)
+        rows = [self.tree.query(west, min_lat, east, max_lat) for west, east in spans]
+        return rows[0] if len(rows) == 1 else np.union1d(*rows)
+
+    def query_radius(self, lat: float, lon: float, radius_km: float) -> np.ndarray:
+        """Index rows of the polygons whose bounding box may come within radius_km of a point"""
+        angular = radius_km / EARTH_RADIUS_KM
+        delta_lat = math.degrees(angular)
+        lat_min, lat_max = lat - delta_lat, lat + delta_lat
+        if angular >= math.pi or lat_min <= -90 or lat_max >= 90:
+            return self.query_bbox(-180, max(lat_min, -90), 180, min(lat_max, 90))
+        ratio = math.sin(angular) / math.cos(math.radians(lat))
+        if ratio >= 1:
+            return self.query_bbox(-180, lat_min, 180, lat_max)
+        delta_lon = math.degrees(math.asin(ratio))
+        return self.query_bbox(lon - delta_lon, lat_min, lon + delta_lon, lat_max)
+
+    def query_radius_batch(self, lats: np.ndarray, lons: np.ndarray,
+                           radius_km: float) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        query_radius for many points at once: (point, index row) pairs of the
+        polygons whose bounding box may come within radius_km, sorted by point then row
+        """
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        angular = radius_km / EARTH_RADIUS_KM
+        delta_lat = math.degrees(angular)
+        lat_min, lat_max = lats - delta_lat, lats + delta_lat
+        ratio = math.sin(angular) / np.maximum(np.cos(np.radians(lats)), 1e-300)
+        # Same cases as query_radius: bands that reach a pole or span every longitude
+        full = (angular >= math.pi) | (lat_min <= -90) | (lat_max >= 90) | (ratio >= 1)
+        delta_lon = np.degrees(np.arcsin(np.where(full, 0.0, ratio)))
+        lat_min, lat_max = np.maximum(lat_min, -90), np.minimum(lat_max, 90)
+
+        # Longitude spans as in _lon_spans, split in two at the antimeridian
+        west = (lons - delta_lon + 180) % 360 - 180
+        east = (lons + delta_lon + 180) % 360 - 180
+        east = np.where((east == -180) & (west > east), 180.0, east)
+        west, east = np.where(full, -180.0, west), np.where(full, 180.0, east)
+        wraps = west > east
+        points = np.concatenate([np.arange(len(lats)), np.flatnonzero(wraps)])
+        boxes = np.concatenate([
+            np.column_stack([west, lat_min, np.where(wraps, 180.0, east), lat_max]),
+            np.column_stack([np.full(wraps.sum(), -180.0), lat_min[wraps], east[wraps], lat_max[wraps]]),
+        ])
+        queries, rows = self.tree.query_batch(boxes)
+        # A polygon touching both halves of a split span matches twice
+        pairs = np.unique(points[queries] * np.int64(self.size) + rows)
+        return pairs // self.size, pairs % self.size
+
+    def _edges(self, rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """First vertex of every edge of the given index rows, and where each row's edges start"""
+        starts = self.vertex_offsets[rows]
+        # The last vertex of a feature closes its last ring, so it starts no edge
+        stops = self.vertex_offsets[rows + 1] - 1
+        edges = concat_ranges(starts, stops)
+        valid = self.edge_valid[edges]
+        # Every row has at least one ring, so no group is empty
+        counts = np.add.reduceat(valid.astype(np.int64), np.cumsum(stops - starts) - (stops - starts))
+        return edges[valid], np.cumsum(counts) - counts
+
+    def contains(self, lat: float, lon: float, rows: np.ndarray) -> np.ndarray:
+        """Boolean mask of the given index rows whose polygon contains a point (even-odd rule)"""
+        rows = np.asarray(rows, dtype=np.int64)
+        if len(rows) == 0:
+            return np.zeros(0, dtype=bool)
+        edges, group_starts = self._edges(rows)
+        return self._crossings(lat, lon, edges, group_starts) % 2 == 1
+
+    def _crossings(self, lat, lon, edges: np.ndarray, group_starts: np.ndarray) -> np.ndarray:
+        """Per group of edges, how many cross the ray running east from the point"""
+        x1, y1 = self.vertex_lons[edges], self.vertex_lats[edges]
+        x2, y2 = self.vertex_lons[edges + 1], self.vertex_lats[edges + 1]
+        straddles = (y1 > lat) != (y2 > lat)
+        # Only evaluated where the edge straddles the ray, so y2 != y1
+        dy = np.where(straddles, y2 - y1, 1.0)
+        crosses = straddles & (lon < x1 + (lat - y1) * (x2 - x1) / dy)
+        return np.add.reduceat(crosses.astype(np.int64), group_starts)
+
+    def distances(self, lat: float, lon: float, rows: np.ndarray) -> np.ndarray:
+        """
+        Kilometers from a point to the given index rows' polygons, 0 inside one.
+        The nearest point of each edge is found in an equirectangular projection
+        centred on the query point, then measured with the Haversine formula.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        return self.paired_distances(np.full(len(rows), lat, dtype=np.float64),
+                                     np.full(len(rows), lon, dtype=np.float64), rows)
+
+    def paired_distances(self, lats: np.ndarray, lons: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        """distances() from the i-th point to the polygon of the i-th index row, for equal-length arrays"""
+        rows = np.asarray(rows, dtype=np.int64)
+        if len(rows) == 0:
+            return np.empty(0)
+        edges, group_starts = self._edges(rows)
+        # The query point of every edge
+        pair = np.repeat(np.arange(len(rows)), np.diff(np.append(group_starts, len(edges))))
+        lat, lon = np.asarray(lats, dtype=np.float64)[pair], np.asarray(lons, dtype=np.float64)[pair]
+        inside = self._crossings(lat, lon, edges, group_starts) % 2 == 1
+
+        scale = np.maximum(np.cos(np.radians(lat)), 1e-9)
+        # Only the edge start is wrapped, so an edge never jumps across the wrap
+        x1 = ((self.vertex_lons[edges] - lon + 180) % 360 - 180) * scale
+        y1 = self.vertex_lats[edges] - lat
+        dx = (self.vertex_lons[edges + 1] - self.vertex_lons[edges]) * scale
+        dy = self.vertex_lats[edges + 1] - self.vertex_lats[edges]
+        length_sq = dx * dx + dy * dy
+        t = np.clip(-(x1 * dx + y1 * dy) / np.where(length_sq > 0, length_sq, 1.0), 0.0, 1.0)
+        nearest_lats = lat + y1 + t * dy
+        nearest_lons = lon + (x1 + t * dx) / scale
+
+        edge_distances = paired_haversine_distances(lat, lon, nearest_lats, nearest_lons)
+        distances = np.minimum.reduceat(edge_distances, group_starts)
+        distances[inside] = 0.0
+        return distances
+
+    def within(self, lat: float, lon: float, radius_km: float) -> Tuple[np.ndarray, np.ndarray]:
+        """Index rows, ascending, of the polygons within radius_km of a point, and their distances"""
+        rows = self.query_radius(lat, lon, radius_km)
+        distances = self.distances(lat, lon, rows)
+        near = distances <= radius_km
+        return rows[near], distances[near]
+
+    def within_batch(self, lats: np.ndarray, lons: np.ndarray,
+                     radius_km: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """within() for many points at once: (point, index row, distance) of every match, by point then row"""
+        points, rows = self.query_radius_batch(lats, lons, radius_km)
+        distances = self.paired_distances(np.asarray(lats)[points], np.asarray(lons)[points], rows)
+        near = distances <= radius_km
+        return points[near], rows[near], distances[near]
+
+
+# Example usage and testing
+if __name__ == "__main__":
+    rng = np.random.default_rng(42)
+
+    # Random star-shaped polygons, some with a hole, some as two-part MultiPolygons
+    geometries = {}
+    for row in range(3000):
+        center_lon, center_lat = rng.uniform(-170, 170), rng.uniform(-70, 70)
+        angles = np.sort(rng.uniform(0, 2 * np.pi, rng.integers(5, 40)))
+        radii = rng.uniform(0.2, 1.5, len(angles))
+        shell = np.column_stack([center_lon + radii * np.cos(angles), center_lat + radii * np.sin(angles)])
+        rings = [shell.tolist() + [shell[0].tolist()]]
+        if row % 3 == 0:
+            hole = np.column_stack([center_lon + 0.1 * np.cos(angles), center_lat + 0.1 * np.sin(angles)])
+            rings.append(hole.tolist() + [hole[0].tolist()])
+        if row % 5 == 0:
+            geometries[row] = {'type': 'MultiPolygon', 'coordinates': [rings, [[[p[0] + 3, p[1]] for p in shell]]]}
+        else:
+            geometries[row] = {'type': 'Polygon', 'coordinates': rings}
+    geometries[5000] = {'type': 'Point', 'coordinates': [0.0, 0.0]}
+    index = PolygonIndex.from_geometries(geometries)
+    assert index.size == 3000
+
+    def brute_contains(lat, lon, geometry):
+        parts = geometry['coordinates'] if geometry['type'] == 'MultiPolygon' else [geometry['coordinates']]
+        crossings = 0
+        for ring in (ring for part in parts for ring in part):
+            for (x1, y1), (x2, y2) in zip(ring, ring[1:] + ring[:1]):
+                if (y1 > lat) != (y2 > lat) and lon < x1 + (lat - y1) * (x2 - x1) / (y2 - y1):
+                    crossings += 1
+        return crossings % 2 == 1
+
+    # Tree pruning must not lose any polygon whose box overlaps the query
+    for _ in range(200):
+        lon, lat = rng.uniform(-180, 180), rng.uniform(-80, 80)
+        box = (lon - 2, lat - 2, lon + 2, lat + 2)
+        expected = np.flatnonzero((index.bboxes[:, 0] <= box[2]) & (index.bboxes[:, 2] >= box[0])
+                                  & (index.bboxes[:, 1] <= box[3]) & (index.bboxes[:, 3] >= box[1]))
+        assert np.array_equal(index.tree.query(*box), expected)
+
+        # Vectorized containment agrees with a scalar ray cast over every polygon
+        rows = np.arange(index.size)
+        inside = index.contains(lat, lon, rows)
+        scalar = [brute_contains(lat, lon, geometries[int(p)]) for p in index.positions]
+        assert np.array_equal(inside, scalar)
+
+        # Indexed radius queries find every polygon a full scan does
+        distances = index.distances(lat, lon, rows)
+        assert np.array_equal(distances == 0, inside)
+        for radius in (0, 50, 300):
+            found, _ = index.within(lat, lon, radius)
+            assert np.array_equal(found, np.flatnonzero(distances <= radius))
+
+    print("STR-tree pruning and vectorized point-in-polygon agree with brute force")
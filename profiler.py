@@ -0,0 +1,138 @@
+"""
+Opt-in sampling profiler for individual requests
+
+While enabled, a background thread samples the Python stack of every thread
+that is handling a profiled request, every few milliseconds. When the request
+ends, its samples are written as folded stacks (`frame;frame;frame count`,
+one line per distinct stack) that flamegraph.pl or speedscope turn into a
+flame graph. Profiled code runs unmodified; when disabled, the only cost per
+request is one attribute check.
+"""
+
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Optional
+
+# Deepest stack kept per sample; deeper frames near the root are dropped
+MAX_STACK_DEPTH = 128
+
+
+def _fold(frame) -> str:
+    """One sampled stack as root-to-leaf `function (file:line)` frames joined by ';'"""
+    frames = []
+    while frame is not None and len(frames) < MAX_STACK_DEPTH:
+        code = frame.f_code
+        frames.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ';'.join(reversed(frames))
+
+
+class SamplingProfiler:
+    """Samples the stacks of registered request threads and dumps them per request"""
+
+    def __init__(self, enabled: Optional[bool] = None, interval_ms: Optional[float] = None,
+                 sample_rate: Optional[float] = None, output_dir: Optional[str] = None):
+        if enabled is None:
+            enabled = os.environ.get("PROFILER_ENABLED", "0") == "1"
+        if interval_ms is None:
+            interval_ms = float(os.environ.get("PROFILER_INTERVAL_MS", 5))
+        if sample_rate is None:
+            sample_rate = float(os.environ.get("PROFILER_SAMPLE_RATE", 1))
+        if output_dir is None:
+            output_dir = os.environ.get("PROFILER_DIR", "profiles")
+        self.enabled = enabled
+        self.interval = interval_ms / 1000
+        # Fraction of requests profiled while enabled
+        self.sample_rate = sample_rate
+        self.output_dir = output_dir
+        self.profiles_written = 0
+        self._active: Dict[int, Counter] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._thread_pid: Optional[int] = None
+
+    def configure(self, enabled: Optional[bool] = None, sample_rate: Optional[float] = None):
+        """Turn profiling on or off at runtime"""
+        if sample_rate is not None:
+            self.sample_rate = min(max(sample_rate, 0.0), 1.0)
+        if enabled is not None:
+            self.enabled = enabled
+
+    def begin(self) -> Optional[int]:
+        """Start sampling the calling thread, if this request is picked; returns a token for end()"""
+        if not self.enabled or random.random() >= self.sample_rate:
+            return None
+        ident = threading.get_ident()
+        with self._lock:
+            self._active[ident] = Counter()
+            self._ensure_thread()
+        return ident
+
+    def end(self, token: int, label: str) -> Optional[str]:
+        """Stop sampling a request and write its folded stacks; returns the file path"""
+        with self._lock:
+            stacks = self._active.pop(token, None)
+        if not stacks:
+            return None
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        name = re.sub(r'[^A-Za-z0-9]+', '_', label).strip('_')[:80]
+        path = os.path.join(self.output_dir,
+                            f"{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}-{os.getpid()}-{name}.folded")
+        try:
+            with open(path, 'w') as f:
+                for stack, count in stacks.most_common():
+                    f.write(f"{stack} {count}\n")
+        except OSError as e:
+            logging.error(f"Failed to write profile {path}: {str(e)}")
+            return None
+        self.profiles_written += 1
+        return path
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._thread_pid == os.getpid() and self._thread.is_alive():
+            return
+        self._thread_pid = os.getpid()
+        self._thread = threading.Thread(target=self._loop, name='profiler', daemon=True)
+        self._thread.start()
+
+    def _loop(self):
+        own = threading.get_ident()
+        while True:
+            with self._lock:
+                if not self._active and not self.enabled:
+                    # Restarted by the next begin()
+                    self._thread = None
+                    return
+                active = list(self._active.items())
+            if active:
+                frames = sys._current_frames()
+                for ident, stacks in active:
+                    frame = frames.get(ident)
+                    if frame is not None and ident != own:
+                        stacks[_fold(frame)] += 1
+                del frames
+            time.sleep(self.interval)
+
+    def status(self) -> Dict:
+        """Profiler settings and counters"""
+        return {
+            'pid': os.getpid(),
+            'enabled': self.enabled,
+            'interval_ms': self.interval * 1000,
+            'sample_rate': self.sample_rate,
+            'output_dir': self.output_dir,
+            'active_requests': len(self._active),
+            'profiles_written': self.profiles_written
+        }
+
+
+# Shared by every request thread in the process
+profiler = SamplingProfiler()
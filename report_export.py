@@ -0,0 +1,97 @@
+import csv
+import json
+from io import StringIO
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+# Flush the output buffer to the client once it reaches this many characters
+CHUNK_SIZE = 64 * 1024
+
+# Leading CSV columns; property columns follow, then distance_km
+CSV_BASE_COLUMNS = ['disaster_type', 'geometry_type', 'longitude', 'latitude']
+
+# (disaster type, property keys of its layer, lazily materialized report features)
+ReportSection = Tuple[str, List[str], Iterable[Dict]]
+
+
+def _csv_cell(value):
+    """Flatten nested property values into a single CSV cell"""
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, separators=(',', ':'))
+    return value
+
+
+def stream_csv(sections: Iterable[ReportSection]) -> Iterator[bytes]:
+    """
+    Stream report features as CSV with one column per property.
+    The header goes out first; rows follow in CHUNK_SIZE pieces, so only
+    one chunk of rows is ever held in memory.
+    """
+    sections = list(sections)
+    property_columns = []
+    for _, keys, _ in sections:
+        for key in keys:
+            if key not in property_columns and key != 'distance_km':
+                property_columns.append(key)
+    columns = CSV_BASE_COLUMNS + property_columns + ['distance_km']
+
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    yield buffer.getvalue().encode('utf-8')
+    buffer.seek(0)
+    buffer.truncate()
+
+    for disaster_type, _, features in sections:
+        for feature in features:
+            geometry = feature.get('geometry') or {}
+            properties = feature.get('properties') or {}
+            if geometry.get('type') == 'Point':
+                longitude, latitude = geometry['coordinates'][0], geometry['coordinates'][1]
+            else:
+                longitude = latitude = ''
+            writer.writerow(
+                [disaster_type, geometry.get('type', ''), longitude, latitude]
+                + [_csv_cell(properties.get(key, '')) for key in property_columns]
+                + [properties.get('distance_km', '')]
+            )
+
+            if buffer.tell() >= CHUNK_SIZE:
+                yield buffer.getvalue().encode('utf-8')
+                buffer.seek(0)
+                buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+def stream_geojson(metadata: Dict, sections: Iterable[ReportSection],
+                   tag_disaster_type: bool = False) -> Iterator[bytes]:
+    """
+    Stream report features as a compact GeoJSON FeatureCollection.
+    With tag_disaster_type each feature's properties record the layer it came from.
+    """
+    head = json.dumps({"type": "FeatureCollection", "metadata": metadata}, separators=(',', ':'))
+    # Reopen the object to append the features array
+    yield (head[:-1] + ',"features":[').encode('utf-8')
+
+    parts = []
+    size = 0
+    first = True
+    for disaster_type, _, features in sections:
+        for feature in features:
+            if tag_disaster_type:
+                feature['properties']['disaster_type'] = disaster_type
+            encoded = json.dumps(feature, separators=(',', ':'))
+            if not first:
+                encoded = ',' + encoded
+            first = False
+            parts.append(encoded)
+            size += len(encoded)
+
+            if size >= CHUNK_SIZE:
+                yield ''.join(parts).encode('utf-8')
+                parts = []
+                size = 0
+
+    parts.append(']}')
+    yield ''.join(parts).encode('utf-8')
@@ -0,0 +1,284 @@
+"""
+Bookmark risk watcher
+
+A background thread periodically re-scores every bookmark in vectorized
+batches through the active DisasterPredictor and counts the disaster layer
+features near each one using the layers' spatial index. Results are kept
+per bookmark, so the dashboard reads precomputed risk instead of issuing a
+prediction per bookmark. Listeners are told only about bookmarks whose risk
+level changed.
+
+Under gunicorn every worker runs the thread, but only the one holding an
+flock on the leader lock file scores; the others take over if it exits.
+The leader compares each pass against the assessments stored in the bookmark
+database and saves the new ones there with the pass's changes. Every worker
+serves assessments from the database and, polling its pass log, tells its own
+listeners (e.g. its SSE clients) about the changes.
+"""
+
+import fcntl
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from analytics import RISK_LEVELS
+from bookmark_store import BookmarkStore
+from ml_model.registry import ModelRegistry
+from spatial_index import paired_haversine_distances
+
+# Bookmarks scored per predict_risk_batch call
+SCORING_BATCH_SIZE = 10000
+
+# Bookmarks per batched radius query; bounds the candidate pairs held at once
+NEARBY_BATCH_SIZE = 1000
+
+
+class BookmarkRiskWatcher:
+    """
+    Keeps a risk assessment for every bookmark, refreshed every `interval` seconds.
+    trigger() requests an early pass from any process, e.g. after a bookmark is
+    added or the model reloaded; the leader sees it within `poll_interval` seconds.
+    """
+
+    def __init__(self, store: BookmarkStore, registry: ModelRegistry, get_layer: Callable,
+                 disaster_types: Sequence[str], interval: Optional[float] = None,
+                 radius_km: Optional[float] = None, poll_interval: Optional[float] = None):
+        if interval is None:
+            interval = float(os.environ.get("BOOKMARK_RISK_INTERVAL", 300))
+        if radius_km is None:
+            radius_km = float(os.environ.get("BOOKMARK_RISK_RADIUS_KM", 50))
+        if poll_interval is None:
+            poll_interval = float(os.environ.get("BOOKMARK_RISK_POLL_INTERVAL", 5))
+        self.store = store
+        self.registry = registry
+        self._get_layer = get_layer
+        self.disaster_types = list(disaster_types)
+        self.interval = interval
+        self.poll_interval = min(poll_interval, interval)
+        # Layer features this close to a bookmark count as nearby incidents
+        self.radius_km = radius_km
+        self.lock_path = store.path + '.risk-watcher.lock'
+        self.last_error: Optional[str] = None
+        self._results: Dict[int, Dict] = {}
+        self._results_run: Optional[int] = None
+        self._seen_run: Optional[int] = None
+        self._seen_requests: Optional[int] = None
+        self._last_pass: Optional[float] = None
+        self._lock_file = None
+        self._lock_pid: Optional[int] = None
+        self._listeners: List[Callable[[List[Dict]], None]] = []
+        self._wake = threading.Event()
+        self._run_lock = threading.Lock()
+        self._follow_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._thread_pid: Optional[int] = None
+
+    def add_listener(self, listener: Callable[[List[Dict]], None]):
+        """Call listener(changes) in this process after each pass in which some risk levels changed"""
+        self._listeners.append(listener)
+
+    def start(self):
+        """Start the watcher thread; again in a forked child, where threads do not survive"""
+        if self._thread is not None and self._thread_pid == os.getpid() and self._thread.is_alive():
+            return
+        self._thread_pid = os.getpid()
+        self._thread = threading.Thread(target=self._loop, name='bookmark-risk', daemon=True)
+        self._thread.start()
+
+    def trigger(self):
+        """Run the next pass now instead of at the end of the interval, in whichever process leads"""
+        try:
+            self.store.request_risk_run()
+        except Exception as e:
+            logging.error(f"Bookmark risk pass request failed: {str(e)}")
+        self._wake.set()
+
+    def _loop(self):
+        while True:
+            try:
+                if self._is_leader() and self._due():
+                    self.run_once()
+                self._follow()
+            except Exception as e:
+                self.last_error = str(e)
+                logging.error(f"Bookmark risk pass failed: {str(e)}")
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    def _is_leader(self) -> bool:
+        """Whether this process scores; takes the leader lock if no other process holds it"""
+        if self._lock_file is not None and self._lock_pid == os.getpid():
+            return True
+        directory = os.path.dirname(self.lock_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        lock_file = open(self.lock_path, 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return False
+        # Held until the process exits, when the kernel releases it for the next leader
+        self._lock_file, self._lock_pid = lock_file, os.getpid()
+        logging.info(f"Process {os.getpid()} now scores bookmark risk")
+        return True
+
+    def _due(self) -> bool:
+        requests = self.store.risk_run_requests()
+        if requests != self._seen_requests:
+            return True
+        return self._last_pass is None or time.monotonic() - self._last_pass >= self.interval
+
+    def run_once(self) -> List[Dict]:
+        """Re-score every bookmark and store the results; returns the bookmarks whose risk level changed"""
+        with self._run_lock:
+            self._seen_requests = self.store.risk_run_requests()
+            started = datetime.now()
+            ids, names, lats, lons = self.store.all_locations()
+            results = self._score(ids, lats, lons)
+            nearby = self._nearby_incidents(lats, lons)
+            # Compared with the stored pass, which every process serves
+            previous_levels = self.store.risk_levels()
+
+            scored_at = started.isoformat()
+            changes = []
+            assessments = []
+            for i, bookmark_id in enumerate(ids.tolist()):
+                result = {
+                    'bookmark_id': bookmark_id,
+                    'name': names[i],
+                    'lat': float(lats[i]),
+                    'lon': float(lons[i]),
+                    'risk_level': results['risk_level'][i],
+                    'confidence': results['confidence'][i],
+                    'predictions': {
+                        disaster_type: {
+                            'risk_score': prediction['risk_score'][i],
+                            'risk_level': prediction['risk_level'][i]
+                        }
+                        for disaster_type, prediction in results['predictions'].items()
+                    },
+                    'nearby_incidents': {t: counts[i] for t, counts in nearby.items()},
+                    'scored_at': scored_at
+                }
+                previous = previous_levels.get(bookmark_id)
+                if previous is not None and previous != result['risk_level']:
+                    changes.append({'bookmark_id': bookmark_id, 'name': names[i],
+                                    'previous_risk_level': previous,
+                                    'risk_level': result['risk_level'], 'scored_at': scored_at})
+                assessments.append(result)
+
+            duration = round((datetime.now() - started).total_seconds(), 3)
+            self.store.save_risk_run(assessments, changes, scored_at, duration)
+            self._last_pass = time.monotonic()
+            self.last_error = None
+
+        for change in changes:
+            logging.info(f"Bookmark {change['bookmark_id']} risk changed: "
+                         f"{change['previous_risk_level']} -> {change['risk_level']}")
+        self._follow()
+        return changes
+
+    def _follow(self):
+        """Tell this process's listeners about passes stored since the last call"""
+        with self._follow_lock:
+            if self._seen_run is None:
+                # Changes from before this process started are not replayed
+                latest = self.store.latest_risk_run()
+                self._seen_run = latest['id'] if latest is not None else 0
+                return
+            for run_id, changes in self.store.risk_changes_since(self._seen_run):
+                self._seen_run = run_id
+                if not changes:
+                    continue
+                for listener in list(self._listeners):
+                    try:
+                        listener(changes)
+                    except Exception as e:
+                        logging.error(f"Bookmark risk listener failed: {str(e)}")
+
+    def _score(self, ids: np.ndarray, lats: np.ndarray, lons: np.ndarray) -> Dict:
+        """predict_risk_batch over all bookmarks, in SCORING_BATCH_SIZE chunks"""
+        predictor = self.registry.get()
+        merged = {'risk_level': [], 'confidence': [], 'predictions': {}}
+        for start in range(0, len(ids), SCORING_BATCH_SIZE):
+            batch = predictor.predict_risk_batch(lats[start:start + SCORING_BATCH_SIZE],
+                                                 lons[start:start + SCORING_BATCH_SIZE])
+            merged['risk_level'] += batch['risk_level']
+            merged['confidence'] += batch['confidence']
+            for disaster_type, prediction in batch['predictions'].items():
+                target = merged['predictions'].setdefault(disaster_type, {'risk_score': [], 'risk_level': []})
+                target['risk_score'] += prediction['risk_score']
+                target['risk_level'] += prediction['risk_level']
+        return merged
+
+    def _nearby_incidents(self, lats: np.ndarray, lons: np.ndarray) -> Dict[str, List[Dict]]:
+        """Per layer and bookmark: features within radius_km, by risk level"""
+        nearby = {}
+        for disaster_type in self.disaster_types:
+            layer = self._get_layer(disaster_type)
+            counts = {key: np.zeros(len(lats), dtype=np.int64) for key in ('count',) + RISK_LEVELS}
+            if layer is not None:
+                # One mask per level for the whole layer, indexed by matched positions below
+                level_masks = {level: layer.columns.filter_rows({'risk_level': [level]}) for level in RISK_LEVELS}
+                index = layer.index
+                for start in range(0, len(lats), NEARBY_BATCH_SIZE):
+                    batch = slice(start, start + NEARBY_BATCH_SIZE)
+                    centers, rows = index.query_radius_batch(lats[batch], lons[batch], self.radius_km)
+                    distances = paired_haversine_distances(lats[batch][centers], lons[batch][centers],
+                                                           index.lats[rows], index.lons[rows])
+                    within = distances <= self.radius_km
+                    self._add_counts(counts, start + centers[within], index.positions[rows[within]], level_masks)
+
+                    if layer.polygons.size:
+                        # Zones containing a bookmark or reaching within radius_km of it
+                        centers, rows, _ = layer.polygons.within_batch(lats[batch], lons[batch], self.radius_km)
+                        self._add_counts(counts, start + centers, layer.polygons.positions[rows], level_masks)
+
+            nearby[disaster_type] = [
+                {key: int(values[i]) for key, values in counts.items()} for i in range(len(lats))
+            ]
+        return nearby
+
+    @staticmethod
+    def _add_counts(counts: Dict[str, np.ndarray], bookmarks: np.ndarray, positions: np.ndarray,
+                    level_masks: Dict[str, np.ndarray]):
+        """Add matched (bookmark, layer position) pairs to the per-bookmark counts"""
+        size = len(counts['count'])
+        counts['count'] += np.bincount(bookmarks, minlength=size)
+        for level, mask in level_masks.items():
+            counts[level] += np.bincount(bookmarks[mask[positions]], minlength=size)
+
+    def get(self, bookmark_id: int) -> Optional[Dict]:
+        """Latest assessment of one bookmark, or None if it has not been scored yet"""
+        return self.results().get(bookmark_id)
+
+    def results(self) -> Dict[int, Dict]:
+        """Latest stored assessment of every scored bookmark, by ID"""
+        latest = self.store.latest_risk_run()
+        run_id = latest['id'] if latest is not None else None
+        if run_id != self._results_run:
+            # Swapped in whole; readers see one pass or the next, never a mix
+            self._results = self.store.risk_assessments()
+            self._results_run = run_id
+        return self._results
+
+    def status(self) -> Dict:
+        """Watcher state for monitoring"""
+        latest = self.store.latest_risk_run()
+        return {
+            'running': self._thread is not None and self._thread_pid == os.getpid() and self._thread.is_alive(),
+            'leader': self._lock_file is not None and self._lock_pid == os.getpid(),
+            'interval_s': self.interval,
+            'radius_km': self.radius_km,
+            'bookmarks_scored': latest['bookmarks'] if latest is not None else 0,
+            'runs': latest['id'] if latest is not None else 0,
+            'last_run': latest['scored_at'] if latest is not None else None,
+            'last_duration_s': latest['duration_s'] if latest is not None else None,
+            'last_error': self.last_error
+        }
@@ -0,0 +1,258 @@
+import math
+from typing import List, Optional, Tuple, Union
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371  # Same radius as GeoJSONUtils.calculate_distance
+
+ArrayLike = Union[float, List[float], np.ndarray]
+
+
+def haversine_distances(center_lats: ArrayLike, center_lons: ArrayLike,
+                        lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    """
+    Vectorized Haversine distances in kilometers.
+    Takes M query centers and N points (struct-of-arrays lat/lon buffers) and
+    returns an (M, N) matrix, or an (N,) vector when a single scalar center is given.
+    """
+    scalar_center = np.ndim(center_lats) == 0
+    lat1 = np.atleast_1d(np.asarray(center_lats, dtype=np.float64))[:, None]
+    lon1 = np.atleast_1d(np.asarray(center_lons, dtype=np.float64))[:, None]
+    lat2 = np.asarray(lats, dtype=np.float64)[None, :]
+    lon2 = np.asarray(lons, dtype=np.float64)[None, :]
+
+    # Same formulation as the scalar version so results agree to rounding
+    lat1_rad = np.radians(lat1)
+    lat2_rad = np.radians(lat2)
+    half_dlat = np.sin(np.radians(lat2 - lat1) / 2)
+    half_dlon = np.sin(np.radians(lon2 - lon1) / 2)
+
+    a = half_dlat * half_dlat + np.cos(lat1_rad) * np.cos(lat2_rad) * half_dlon * half_dlon
+    a = np.clip(a, 0.0, 1.0)
+    distances = EARTH_RADIUS_KM * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+    return distances[0] if scalar_center else distances
+
+
+def paired_haversine_distances(lats1: np.ndarray, lons1: np.ndarray,
+                               lats2: np.ndarray, lons2: np.ndarray) -> np.ndarray:
+    """Vectorized Haversine distances in kilometers between the i-th points of two equal-length arrays"""
+    lat1_rad = np.radians(lats1)
+    lat2_rad = np.radians(lats2)
+    half_dlat = np.sin(np.radians(lats2 - lats1) / 2)
+    half_dlon = np.sin(np.radians(lons2 - lons1) / 2)
+
+    a = half_dlat * half_dlat + np.cos(lat1_rad) * np.cos(lat2_rad) * half_dlon * half_dlon
+    a = np.clip(a, 0.0, 1.0)
+    return EARTH_RADIUS_KM * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+def haversine_within(center_lats: ArrayLike, center_lons: ArrayLike,
+                     lats: np.ndarray, lons: np.ndarray,
+                     radius_km: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Distances plus a boolean mask of the points within radius_km of each center"""
+    distances = haversine_distances(center_lats, center_lons, lats, lons)
+    return distances, distances <= radius_km
+
+
+def concat_ranges(starts: np.ndarray, stops: np.ndarray) -> np.ndarray:
+    """Concatenation of arange(start, stop) for every pair, without a Python loop"""
+    lengths = stops - starts
+    total = int(lengths.sum())
+    if total == 0:
+        return np.empty(0, dtype=np.int64)
+    offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+    return offsets + np.arange(total, dtype=np.int64)
+
+
+def cluster_labels(lats: np.ndarray, lons: np.ndarray, zoom: int,
+                   radius_px: float = 60) -> Tuple[np.ndarray, int]:
+    """
+    Grid-cluster points in Web Mercator pixel space at a map zoom level.
+    Returns a cluster label per point and the number of clusters.
+    """
+    world_px = 256 * 2 ** zoom
+    lat_rad = np.radians(np.clip(lats, -85.0511, 85.0511))
+    x = (np.asarray(lons) + 180) / 360 * world_px
+    y = (1 - np.log(np.tan(lat_rad) + 1 / np.cos(lat_rad)) / math.pi) / 2 * world_px
+
+    n_cells_x = int(math.ceil(world_px / radius_px)) + 1
+    cells = np.floor(y / radius_px).astype(np.int64) * n_cells_x + np.floor(x / radius_px).astype(np.int64)
+    unique_cells, labels = np.unique(cells, return_inverse=True)
+    return labels.ravel(), len(unique_cells)
+
+
+class GridIndex:
+    """
+    Lat/lon grid bucket index over the Point features of a layer.
+    Coordinates are kept as struct-of-arrays buffers, sorted by cell so each
+    cell is a contiguous slice. Radius queries only visit the cells overlapping
+    the circle's bounding box and return candidate rows; exact distances are
+    left to the caller.
+    """
+
+    def __init__(self, lats: np.ndarray, lons: np.ndarray, positions: np.ndarray,
+                 cell_size_deg: float = 1.0, order: Optional[np.ndarray] = None,
+                 sorted_cells: Optional[np.ndarray] = None):
+        self.cell_size = cell_size_deg
+        self.n_rows = int(math.ceil(180 / cell_size_deg))
+        self.n_cols = int(math.ceil(360 / cell_size_deg))
+
+        # Row i of the index is feature positions[i] of the layer
+        self.lats = np.asarray(lats, dtype=np.float64)
+        self.lons = np.asarray(lons, dtype=np.float64)
+        self.positions = np.asarray(positions, dtype=np.int64)
+        self.size = len(self.positions)
+
+        if order is not None and sorted_cells is not None:
+            # Previously built order, e.g. loaded from a binary layer file
+            self._order, self._sorted_cells = order, sorted_cells
+        else:
+            cell_ids = self._rows(self.lats) * self.n_cols + self._cols(self.lons)
+            self._order = np.argsort(cell_ids, kind='stable')
+            self._sorted_cells = cell_ids[self._order]
+
+    @property
+    def nbytes(self) -> int:
+        return self.lats.nbytes + self.lons.nbytes + self.positions.nbytes + 2 * self._order.nbytes
+
+    def _rows(self, lats: np.ndarray) -> np.ndarray:
+        rows = np.floor((np.asarray(lats) + 90) / self.cell_size).astype(np.int64)
+        return np.clip(rows, 0, self.n_rows - 1)
+
+    def _cols(self, lons: np.ndarray) -> np.ndarray:
+        return np.floor((np.asarray(lons) + 180) / self.cell_size).astype(np.int64) % self.n_cols
+
+    def query_radius(self, lat: float, lon: float, radius_km: float) -> np.ndarray:
+        """Index rows of all points that may lie within radius_km, in ascending order"""
+        angular = radius_km / EARTH_RADIUS_KM
+        if angular >= math.pi:
+            return np.arange(self.size)
+
+        delta_lat = math.degrees(angular)
+        lat_min, lat_max = lat - delta_lat, lat + delta_lat
+        first_row = int(self._rows(max(lat_min, -90)))
+        last_row = int(self._rows(min(lat_max, 90)))
+
+        if lat_min <= -90 or lat_max >= 90:
+            # Circle covers a pole, so every longitude is in range
+            return self._collect(first_row, last_row, [(0, self.n_cols - 1)])
+
+        ratio = math.sin(angular) / math.cos(math.radians(lat))
+        if ratio >= 1:
+            return self._collect(first_row, last_row, [(0, self.n_cols - 1)])
+
+        delta_lon = math.degrees(math.asin(ratio))
+        first_col = int(math.floor((lon - delta_lon + 180) / self.cell_size))
+        last_col = int(math.floor((lon + delta_lon + 180) / self.cell_size))
+        if last_col - first_col + 1 >= self.n_cols:
+            col_spans = [(0, self.n_cols - 1)]
+        elif first_col < 0:
+            # Column range wraps across the antimeridian
+            col_spans = [(0, last_col), (first_col % self.n_cols, self.n_cols - 1)]
+        elif last_col >= self.n_cols:
+            col_spans = [(first_col, self.n_cols - 1), (0, last_col % self.n_cols)]
+        else:
+            col_spans = [(first_col, last_col)]
+
+        return self._collect(first_row, last_row, col_spans)
+
+    def query_radius_batch(self, lats: np.ndarray, lons: np.ndarray,
+                           radius_km: float) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Candidate pairs of many radius queries at once: (center indices, index rows).
+        Each center visits the same cells as query_radius, but the cell runs of all
+        centers are looked up with one searchsorted instead of a loop per center.
+        """
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        n_centers = len(lats)
+        angular = radius_km / EARTH_RADIUS_KM
+        if angular >= math.pi:
+            return np.repeat(np.arange(n_centers), self.size), np.tile(np.arange(self.size), n_centers)
+
+        delta_lat = math.degrees(angular)
+        lat_min, lat_max = lats - delta_lat, lats + delta_lat
+        first_rows = self._rows(np.maximum(lat_min, -90))
+        last_rows = self._rows(np.minimum(lat_max, 90))
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratio = math.sin(angular) / np.cos(np.radians(lats))
+        # Circles covering a pole, or too wide for their latitude, span every longitude
+        full = (lat_min <= -90) | (lat_max >= 90) | ~(ratio < 1)
+        delta_lon = np.degrees(np.arcsin(np.where(full, 0.0, ratio)))
+        first_cols = np.floor((lons - delta_lon + 180) / self.cell_size).astype(np.int64)
+        last_cols = np.floor((lons + delta_lon + 180) / self.cell_size).astype(np.int64)
+        full |= last_cols - first_cols + 1 >= self.n_cols
+        first_cols[full] = 0
+        last_cols[full] = self.n_cols - 1
+
+        # Column ranges wrapping across the antimeridian split into two spans
+        wraps_west = first_cols < 0
+        wraps_east = last_cols >= self.n_cols
+        wrapped = np.flatnonzero(wraps_west | wraps_east)
+        span_centers = np.concatenate([np.arange(n_centers), wrapped])
+        span_first = np.concatenate([np.where(wraps_west, 0, first_cols),
+                                     np.where(wraps_west[wrapped], first_cols[wrapped] % self.n_cols, 0)])
+        span_last = np.concatenate([np.where(wraps_east, self.n_cols - 1, last_cols),
+                                    np.where(wraps_west[wrapped], self.n_cols - 1, last_cols[wrapped] % self.n_cols)])
+
+        # One run of sorted cell ids per span and grid row
+        row_counts = last_rows[span_centers] - first_rows[span_centers] + 1
+        run_rows = concat_ranges(first_rows[span_centers], last_rows[span_centers] + 1)
+        lo = np.searchsorted(self._sorted_cells, run_rows * self.n_cols + np.repeat(span_first, row_counts), 'left')
+        hi = np.searchsorted(self._sorted_cells, run_rows * self.n_cols + np.repeat(span_last, row_counts), 'right')
+        centers = np.repeat(np.repeat(span_centers, row_counts), hi - lo)
+        return centers, self._order[concat_ranges(lo, hi)]
+
+    def query_bbox(self, min_lon: float, min_lat: float, max_lon: float, max_lat: float) -> np.ndarray:
+        """
+        Index rows of all points inside a bounding box, in ascending order.
+        Longitudes outside [-180, 180) are wrapped; min_lon > max_lon crosses the antimeridian.
+        """
+        if max_lon - min_lon >= 360:
+            min_lon, max_lon = -180.0, 180.0
+        else:
+            min_lon = (min_lon + 180) % 360 - 180
+            max_lon = (max_lon + 180) % 360 - 180
+            if max_lon == -180 and min_lon > max_lon:
+                max_lon = 180.0
+
+        first_row, last_row = int(self._rows(min_lat)), int(self._rows(max_lat))
+        first_col, last_col = int(self._cols(min_lon)), int(self._cols(max_lon))
+        if max_lon >= 180:
+            last_col = self.n_cols - 1
+        if min_lon <= max_lon:
+            col_spans = [(first_col, last_col)]
+        else:
+            col_spans = [(first_col, self.n_cols - 1), (0, last_col)]
+
+        rows = self._collect(first_row, last_row, col_spans)
+        lats, lons = self.lats[rows], self.lons[rows]
+        inside = (lats >= min_lat) & (lats <= max_lat)
+        if min_lon <= max_lon:
+            inside &= (lons >= min_lon) & (lons <= max_lon)
+        else:
+            inside &= (lons >= min_lon) | (lons <= max_lon)
+        return rows[inside]
+
+    def _collect(self, first_row: int, last_row: int, col_spans: List[Tuple[int, int]]) -> np.ndarray:
+        """Gather index rows for a window of grid rows and column spans"""
+        if first_row == 0 and last_row == self.n_rows - 1 and col_spans == [(0, self.n_cols - 1)]:
+            return np.arange(self.size)
+
+        row_starts = np.arange(first_row, last_row + 1, dtype=np.int64) * self.n_cols
+        slices = []
+        for first_col, last_col in col_spans:
+            # Each grid row's column span is a contiguous run of sorted cell ids
+            lo = np.searchsorted(self._sorted_cells, row_starts + first_col, side='left')
+            hi = np.searchsorted(self._sorted_cells, row_starts + last_col, side='right')
+            for start, stop in zip(lo, hi):
+                if stop > start:
+                    slices.append(self._order[start:stop])
+
+        if not slices:
+            return np.empty(0, dtype=np.int64)
+        rows = np.concatenate(slices)
+        rows.sort()
+        return rows
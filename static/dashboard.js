@@ -23,6 +23,7 @@ class DisasterMapApp {
         this.updateClock();
         this.loadBookmarks();
         this.loadAnalytics();
+        this.connectEvents();
         
         // Load initial flood layer
         this.toggleLayer('flood', true);
@@ -182,33 +183,29 @@ class DisasterMapApp {
     
     async toggleLayer(layerType, show) {
         if (show) {
-            if (this.layers[layerType]) {
-                this.map.addLayer(this.layers[layerType]);
-                return;
-            }
-            
-            try {
-                const response = await fetch(`/api/disaster-data/${layerType}`);
-                if (!response.ok) throw new Error('Failed to load disaster data');
-                
-                const data = await response.json();
-                
-                // Create layer with custom styling
-                this.layers[layerType] = L.geoJSON(data, {
+            if (!this.layers[layerType]) {
+                // Features are fetched as z/x/y vector tiles for the visible part of the map
+                this.layers[layerType] = new DisasterTileLayer(layerType, {
                     pointToLayer: (feature, latlng) => {
+                        if (feature.properties.cluster) {
+                            return this.createClusterMarker(latlng, layerType, feature.properties);
+                        }
                         return this.createDisasterMarker(latlng, layerType, feature.properties);
                     },
                     onEachFeature: (feature, layer) => {
-                        layer.bindPopup(this.createDisasterPopup(feature, layerType));
+                        if (feature.properties.cluster) {
+                            layer.bindPopup(this.createClusterPopup(feature, layerType));
+                        } else {
+                            layer.bindPopup(this.createDisasterPopup(feature, layerType));
+                        }
                     }
                 });
-                
-                this.map.addLayer(this.layers[layerType]);
-                
-            } catch (error) {
-                console.error(`Error loading ${layerType} data:`, error);
-                this.showError(`Failed to load ${layerType} data`);
+                this.layers[layerType].on('tileerror', () => {
+                    this.showError(`Failed to load ${layerType} data`);
+                });
             }
+            
+            this.map.addLayer(this.layers[layerType]);
         } else {
             if (this.layers[layerType]) {
                 this.map.removeLayer(this.layers[layerType]);
@@ -216,6 +213,46 @@ class DisasterMapApp {
         }
     }
     
+    createClusterMarker(latlng, type, properties) {
+        const colors = {
+            flood: '#007bff',
+            wildfire: '#dc3545',
+            drought: '#ffc107',
+            earthquake: '#6c757d'
+        };
+        
+        const count = properties.point_count;
+        const size = count >= 1000 ? 40 : count >= 100 ? 32 : 24;
+        
+        return L.marker(latlng, {
+            icon: L.divIcon({
+                className: 'cluster-marker',
+                html: `<div style="background: ${colors[type]}; width: ${size}px; height: ${size}px; line-height: ${size}px; border-radius: 50%; border: 2px solid #fff; color: #fff; text-align: center; font-size: 12px; font-weight: bold; opacity: 0.85;">${count.toLocaleString()}</div>`,
+                iconSize: [size, size],
+                iconAnchor: [size / 2, size / 2]
+            })
+        });
+    }
+    
+    createClusterPopup(feature, type) {
+        const props = feature.properties;
+        const risk = props.risk_levels || {};
+        const [lon, lat] = feature.geometry.coordinates;
+        
+        return `
+            <div class="popup-disaster">
+                <h6><i class="fas fa-${this.getDisasterIcon(type)}"></i> ${props.point_count.toLocaleString()} ${type.charAt(0).toUpperCase() + type.slice(1)} Alerts</h6>
+                <p><strong>High Risk:</strong> <span class="risk-high">${risk.high || 0}</span></p>
+                <p><strong>Medium Risk:</strong> <span class="risk-medium">${risk.medium || 0}</span></p>
+                <p><strong>Low Risk:</strong> <span class="risk-low">${risk.low || 0}</span></p>
+                ${props.population_affected ? `<p><strong>Population Affected:</strong> ${props.population_affected.toLocaleString()}</p>` : ''}
+                <button class="btn btn-sm btn-primary mt-2" onclick="app.map.setView([${lat}, ${lon}], app.map.getZoom() + 2)">
+                    <i class="fas fa-search-plus"></i> Zoom In
+                </button>
+            </div>
+        `;
+    }
+    
     createDisasterMarker(latlng, type, properties) {
         const colors = {
             flood: '#007bff',
@@ -438,6 +475,8 @@ class DisasterMapApp {
             this.bookmarks.push(bookmark);
             this.updateBookmarksList();
             this.showSuccess('Bookmark added successfully');
+            // The server scores new bookmarks right away
+            setTimeout(() => this.loadBookmarkRisk(), 2000);
             
         } catch (error) {
             console.error('Bookmark error:', error);
@@ -447,14 +486,42 @@ class DisasterMapApp {
     
     async loadBookmarks() {
         try {
-            const response = await fetch('/api/bookmarks');
-            this.bookmarks = await response.json();
+            // Follow the pagination cursor until every bookmark is loaded
+            const bookmarks = [];
+            let cursor = null;
+            do {
+                const url = cursor === null ? '/api/bookmarks' : `/api/bookmarks?cursor=${cursor}`;
+                const response = await fetch(url);
+                if (!response.ok) throw new Error('Failed to load bookmarks');
+                bookmarks.push(...await response.json());
+                cursor = response.headers.get('X-Next-Cursor');
+            } while (cursor !== null);
+            
+            this.bookmarks = bookmarks;
             this.updateBookmarksList();
+            this.loadBookmarkRisk();
         } catch (error) {
             console.error('Failed to load bookmarks:', error);
         }
     }
     
+    // Risk of saved locations is precomputed server-side; one request covers all bookmarks
+    async loadBookmarkRisk() {
+        try {
+            const response = await fetch('/api/bookmarks/risk');
+            if (!response.ok) throw new Error('Bookmark risk unavailable');
+            
+            const data = await response.json();
+            this.bookmarkRisk = {};
+            data.bookmarks.forEach(assessment => {
+                this.bookmarkRisk[assessment.bookmark_id] = assessment;
+            });
+            this.updateBookmarksList();
+        } catch (error) {
+            console.error('Failed to load bookmark risk:', error);
+        }
+    }
+    
     updateBookmarksList() {
         const container = document.getElementById('bookmarks-list');
         container.innerHTML = '';
@@ -462,9 +529,11 @@ class DisasterMapApp {
         this.bookmarks.forEach(bookmark => {
             const item = document.createElement('div');
             item.className = 'bookmark-item bg-secondary text-light';
+            const risk = (this.bookmarkRisk || {})[bookmark.id];
             item.innerHTML = `
                 <i class="fas fa-bookmark me-2"></i>
                 ${bookmark.name}
+                ${risk ? `<span class="risk-${risk.risk_level} float-end">${risk.risk_level.toUpperCase()}</span>` : ''}
             `;
             item.addEventListener('click', () => {
                 this.map.setView([bookmark.lat, bookmark.lon], 10);
@@ -561,10 +630,8 @@ class DisasterMapApp {
             const response = await fetch('/api/analytics');
             const data = await response.json();
             
-            this.updateStatistics(data);
-            this.createTrendChart(data.trend_data);
-            this.createRiskChart(data.risk_distribution);
-            this.createDisasterTypesChart(data.by_type);
+            this.analytics = data;
+            this.renderAnalytics(data);
             this.updateActivityFeed();
             
         } catch (error) {
@@ -572,6 +639,95 @@ class DisasterMapApp {
         }
     }
     
+    renderAnalytics(data) {
+        this.updateStatistics(data);
+        this.createTrendChart(data.trend_data);
+        this.createRiskChart(data.risk_distribution);
+        this.createDisasterTypesChart(data.by_type);
+    }
+    
+    // Server push: layer versions, analytics deltas and bookmark risk changes.
+    // EventSource reconnects by itself and resumes from the last event ID.
+    connectEvents() {
+        if (!window.EventSource) {
+            this.pollEvents();
+            return;
+        }
+        const events = new EventSource('/api/events');
+        
+        // The server caps open streams per worker and asks extra clients to poll instead
+        events.addEventListener('fallback', (e) => {
+            events.close();
+            this.pollEvents(JSON.parse(e.data).poll_interval_s);
+        });
+        
+        events.addEventListener('layer', (e) => {
+            const change = JSON.parse(e.data);
+            const layer = this.layers[change.disaster_type];
+            if (layer) {
+                layer.setVersion(change.version);
+            }
+        });
+        
+        events.addEventListener('analytics', (e) => {
+            if (!this.analytics) return;
+            const delta = JSON.parse(e.data);
+            Object.entries(delta).forEach(([key, value]) => {
+                if (key === 'published_at') return;
+                const current = this.analytics[key];
+                const isObject = (v) => v && typeof v === 'object' && !Array.isArray(v);
+                this.analytics[key] = isObject(value) && isObject(current) ? { ...current, ...value } : value;
+            });
+            this.renderAnalytics(this.analytics);
+        });
+        
+        events.addEventListener('bookmark-risk', (e) => {
+            const update = JSON.parse(e.data);
+            this.bookmarkRisk = this.bookmarkRisk || {};
+            update.changes.forEach(change => {
+                const assessment = this.bookmarkRisk[change.bookmark_id] || { bookmark_id: change.bookmark_id };
+                this.bookmarkRisk[change.bookmark_id] = { ...assessment, risk_level: change.risk_level };
+            });
+            this.updateBookmarksList();
+        });
+        
+        // Too many events were missed to replay; reload everything once
+        events.addEventListener('reset', () => {
+            this.loadAnalytics();
+            this.loadBookmarkRisk();
+            Object.values(this.layers).forEach(layer => {
+                if (layer) layer.redraw();
+            });
+        });
+    }
+    
+    pollEvents(intervalSeconds = 15) {
+        // Layer versions and the bookmark risk pass are the same in every worker,
+        // so comparing them between polls catches what the event stream would push
+        let state = null;
+        const poll = () => fetch('/api/events/state')
+            .then(response => {
+                if (!response.ok) throw new Error('Failed to poll for updates');
+                return response.json();
+            })
+            .then(next => {
+                if (state) {
+                    let layersChanged = false;
+                    Object.entries(next.layers).forEach(([disasterType, version]) => {
+                        if (state.layers[disasterType] === version) return;
+                        layersChanged = true;
+                        if (this.layers[disasterType]) this.layers[disasterType].setVersion(version);
+                    });
+                    if (layersChanged) this.loadAnalytics();
+                    if (state.bookmark_risk_run !== next.bookmark_risk_run) this.loadBookmarkRisk();
+                }
+                state = next;
+            })
+            .catch(error => console.error('Update poll failed:', error))
+            .finally(() => setTimeout(poll, intervalSeconds * 1000));
+        poll();
+    }
+    
     updateStatistics(data) {
         // Statistics elements have been removed, so skip this function
         return;
@@ -609,7 +765,10 @@ class DisasterMapApp {
     
     createTrendChart(trendData) {
         const ctx = document.getElementById('trend-chart').getContext('2d');
-        new Chart(ctx, {
+        if (this.trendChart) {
+            this.trendChart.destroy();
+        }
+        this.trendChart = new Chart(ctx, {
             type: 'line',
             data: {
                 labels: trendData.map(d => d.month),
@@ -648,7 +807,10 @@ class DisasterMapApp {
     
     createRiskChart(riskData) {
         const ctx = document.getElementById('risk-chart').getContext('2d');
-        new Chart(ctx, {
+        if (this.riskChart) {
+            this.riskChart.destroy();
+        }
+        this.riskChart = new Chart(ctx, {
             type: 'doughnut',
             data: {
                 labels: ['High Risk', 'Medium Risk', 'Low Risk'],
@@ -864,6 +1026,135 @@ class DisasterMapApp {
     }
 }
 
+// Leaflet layer drawing a disaster layer from /api/tiles/<type>/<z>/<x>/<y>.
+// Tiles hold integer coordinates on an extent-sized grid and dictionary-encoded
+// properties; each tile is decoded to GeoJSON and its points drawn as one L.geoJSON group.
+// Every point belongs to exactly one tile, but lines and polygons arrive in each tile
+// they overlap, so those are drawn once per feature id and kept while any tile holds them.
+const DisasterTileLayer = L.GridLayer.extend({
+    initialize: function(disasterType, geoJsonOptions) {
+        L.GridLayer.prototype.initialize.call(this, { updateWhenZooming: false, keepBuffer: 1 });
+        this.disasterType = disasterType;
+        this.geoJsonOptions = geoJsonOptions;
+        // Layer version from the event stream; part of tile URLs so HTTP caches never serve old tiles
+        this.version = null;
+        this.tileGroups = {};
+        this.tileShapes = {};
+        this.shapes = {};
+        this.on('tileunload', (e) => this.removeTileGroup(this._tileCoordsToKey(e.coords)));
+    },
+    
+    onRemove: function(map) {
+        Object.keys(this.tileGroups).forEach(key => this.removeTileGroup(key));
+        L.GridLayer.prototype.onRemove.call(this, map);
+    },
+    
+    createTile: function(coords, done) {
+        const tile = document.createElement('div');
+        const key = this._tileCoordsToKey(coords);
+        const n = Math.pow(2, coords.z);
+        const x = ((coords.x % n) + n) % n;
+        
+        const query = this.version ? `?v=${this.version}` : '';
+        fetch(`/api/tiles/${this.disasterType}/${coords.z}/${x}/${coords.y}${query}`)
+            .then(response => {
+                if (!response.ok) throw new Error('Failed to load tile');
+                return response.json();
+            })
+            .then(data => {
+                // The tile may have been unloaded while its request was in flight
+                if (this._map && this._tiles[key]) {
+                    this.drawTile(key, this.decodeTile(data));
+                }
+                done(null, tile);
+            })
+            .catch(error => done(error, tile));
+        return tile;
+    },
+    
+    setVersion: function(version) {
+        if (version === this.version) return;
+        this.version = version;
+        if (this._map) this.redraw();
+    },
+    
+    drawTile: function(key, collection) {
+        const points = [];
+        const shapeIds = [];
+        collection.features.forEach(feature => {
+            const isPoint = feature.geometry.type === 'Point' || feature.geometry.type === 'MultiPoint';
+            if (isPoint || feature.id === null || feature.id === undefined) {
+                points.push(feature);
+                return;
+            }
+            let shape = this.shapes[feature.id];
+            if (!shape) {
+                shape = { layer: L.geoJSON(feature, this.geoJsonOptions).addTo(this._map), tiles: 0 };
+                this.shapes[feature.id] = shape;
+            }
+            shape.tiles++;
+            shapeIds.push(feature.id);
+        });
+        this.tileGroups[key] = L.geoJSON({ type: 'FeatureCollection', features: points }, this.geoJsonOptions)
+            .addTo(this._map);
+        this.tileShapes[key] = shapeIds;
+    },
+    
+    removeTileGroup: function(key) {
+        const group = this.tileGroups[key];
+        if (group) {
+            if (this._map) this._map.removeLayer(group);
+            delete this.tileGroups[key];
+        }
+        (this.tileShapes[key] || []).forEach(id => {
+            const shape = this.shapes[id];
+            if (shape && --shape.tiles === 0) {
+                if (this._map) this._map.removeLayer(shape.layer);
+                delete this.shapes[id];
+            }
+        });
+        delete this.tileShapes[key];
+    },
+    
+    decodeTile: function(data) {
+        const n = Math.pow(2, data.z);
+        const toLatLon = (px, py) => {
+            const lon = (data.x + px / data.extent) / n * 360 - 180;
+            const mercator = Math.PI * (1 - 2 * (data.y + py / data.extent) / n);
+            return [lon, Math.atan(Math.sinh(mercator)) * 180 / Math.PI];
+        };
+        const decodeLine = (flat) => {
+            const coordinates = [];
+            for (let i = 0; i < flat.length; i += 2) coordinates.push(toLatLon(flat[i], flat[i + 1]));
+            return coordinates;
+        };
+        
+        const features = data.features.map(feature => {
+            const properties = {};
+            for (let i = 0; i < feature.tags.length; i += 2) {
+                properties[data.keys[feature.tags[i]]] = data.values[feature.tags[i + 1]];
+            }
+            
+            let geometry;
+            if (feature.type === 1) {
+                const points = decodeLine(feature.geometry[0]);
+                geometry = points.length === 1
+                    ? { type: 'Point', coordinates: points[0] }
+                    : { type: 'MultiPoint', coordinates: points };
+            } else if (feature.type === 2) {
+                geometry = { type: 'MultiLineString', coordinates: feature.geometry.map(decodeLine) };
+            } else {
+                geometry = {
+                    type: 'MultiPolygon',
+                    coordinates: feature.geometry.map(rings => rings.map(decodeLine))
+                };
+            }
+            return { type: 'Feature', id: feature.id, geometry: geometry, properties: properties };
+        });
+        return { type: 'FeatureCollection', features: features };
+    }
+});
+
 // Initialize the application when DOM is loaded
 let app;
 document.addEventListener('DOMContentLoaded', () => {
@@ -0,0 +1,90 @@
+"""Incremental layer aggregates and the analytics engine"""
+
+import copy
+import json
+
+import pytest
+
+from analytics import AnalyticsEngine, LayerAggregates
+from layer_store import ColumnarLayer
+from utils import GeoJSONUtils, LayerCache
+
+
+def _normalized(aggregates):
+    return (aggregates.count, +aggregates.risk_levels, +aggregates.severities, +aggregates.months)
+
+
+@pytest.fixture
+def layer():
+    with open('data/flood_zones.geojson') as f:
+        return json.load(f)
+
+
+def _point(feature_id, risk_level, severity, last_updated):
+    return {
+        'type': 'Feature',
+        'geometry': {'type': 'Point', 'coordinates': [10.0, 20.0]},
+        'properties': {'id': feature_id, 'risk_level': risk_level, 'severity': severity,
+                       'last_updated': last_updated}
+    }
+
+
+def test_updated_matches_full_recompute(layer):
+    new = copy.deepcopy(layer)
+    del new['features'][0]
+    new['features'][1]['properties']['risk_level'] = 'low'
+    new['features'][2]['properties']['last_updated'] = '2019-01-05'
+    del new['features'][3]['properties']['severity']
+    new['features'].append(_point('new-1', 'high', 'critical', '2024-02-01T00:00:00Z'))
+    new['features'].append(_point('new-2', 'medium', 'moderate', 'not a date'))
+
+    old_columns = ColumnarLayer.from_geojson(layer)
+    new_columns = ColumnarLayer.from_geojson(new)
+    previous = LayerAggregates.from_columns(old_columns)
+    updated = LayerAggregates.updated(previous, old_columns, new_columns)
+
+    assert _normalized(updated) == _normalized(LayerAggregates.from_columns(new_columns))
+    # The previous version's aggregates are left alone
+    assert _normalized(previous) == _normalized(LayerAggregates.from_columns(old_columns))
+
+
+def test_updated_handles_empty_layers(layer):
+    empty = ColumnarLayer.from_geojson({'type': 'FeatureCollection', 'features': []})
+    full = ColumnarLayer.from_geojson(layer)
+    grown = LayerAggregates.updated(LayerAggregates.from_columns(empty), empty, full)
+    assert _normalized(grown) == _normalized(LayerAggregates.from_columns(full))
+    emptied = LayerAggregates.updated(grown, full, empty)
+    assert _normalized(emptied) == _normalized(LayerAggregates())
+
+
+def test_cache_reload_updates_aggregates(tmp_path, layer):
+    path = tmp_path / 'flood_zones.geojson'
+    path.write_text(json.dumps(layer))
+    cache = LayerCache()
+    first = cache.get(str(path))
+
+    layer['features'].append(_point('new-1', 'high', 'critical', '2024-02-01'))
+    path.write_text(json.dumps(layer, indent=1))
+    second = cache.get(str(path))
+
+    assert second is not first
+    assert _normalized(second.aggregates) == _normalized(LayerAggregates.from_columns(second.columns))
+
+
+def test_engine_follows_layer_swaps():
+    utils = GeoJSONUtils(cache=LayerCache())
+    original = utils.get_layer('flood')
+    current = {'flood': original}
+    engine = AnalyticsEngine(['flood'], lambda t: current[t])
+    assert engine.get()['total_incidents'] == original.aggregates.count
+
+    newer = copy.copy(original)
+    newer.aggregates = original.aggregates.copy()
+    newer.aggregates.add_feature({'risk_level': 'high'})
+    current['flood'] = newer
+    snapshot = engine.get()
+    assert snapshot['total_incidents'] == original.aggregates.count + 1
+    assert snapshot['risk_distribution']['high'] == original.aggregates.risk_levels['high'] + 1
+
+    current['flood'] = None
+    assert engine.get()['total_incidents'] == 0
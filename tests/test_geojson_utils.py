@@ -0,0 +1,23 @@
+"""GeoJSONUtils layer loading"""
+
+import json
+
+import pytest
+
+from utils import DISASTER_TYPES, GeoJSONUtils, LayerCache
+
+
+@pytest.fixture
+def geojson_utils():
+    return GeoJSONUtils(cache=LayerCache())
+
+
+@pytest.mark.parametrize('disaster_type', DISASTER_TYPES)
+def test_load_disaster_data_matches_payload(geojson_utils, disaster_type):
+    data = geojson_utils.load_disaster_data(disaster_type)
+    assert data['type'] == 'FeatureCollection'
+    assert data == json.loads(geojson_utils.load_disaster_payload(disaster_type))
+
+
+def test_load_disaster_data_of_missing_layer_is_empty(geojson_utils):
+    assert geojson_utils.load_disaster_data('unknown') == {'type': 'FeatureCollection', 'features': []}
@@ -0,0 +1,75 @@
+"""Batched polygon queries against the per-point ones"""
+
+import numpy as np
+import pytest
+
+from polygon_index import PolygonIndex
+
+RADII = (0, 50, 300, 3000)
+
+
+@pytest.fixture(scope='module')
+def index():
+    rng = np.random.default_rng(7)
+    geometries = {}
+    for row in range(600):
+        center_lon, center_lat = rng.uniform(-180, 180), rng.uniform(-85, 85)
+        angles = np.sort(rng.uniform(0, 2 * np.pi, rng.integers(5, 20)))
+        radii = rng.uniform(0.2, 3.0, len(angles))
+        shell = np.column_stack([center_lon + radii * np.cos(angles), center_lat + radii * np.sin(angles)])
+        rings = [shell.tolist() + [shell[0].tolist()]]
+        if row % 4 == 0:
+            geometries[row] = {'type': 'MultiPolygon', 'coordinates': [rings, [[[p[0] + 4, p[1]] for p in shell]]]}
+        else:
+            geometries[row] = {'type': 'Polygon', 'coordinates': rings}
+    # Zones straddling the antimeridian
+    geometries[1000] = {'type': 'Polygon', 'coordinates': [[[179.0, 5.0], [181.0, 5.0], [181.0, 8.0], [179.0, 8.0]]]}
+    geometries[1001] = {'type': 'Polygon', 'coordinates': [[[-181.0, -5.0], [-179.0, -5.0], [-179.0, -2.0]]]}
+    return PolygonIndex.from_geometries(geometries)
+
+
+@pytest.fixture(scope='module')
+def points():
+    rng = np.random.default_rng(11)
+    lats = rng.uniform(-89, 89, 300)
+    lons = rng.uniform(-180, 180, 300)
+    # Antimeridian and polar query points
+    lats = np.concatenate([lats, [6.0, 6.0, -3.0, 0.0, 89.99, -89.99, 90.0]])
+    lons = np.concatenate([lons, [179.9, -179.9, 180.0, -180.0, 10.0, -170.0, 0.0]])
+    return lats, lons
+
+
+@pytest.mark.parametrize('radius', RADII)
+def test_within_batch_matches_within(index, points, radius):
+    lats, lons = points
+    centers, rows, distances = index.within_batch(lats, lons, radius)
+    assert np.all(np.diff(centers) >= 0)
+    for i, (lat, lon) in enumerate(zip(lats, lons)):
+        expected_rows, expected_distances = index.within(lat, lon, radius)
+        assert np.array_equal(rows[centers == i], expected_rows)
+        assert np.allclose(distances[centers == i], expected_distances)
+
+
+def test_within_batch_searches_across_the_antimeridian(index):
+    # The first point's search box wraps onto the far side of the antimeridian
+    centers, rows, distances = index.within_batch(np.array([-3.5, -3.5]), np.array([179.9, 0.0]), 50)
+    assert np.array_equal(centers, [0])
+    assert list(index.positions[rows]) == [1001]
+    assert distances[0] <= 50
+
+
+def test_query_batch_matches_query(index):
+    rng = np.random.default_rng(3)
+    corners = np.column_stack([rng.uniform(-180, 170, 200), rng.uniform(-90, 80, 200)])
+    boxes = np.column_stack([corners, corners + rng.uniform(0, 10, (200, 2))])
+    queries, found = index.tree.query_batch(boxes)
+    for i, box in enumerate(boxes):
+        assert np.array_equal(np.sort(found[queries == i]), index.tree.query(*box))
+
+
+def test_empty_inputs(index):
+    centers, rows, distances = index.within_batch(np.empty(0), np.empty(0), 100)
+    assert len(centers) == len(rows) == len(distances) == 0
+    empty = PolygonIndex.from_geometries({})
+    centers, rows, _ = empty.within_batch(np.array([0.0]), np.array([0.0]), 100)
+    assert len(centers) == len(rows) == 0
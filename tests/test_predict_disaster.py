@@ -0,0 +1,29 @@
+"""Satellite readings served through the feature store keep the direct fetch's response shape"""
+
+from datetime import datetime
+
+from ml_model.feature_store import FeatureStore
+from ml_model.predict_disaster import DisasterPredictor
+
+BASELINE_FIELDS = {'ndvi', 'ndwi', 'land_surface_temperature', 'precipitation', 'cloud_cover',
+                   'data_source', 'acquisition_date'}
+
+
+def test_satellite_data_keeps_baseline_fields(tmp_path):
+    predictor = DisasterPredictor(feature_store=FeatureStore(directory=str(tmp_path), enabled=True))
+    data = predictor.get_satellite_data(34.0522, -118.2437)
+    assert set(data) == BASELINE_FIELDS
+    assert data['data_source'] == 'simulated'
+    # A full timestamp, as before, not just a date
+    assert 'T' in data['acquisition_date']
+    datetime.fromisoformat(data['acquisition_date'])
+    assert all(type(data[band]) is float for band in BASELINE_FIELDS - {'data_source', 'acquisition_date'})
+    assert 0 <= data['ndvi'] <= 1 and 250 <= data['land_surface_temperature'] <= 350
+
+
+def test_satellite_data_is_reused_within_a_cell(tmp_path):
+    predictor = DisasterPredictor(feature_store=FeatureStore(directory=str(tmp_path), enabled=True))
+    first = predictor.get_satellite_data(34.0522, -118.2437)
+    again = predictor.get_satellite_data(34.0522, -118.2437)
+    assert {k: v for k, v in first.items() if k != 'acquisition_date'} == \
+        {k: v for k, v in again.items() if k != 'acquisition_date'}
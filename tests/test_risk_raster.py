@@ -0,0 +1,73 @@
+"""Risk raster keyed on the model fingerprint, as seen by several workers"""
+
+import pytest
+
+from ml_model import risk_raster as raster_module
+from ml_model.feature_store import FeatureStore
+from ml_model.predict_disaster import DisasterPredictor
+from ml_model.registry import ModelRegistry
+from ml_model.risk_raster import RiskRaster
+
+
+class RetrainedPredictor(DisasterPredictor):
+    model_version = 'placeholder-2'
+
+
+def make_predictor():
+    return DisasterPredictor(feature_store=FeatureStore(enabled=False))
+
+
+def make_retrained():
+    return RetrainedPredictor(feature_store=FeatureStore(enabled=False))
+
+
+@pytest.fixture(autouse=True)
+def no_check_interval(monkeypatch):
+    # Every lookup re-checks the file, as it would after CHECK_INTERVAL
+    monkeypatch.setattr(raster_module, 'CHECK_INTERVAL', 0.0)
+
+
+def test_fingerprint_is_stable_and_tracks_weights(tmp_path):
+    assert make_predictor().fingerprint() == make_predictor().fingerprint()
+    assert make_predictor().fingerprint() != make_retrained().fingerprint()
+
+    weights = tmp_path / 'flood.h5'
+    weights.write_bytes(b'weights-1')
+    predictor = make_predictor()
+    predictor.model_files = (str(weights),)
+    first = predictor.fingerprint()
+    weights.write_bytes(b'weights-2')
+    assert predictor.fingerprint() != first
+    assert first.startswith('placeholder-1-')
+
+
+def test_reload_in_one_worker_stops_the_others_serving_its_raster(tmp_path):
+    path = str(tmp_path / 'risk.dmr')
+    workers = [ModelRegistry(make_predictor), ModelRegistry(make_predictor)]
+    rasters = [RiskRaster(path, resolution_deg=45, processes=1) for _ in workers]
+    for registry in workers:
+        registry.get()
+    assert workers[0].model_version == workers[1].model_version
+
+    assert rasters[0].rebuild(workers[0].factory, workers[0].model_version)
+    for registry, raster in zip(workers, rasters):
+        assert raster.lookup(10.0, 20.0, registry.model_version)['source'] == 'raster'
+
+    # Worker 0 loads a retrained model and rebuilds the shared file for it
+    workers[0].reload(make_retrained)
+    assert workers[0].model_version != workers[1].model_version
+    assert rasters[0].lookup(10.0, 20.0, workers[0].model_version) is None
+    assert rasters[0].rebuild(workers[0].factory, workers[0].model_version)
+
+    assert rasters[0].lookup(10.0, 20.0, workers[0].model_version)['source'] == 'raster'
+    assert rasters[1].lookup(10.0, 20.0, workers[1].model_version) is None
+    assert rasters[1].status()['model_version'] == workers[0].model_version
+
+
+def test_reloading_the_same_model_keeps_the_raster(tmp_path):
+    registry = ModelRegistry(make_predictor)
+    raster = RiskRaster(str(tmp_path / 'risk.dmr'), resolution_deg=45, processes=1)
+    registry.get()
+    assert raster.rebuild(registry.factory, registry.model_version)
+    registry.reload()
+    assert raster.is_current(registry.model_version)
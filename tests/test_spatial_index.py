@@ -0,0 +1,104 @@
+"""Vectorized Haversine and the grid index against the scalar GeoJSONUtils implementation"""
+
+import numpy as np
+import pytest
+
+from spatial_index import GridIndex, haversine_distances, paired_haversine_distances
+from utils import GeoJSONUtils
+
+# Ordinary, antimeridian and polar query centers
+CENTERS = [
+    (40.7128, -74.0060),
+    (-33.8688, 151.2093),
+    (0.0, 179.9),
+    (10.0, -179.95),
+    (89.9, 0.0),
+    (-89.9, 120.0),
+    (90.0, 0.0),
+]
+
+RADII = (10, 500, 5000, 19000, 20000)
+
+
+@pytest.fixture(scope='module')
+def points():
+    rng = np.random.default_rng(42)
+    lats = rng.uniform(-90, 90, 5000)
+    lons = rng.uniform(-180, 180, 5000)
+    # Points straddling the antimeridian and near both poles
+    lats = np.concatenate([lats, [0.0, 0.0, 10.0, 10.0, 89.95, -89.95, 90.0, -90.0]])
+    lons = np.concatenate([lons, [180.0, -180.0, 179.99, -179.99, 45.0, -135.0, 0.0, 0.0]])
+    return lats, lons
+
+
+@pytest.fixture(scope='module')
+def scalar():
+    return GeoJSONUtils().calculate_distance
+
+
+@pytest.mark.parametrize('lat, lon', CENTERS)
+def test_haversine_distances_match_scalar(points, scalar, lat, lon):
+    lats, lons = points
+    expected = np.array([scalar(lat, lon, a, b) for a, b in zip(lats, lons)])
+    assert np.allclose(haversine_distances(lat, lon, lats, lons), expected, rtol=1e-12, atol=1e-9)
+
+
+def test_haversine_distances_matrix_matches_rows(points):
+    lats, lons = points
+    center_lats = [c[0] for c in CENTERS]
+    center_lons = [c[1] for c in CENTERS]
+    matrix = haversine_distances(center_lats, center_lons, lats, lons)
+    assert matrix.shape == (len(CENTERS), len(lats))
+    for row, (lat, lon) in enumerate(CENTERS):
+        assert np.array_equal(matrix[row], haversine_distances(lat, lon, lats, lons))
+
+
+def test_antimeridian_neighbours_are_close(scalar):
+    assert haversine_distances(0.0, 179.99, [0.0], [-179.99])[0] == pytest.approx(2.2239, abs=1e-3)
+    assert haversine_distances(0.0, 179.99, [0.0], [-179.99])[0] == pytest.approx(scalar(0.0, 179.99, 0.0, -179.99))
+
+
+@pytest.mark.parametrize('lat, lon', CENTERS)
+@pytest.mark.parametrize('radius', RADII)
+def test_grid_index_finds_every_point_of_a_full_scan(points, scalar, lat, lon, radius):
+    lats, lons = points
+    index = GridIndex(lats, lons, np.arange(len(lats)))
+    expected = np.flatnonzero(np.array([scalar(lat, lon, a, b) for a, b in zip(lats, lons)]) <= radius)
+    rows = index.query_radius(lat, lon, radius)
+    found = rows[haversine_distances(lat, lon, lats[rows], lons[rows]) <= radius]
+    assert np.array_equal(np.sort(found), expected)
+
+
+@pytest.mark.parametrize('lat, lon', CENTERS)
+def test_radius_boundary_is_inclusive(points, lat, lon):
+    lats, lons = points
+    index = GridIndex(lats, lons, np.arange(len(lats)))
+    distances = haversine_distances(lat, lon, lats, lons)
+    target = int(np.argsort(distances)[10])
+    radius = float(distances[target])
+
+    rows = index.query_radius(lat, lon, radius)
+    within = rows[haversine_distances(lat, lon, lats[rows], lons[rows]) <= radius]
+    assert target in within
+
+    smaller = np.nextafter(radius, 0)
+    rows = index.query_radius(lat, lon, smaller)
+    within = rows[haversine_distances(lat, lon, lats[rows], lons[rows]) <= smaller]
+    assert target not in within
+
+
+@pytest.mark.parametrize('radius', (10, 500, 5000, 20000))
+def test_batched_queries_match_single_queries(points, radius):
+    lats, lons = points
+    index = GridIndex(lats, lons, np.arange(len(lats)))
+    rng = np.random.default_rng(7)
+    center_lats = np.concatenate([rng.uniform(-90, 90, 100), [c[0] for c in CENTERS]])
+    center_lons = np.concatenate([rng.uniform(-180, 180, 100), [c[1] for c in CENTERS]])
+
+    centers, rows = index.query_radius_batch(center_lats, center_lons, radius)
+    for i, (lat, lon) in enumerate(zip(center_lats, center_lons)):
+        assert np.array_equal(np.sort(rows[centers == i]), index.query_radius(lat, lon, radius))
+
+    paired = paired_haversine_distances(center_lats[centers], center_lons[centers], lats[rows], lons[rows])
+    matrix = haversine_distances(center_lats, center_lons, lats, lons)
+    assert np.allclose(paired, matrix[centers, rows], rtol=1e-12, atol=1e-9)
@@ -0,0 +1,71 @@
+"""Retries and the circuit breaker of WeatherAPI._request"""
+
+import pytest
+import requests
+
+from weather_api import CircuitBreaker, CircuitOpenError, WeatherAPI
+
+URL = 'http://upstream.invalid/data/2.5/weather'
+
+
+class FakeSession:
+    """Stands in for requests.Session, answering get() from a list of outcomes"""
+
+    def __init__(self, outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    def get(self, url, params=None, timeout=None):
+        self.calls += 1
+        outcome = self.outcomes.pop(0) if len(self.outcomes) > 1 else self.outcomes[0]
+        if isinstance(outcome, Exception):
+            raise outcome
+        response = requests.Response()
+        response.status_code = outcome
+        response.url = url
+        return response
+
+
+@pytest.fixture
+def api():
+    api = WeatherAPI()
+    api.max_retries = 2
+    api.backoff_base = 0
+    api.breaker = CircuitBreaker(failure_threshold=3, reset_timeout=60)
+    return api
+
+
+def test_retried_call_counts_one_failure(api):
+    api.session = FakeSession([requests.exceptions.ConnectionError()])
+    with pytest.raises(requests.exceptions.ConnectionError):
+        api._request(URL, {})
+    assert api.session.calls == 3
+    assert api.breaker.failures == 1
+    assert api.breaker.state == 'closed'
+
+
+def test_breaker_opens_after_threshold_calls(api):
+    api.session = FakeSession([503])
+    for _ in range(3):
+        with pytest.raises(requests.exceptions.HTTPError):
+            api._request(URL, {})
+    assert api.session.calls == 9
+    assert api.breaker.state == 'open'
+    with pytest.raises(CircuitOpenError):
+        api._request(URL, {})
+    assert api.session.calls == 9
+
+
+def test_success_after_retry_resets_failures(api):
+    api.breaker.failures = 2
+    api.session = FakeSession([requests.exceptions.Timeout(), 200])
+    assert api._request(URL, {}).status_code == 200
+    assert api.breaker.failures == 0
+
+
+def test_request_error_is_not_retried(api):
+    api.session = FakeSession([requests.exceptions.ChunkedEncodingError()])
+    with pytest.raises(requests.exceptions.ChunkedEncodingError):
+        api._request(URL, {})
+    assert api.session.calls == 1
+    assert api.breaker.failures == 1
@@ -1,30 +1,326 @@
 import json
 import os
 import math
-from typing import Dict, List, Tuple
-from datetime import datetime, timedelta
-import random
+import threading
+from collections import OrderedDict
+from functools import wraps
+from typing import Callable, Dict, List, Optional, Tuple
+from datetime import datetime
+
+import numpy as np
+
+from analytics import AnalyticsEngine, LayerAggregates
+from layer_format import BINARY_SUFFIX, open_layer
+from http_cache import EncodedBody, make_etag
+from layer_store import ColumnarLayer, NumericColumn
+from metrics import registry as metrics_registry
+from polygon_index import PolygonIndex
+from spatial_index import GridIndex, cluster_labels, haversine_distances, haversine_within
+from vector_tiles import VectorTileRenderer
+
+
+# Layers shipped in data/, one <type>_zones.geojson file each
+DISASTER_TYPES = ['flood', 'wildfire', 'drought', 'earthquake']
+
+# Viewport queries: features per page by default, and at most
+DEFAULT_PAGE_SIZE = 2000
+MAX_PAGE_SIZE = 10000
+
+# Points are clustered below this zoom level when clustering is requested
+CLUSTER_MAX_ZOOM = 9
+
+
+# Time spent in the layer operations behind the GeoJSON and report endpoints
+GEOJSON_OPERATION_SECONDS = metrics_registry.histogram(
+    'geojson_operation_seconds', 'Duration of GeoJSONUtils layer operations', ('operation', 'disaster_type')
+)
+REPORT_FEATURES = metrics_registry.counter(
+    'geojson_report_features_total', 'Features matched by radius report queries', ('disaster_type',)
+)
+
+
+def _type_label(disaster_type: str) -> str:
+    """Metric label for a disaster type; unknown names share one label to bound cardinality"""
+    return disaster_type if disaster_type in DISASTER_TYPES else 'other'
+
+
+def _timed(operation: str):
+    """Observe a GeoJSONUtils method's duration, labelled by its disaster_type argument"""
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, disaster_type, *args, **kwargs):
+            with GEOJSON_OPERATION_SECONDS.labels(operation, _type_label(disaster_type)).time():
+                return method(self, disaster_type, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _empty_collection() -> Dict:
+    """Empty GeoJSON FeatureCollection"""
+    return {
+        "type": "FeatureCollection",
+        "features": []
+    }
+
+
+class CachedLayer:
+    """
+    A disaster layer in columnar form together with its pre-serialized JSON payload.
+    The parsed dicts are dropped once the columns are built.
+    """
+
+    def __init__(self, path: str, mtime_ns: int, size: int, columns: ColumnarLayer,
+                 index: Optional[GridIndex] = None, payload: Optional[bytes] = None,
+                 polygons: Optional[PolygonIndex] = None, previous: Optional['CachedLayer'] = None):
+        self.path = path
+        self.mtime_ns = mtime_ns
+        self.size = size
+        # Rebuilt with every new version of the file
+        self.columns = columns
+        if index is None:
+            points = columns.point_rows
+            index = GridIndex(columns.lats[points], columns.lons[points], points)
+        self.index = index
+        # Polygon and MultiPolygon zones, which the grid index of points leaves out
+        self.polygons = polygons if polygons is not None else PolygonIndex.from_geometries(columns.geometries)
+        if previous is not None:
+            # Only the features that changed since the previous version are applied
+            self.aggregates = LayerAggregates.updated(previous.aggregates, previous.columns, columns)
+        else:
+            self.aggregates = LayerAggregates.from_columns(columns)
+        self._payload = payload
+        self._body: Optional[EncodedBody] = None
+
+    @classmethod
+    def from_file(cls, path: str, mtime_ns: int, size: int,
+                  validate: Optional[Callable[[Dict], bool]] = None,
+                  previous: Optional['CachedLayer'] = None) -> 'CachedLayer':
+        """
+        Load a layer from a GeoJSON file or a memory-mapped binary layer file.
+        GeoJSON is checked with validate, if given; a ValueError means the file is unusable.
+        previous is the version being replaced, whose aggregates are updated rather than rebuilt.
+        """
+        if path.endswith(BINARY_SUFFIX):
+            columns, index = open_layer(path)
+            return cls(path, mtime_ns, size, columns, index, previous=previous)
+        
+        with open(path, 'r') as f:
+            data = json.load(f)
+        if validate is not None and not validate(data):
+            raise ValueError(f"{path} is not a valid GeoJSON FeatureCollection")
+        # The dicts are at hand, so encode the payload now rather than re-materializing later
+        payload = json.dumps(data, separators=(',', ':')).encode('utf-8')
+        return cls(path, mtime_ns, size, ColumnarLayer.from_geojson(data), payload=payload, previous=previous)
+
+    @property
+    def payload(self) -> bytes:
+        """Compact JSON encoding, sent as-is by the layer endpoint"""
+        if self._payload is None:
+            # Concurrent first calls may both encode; either result is identical
+            self._payload = json.dumps(self.columns.to_geojson(), separators=(',', ':')).encode('utf-8')
+        return self._payload
+
+    @property
+    def version(self) -> Tuple[str, int, int]:
+        """Identifies this version of the layer's file"""
+        return self.path, self.mtime_ns, self.size
+
+    @property
+    def body(self) -> EncodedBody:
+        """The payload with HTTP validators and cached compressed variants"""
+        if self._body is None:
+            self._body = EncodedBody(lambda: self.payload, make_etag(*self.version), self.mtime_ns / 1e9)
+        return self._body
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate heap memory held by this entry"""
+        payload_bytes = len(self._payload) if self._payload is not None else 0
+        index_bytes = 0 if self.columns.mapped else self.index.nbytes
+        body_bytes = self._body.nbytes if self._body is not None else 0
+        return payload_bytes + self.columns.nbytes + index_bytes + self.polygons.nbytes + body_bytes
+
+    def matches(self, mtime_ns: int, size: int) -> bool:
+        """Check whether this entry still reflects the file on disk"""
+        return self.mtime_ns == mtime_ns and self.size == size
+
+
+class LayerCache:
+    """
+    Process-wide LRU cache of parsed disaster layers.
+    Entries are revalidated against the file's mtime and size and evicted
+    least-recently-used first once the memory budget is exceeded.
+    """
+
+    def __init__(self, max_bytes: Optional[int] = None):
+        if max_bytes is None:
+            max_bytes = int(os.environ.get("LAYER_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path: str) -> Optional[CachedLayer]:
+        """Return the cached layer for a file, (re)loading it if stale; None if missing"""
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            self.invalidate(path)
+            return None
+
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry.matches(stat.st_mtime_ns, stat.st_size):
+                self._entries.move_to_end(path)
+                self.hits += 1
+                return entry
+            self.misses += 1
+
+        # Parse outside the lock so other layers stay available meanwhile
+        entry = CachedLayer.from_file(path, stat.st_mtime_ns, stat.st_size, previous=entry)
+        self._store(entry)
+        return entry
+
+    def peek(self, path: str) -> Optional[CachedLayer]:
+        """Return the resident entry for a file without checking the file; None if not cached"""
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is None:
+                return None
+            self._entries.move_to_end(path)
+            self.hits += 1
+            return entry
+
+    def put(self, entry: CachedLayer):
+        """Insert a layer built elsewhere, replacing any older version of the same file"""
+        self._store(entry)
+
+    def _store(self, entry: CachedLayer):
+        """Insert an entry and evict old ones until the budget is met"""
+        with self._lock:
+            self._entries.pop(entry.path, None)
+            self._entries[entry.path] = entry
+            # Payloads can be encoded lazily, so re-measure every entry
+            self.current_bytes = sum(e.nbytes for e in self._entries.values())
+
+            # Always keep the newest entry, even if it alone exceeds the budget
+            while self.current_bytes > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self.current_bytes -= evicted.nbytes
+                self.evictions += 1
+
+    def invalidate(self, path: str):
+        """Drop a single file from the cache"""
+        with self._lock:
+            if self._entries.pop(path, None) is not None:
+                self.current_bytes = sum(e.nbytes for e in self._entries.values())
+
+    def clear(self):
+        """Drop every cached layer"""
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self) -> Dict:
+        """Cache counters for monitoring"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self.current_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
+
+
+# Shared by every GeoJSONUtils instance in the process
+layer_cache = LayerCache()
+
 
 class GeoJSONUtils:
     """Utility class for handling GeoJSON data and operations"""
     
-    def __init__(self):
+    def __init__(self, cache: Optional[LayerCache] = None):
         self.data_dir = "data"
-        
-    def load_disaster_data(self, disaster_type: str) -> Dict:
-        """Load disaster GeoJSON data"""
-        filename = f"{disaster_type}_zones.geojson"
-        filepath = os.path.join(self.data_dir, filename)
-        
+        self.cache = cache if cache is not None else layer_cache
+        # Paths of layers kept current by a LayerWatcher, by disaster type
+        self._watched_paths: Dict[str, Optional[str]] = {}
+        self.analytics = AnalyticsEngine(DISASTER_TYPES, self.get_layer)
+        self.tiles = VectorTileRenderer(self.get_layer, self.cluster_features)
+        # Encoded analytics response, rebuilt when the snapshot changes
+        self._analytics_body: Optional[Tuple[Dict, EncodedBody]] = None
+
+    def _layer_path(self, disaster_type: str) -> str:
+        """
+        Path of the file backing a disaster layer.
+        A converted binary layer is preferred unless the GeoJSON has been edited since.
+        """
+        geojson_path = os.path.join(self.data_dir, f"{disaster_type}_zones.geojson")
+        binary_path = os.path.join(self.data_dir, f"{disaster_type}_zones{BINARY_SUFFIX}")
+        try:
+            binary_mtime = os.stat(binary_path).st_mtime_ns
+        except FileNotFoundError:
+            return geojson_path
         try:
-            with open(filepath, 'r') as f:
-                return json.load(f)
+            if os.stat(geojson_path).st_mtime_ns > binary_mtime:
+                return geojson_path
         except FileNotFoundError:
+            pass
+        return binary_path
+
+    def get_layer(self, disaster_type: str) -> Optional[CachedLayer]:
+        """Get the cached layer for a disaster type, or None if it has no file"""
+        if disaster_type in self._watched_paths:
+            # A LayerWatcher swaps new versions in, so no need to check the file here
+            path = self._watched_paths[disaster_type]
+            if path is None:
+                return None
+            layer = self.cache.peek(path)
+            if layer is not None:
+                return layer
+        return self.cache.get(self._layer_path(disaster_type))
+
+    def set_layer(self, disaster_type: str, layer: Optional[CachedLayer]):
+        """
+        Atomically make a fully built layer the current version of a disaster type,
+        or record that the type has no file (layer None). Readers see the old or the
+        new version, never a partial one.
+        """
+        old_path = self._watched_paths.get(disaster_type)
+        if layer is not None:
+            self.cache.put(layer)
+        self._watched_paths[disaster_type] = layer.path if layer is not None else None
+        if old_path is not None and (layer is None or old_path != layer.path):
+            # Switched between the GeoJSON and binary file, or the file is gone
+            self.cache.invalidate(old_path)
+
+    @_timed('load_disaster_data')
+    def load_disaster_data(self, disaster_type: str) -> Dict:
+        """Load disaster GeoJSON data, materialized from the cached columnar layer"""
+        layer = self.get_layer(disaster_type)
+        if layer is None:
             # Return empty GeoJSON if file doesn't exist
-            return {
-                "type": "FeatureCollection",
-                "features": []
-            }
+            return _empty_collection()
+        return layer.columns.to_geojson()
+
+    def load_disaster_payload(self, disaster_type: str) -> bytes:
+        """Load disaster GeoJSON data as pre-serialized JSON bytes"""
+        layer = self.get_layer(disaster_type)
+        if layer is None:
+            return json.dumps(_empty_collection(), separators=(',', ':')).encode('utf-8')
+        return layer.payload
+
+    @_timed('load_disaster_body')
+    def load_disaster_body(self, disaster_type: str) -> EncodedBody:
+        """Load disaster GeoJSON data as an encoded body with ETag and compressed variants"""
+        layer = self.get_layer(disaster_type)
+        if layer is None:
+            return EncodedBody(self.load_disaster_payload(disaster_type), make_etag(disaster_type, 'empty'))
+        return layer.body
     
     def calculate_distance(self, lat1: float, lon1: float, lat2: float, lon2: float) -> float:
         """Calculate distance between two points in kilometers using Haversine formula"""
@@ -41,77 +337,194 @@ class GeoJSONUtils:
         c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
         
         return R * c
+
+    def calculate_distances(self, center_lats, center_lons, lats: np.ndarray, lons: np.ndarray,
+                            radius: Optional[float] = None):
+        """
+        Batched Haversine distances in kilometers from one or many centers to a set of points.
+        Returns the distances, plus a within-radius mask when a radius is given.
+        """
+        if radius is None:
+            return haversine_distances(center_lats, center_lons, lats, lons)
+        return haversine_within(center_lats, center_lons, lats, lons, radius)
+    
+    @_timed('find_within_radius')
+    def find_within_radius(self, disaster_type: str, lat: float, lon: float,
+                           radius: float) -> Tuple[Optional[CachedLayer], np.ndarray, np.ndarray]:
+        """
+        Locate the features of a layer within radius km of a point.
+        Polygon zones match when their nearest edge is within radius, with
+        distance 0 when they contain the point, so radius 0 finds the zones
+        containing it. Returns the layer, the matching feature positions in
+        file order and their distances.
+        """
+        layer = self.get_layer(disaster_type)
+        if layer is None:
+            return None, np.empty(0, dtype=np.int64), np.empty(0)
+        
+        index = layer.index
+        rows = index.query_radius(lat, lon, radius)
+        distances, within = self.calculate_distances(
+            lat, lon, index.lats[rows], index.lons[rows], radius
+        )
+        positions = index.positions[rows[within]]
+        distances = distances[within]
+        
+        if layer.polygons.size:
+            polygon_rows, polygon_distances = layer.polygons.within(lat, lon, radius)
+            positions = np.concatenate([positions, layer.polygons.positions[polygon_rows]])
+            distances = np.concatenate([distances, polygon_distances])
+            order = np.argsort(positions, kind='stable')
+            positions, distances = positions[order], distances[order]
+        
+        REPORT_FEATURES.labels(_type_label(disaster_type)).inc(len(positions))
+        return layer, positions, distances
     
+    def iter_report_features(self, layer: CachedLayer, positions: np.ndarray, distances: np.ndarray):
+        """Materialize report features one at a time, with distance_km added"""
+        for position, distance in zip(positions, distances):
+            feature = layer.columns.feature(position)
+            feature['properties'] = dict(feature['properties'] or {})
+            feature['properties']['distance_km'] = round(float(distance), 2)
+            yield feature
+    
+    def report_metadata(self, disaster_type: str, lat: float, lon: float, radius: float,
+                        total_features: int) -> Dict:
+        """Metadata block describing a report"""
+        return {
+            "report_type": disaster_type,
+            "center_lat": lat,
+            "center_lon": lon,
+            "radius_km": radius,
+            "generated_at": datetime.now().isoformat(),
+            "total_features": total_features
+        }
+    
+    @_timed('generate_report')
     def generate_report(self, disaster_type: str, lat: float, lon: float, radius: float) -> Dict:
         """Generate disaster report for a specific region"""
-        disaster_data = self.load_disaster_data(disaster_type)
-        
         # Filter features within the specified radius
+        layer, positions, distances = self.find_within_radius(disaster_type, lat, lon, radius)
         filtered_features = []
-        for feature in disaster_data.get('features', []):
-            if feature['geometry']['type'] == 'Point':
-                feature_coords = feature['geometry']['coordinates']
-                feature_lon, feature_lat = feature_coords[0], feature_coords[1]
-                
-                distance = self.calculate_distance(lat, lon, feature_lat, feature_lon)
-                if distance <= radius:
-                    # Add distance to properties
-                    feature['properties']['distance_km'] = round(distance, 2)
-                    filtered_features.append(feature)
+        if layer is not None:
+            # Only the matching rows are materialized as GeoJSON
+            filtered_features = list(self.iter_report_features(layer, positions, distances))
         
         return {
             "type": "FeatureCollection",
-            "metadata": {
-                "report_type": disaster_type,
-                "center_lat": lat,
-                "center_lon": lon,
-                "radius_km": radius,
-                "generated_at": datetime.now().isoformat(),
-                "total_features": len(filtered_features)
-            },
+            "metadata": self.report_metadata(disaster_type, lat, lon, radius, len(filtered_features)),
             "features": filtered_features
         }
     
-    def get_disaster_analytics(self) -> Dict:
-        """Get analytics data for all disaster types"""
-        disaster_types = ['flood', 'wildfire', 'drought', 'earthquake']
-        analytics = {
-            'total_incidents': 0,
-            'by_type': {},
-            'trend_data': [],
-            'risk_distribution': {
-                'high': 0,
-                'medium': 0,
-                'low': 0
+    @_timed('query_layer')
+    def query_layer(self, disaster_type: str, bbox: Optional[Tuple[float, float, float, float]] = None,
+                    filters: Optional[Dict[str, List]] = None, limit: int = DEFAULT_PAGE_SIZE,
+                    cursor: int = 0, zoom: Optional[int] = None, cluster: bool = False) -> Dict:
+        """
+        Features of a layer inside a viewport, matching property filters, one page at a time.
+        bbox is (min_lon, min_lat, max_lon, max_lat); cursor is the feature position to resume
+        from (next_cursor of the previous page). At low zoom levels with cluster set, nearby
+        points are merged into cluster features and the whole viewport is returned at once.
+        """
+        layer = self.get_layer(disaster_type)
+        if layer is None:
+            return {**_empty_collection(), "pagination": {"total": 0, "returned": 0, "next_cursor": None}}
+
+        columns = layer.columns
+        if bbox is not None:
+            # Index rows come back sorted, so positions stay in file order
+            positions = layer.index.positions[layer.index.query_bbox(*bbox)]
+            if layer.polygons.size:
+                # Polygon zones whose bounding box overlaps the viewport
+                positions = np.union1d(positions, layer.polygons.positions[layer.polygons.query_bbox(*bbox)])
+        else:
+            positions = np.arange(columns.size, dtype=np.int64)
+        if filters:
+            positions = positions[columns.filter_rows(filters, rows=positions)]
+
+        if cluster and zoom is not None and zoom < CLUSTER_MAX_ZOOM:
+            features = self.cluster_features(layer, positions, zoom)
+            return {
+                "type": "FeatureCollection",
+                "features": features,
+                "pagination": {"total": len(positions), "returned": len(features), "next_cursor": None}
             }
+
+        start = int(np.searchsorted(positions, cursor))
+        page = positions[start:start + limit]
+        next_cursor = int(positions[start + limit]) if start + limit < len(positions) else None
+        return {
+            "type": "FeatureCollection",
+            "features": columns.to_geojson(page)["features"],
+            "pagination": {"total": len(positions), "returned": len(page), "next_cursor": next_cursor}
         }
-        
-        # Generate trend data for the last 12 months
-        for i in range(12):
-            month_date = datetime.now() - timedelta(days=30 * i)
-            month_data = {
-                'month': month_date.strftime('%Y-%m'),
-                'incidents': random.randint(50, 200)  # Simulated data
+
+    def cluster_features(self, layer: CachedLayer, positions: np.ndarray, zoom: int,
+                         radius_px: float = 60) -> List[Dict]:
+        """Grid-cluster point features; lone points and non-point geometries pass through as-is"""
+        columns = layer.columns
+        lats = columns.lats[positions]
+        lons = columns.lons[positions]
+        is_point = ~np.isnan(lons)
+        features = [columns.feature(position) for position in positions[~is_point]]
+
+        positions, lats, lons = positions[is_point], lats[is_point], lons[is_point]
+        if len(positions) == 0:
+            return features
+        labels, n_clusters = cluster_labels(lats, lons, zoom, radius_px)
+        counts = np.bincount(labels, minlength=n_clusters)
+        mean_lats = np.bincount(labels, weights=lats, minlength=n_clusters) / counts
+        mean_lons = np.bincount(labels, weights=lons, minlength=n_clusters) / counts
+
+        population = columns.columns.get('population_affected')
+        population_totals = None
+        if isinstance(population, NumericColumn):
+            present = columns.has_property('population_affected')[positions]
+            values = np.where(present, population.values[positions], 0)
+            population_totals = np.bincount(labels, weights=values, minlength=n_clusters)
+
+        risk_counts = {}
+        for level in ('high', 'medium', 'low'):
+            matches = columns.filter_rows({'risk_level': [level]}, rows=positions)
+            risk_counts[level] = np.bincount(labels[matches], minlength=n_clusters)
+
+        # Only read for one-point clusters, where the label maps to a single position
+        single_positions = np.zeros(n_clusters, dtype=np.int64)
+        single_positions[labels] = positions
+        for label in range(n_clusters):
+            if counts[label] == 1:
+                features.append(columns.feature(single_positions[label]))
+                continue
+            properties = {
+                "cluster": True,
+                "point_count": int(counts[label]),
+                "risk_levels": {level: int(c[label]) for level, c in risk_counts.items()}
             }
-            analytics['trend_data'].insert(0, month_data)
-        
-        # Analyze each disaster type
-        for disaster_type in disaster_types:
-            data = self.load_disaster_data(disaster_type)
-            feature_count = len(data.get('features', []))
-            analytics['by_type'][disaster_type] = feature_count
-            analytics['total_incidents'] += feature_count
-            
-            # Simulate risk distribution
-            high_risk = random.randint(10, 30)
-            medium_risk = random.randint(20, 50)
-            low_risk = feature_count - high_risk - medium_risk
-            
-            analytics['risk_distribution']['high'] += max(0, high_risk)
-            analytics['risk_distribution']['medium'] += max(0, medium_risk)
-            analytics['risk_distribution']['low'] += max(0, low_risk)
-        
-        return analytics
+            if population_totals is not None:
+                properties["population_affected"] = int(population_totals[label])
+            features.append(self.create_geojson_feature(
+                round(float(mean_lats[label]), 6), round(float(mean_lons[label]), 6), properties
+            ))
+        return features
+
+    def get_disaster_analytics(self) -> Dict:
+        """Get analytics data for all disaster types, from precomputed per-layer aggregates"""
+        return self.analytics.get()
+
+    def get_analytics_body(self) -> EncodedBody:
+        """Analytics as an encoded body; its ETag changes only when a layer does"""
+        snapshot = self.analytics.get()
+        cached = self._analytics_body
+        if cached is not None and cached[0] is snapshot:
+            return cached[1]
+
+        layers = [self.get_layer(disaster_type) for disaster_type in DISASTER_TYPES]
+        versions = [layer.version for layer in layers if layer is not None]
+        last_modified = max((layer.mtime_ns / 1e9 for layer in layers if layer is not None), default=None)
+        body = EncodedBody(json.dumps(snapshot, separators=(',', ':')).encode('utf-8'),
+                           make_etag('analytics', *versions), last_modified)
+        self._analytics_body = (snapshot, body)
+        return body
     
     def create_geojson_feature(self, lat: float, lon: float, properties: Dict) -> Dict:
         """Create a GeoJSON feature"""
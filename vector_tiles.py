@@ -0,0 +1,393 @@
+"""
+Vector tiles cut from the disaster layers
+
+Tiles follow the Web Mercator z/x/y scheme. As in Mapbox Vector Tiles,
+geometry is quantized to integers on a TILE_EXTENT grid relative to the
+tile's top-left corner, lines and polygons are simplified to the tile's
+resolution, and property keys and values are dictionary-encoded once per
+tile. The container is compact JSON rather than protobuf so the dashboard
+can decode tiles without a tile library.
+"""
+
+import json
+import math
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from polygon_index import STRTree
+
+TILE_EXTENT = 4096
+# Extra margin around each tile, in tile units, so lines and polygons crossing
+# the edge are not cut off. Points are never buffered: each belongs to exactly
+# the tile whose [0, TILE_EXTENT) grid it falls in.
+TILE_BUFFER = 64
+MAX_TILE_ZOOM = 18
+# Below this zoom points are clustered; cells are tile-aligned so no cluster spans tiles
+TILE_CLUSTER_MAX_ZOOM = 9
+TILE_CLUSTER_RADIUS_PX = 64
+# Douglas-Peucker tolerance in tile units (1 px on a 256 px tile)
+SIMPLIFY_TOLERANCE = TILE_EXTENT / 256
+
+MAX_MERCATOR_LAT = 85.0511287798
+
+# MVT geometry type codes
+POINT, LINESTRING, POLYGON = 1, 2, 3
+
+
+def tile_bounds(z: int, x: int, y: int, buffer: float = 0) -> Tuple[float, float, float, float]:
+    """(min_lon, min_lat, max_lon, max_lat) of a tile, grown by buffer tile units"""
+    n = 2 ** z
+    pad = buffer / TILE_EXTENT
+
+    def lat_of(tile_y: float) -> float:
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * tile_y / n))))
+
+    min_lon = (x - pad) / n * 360 - 180
+    max_lon = (x + 1 + pad) / n * 360 - 180
+    max_lat = lat_of(max(y - pad, 0))
+    min_lat = lat_of(min(y + 1 + pad, n))
+    return min_lon, min_lat, max_lon, max_lat
+
+
+def project(coordinates: np.ndarray, z: int, x: int, y: int) -> np.ndarray:
+    """Project (k, 2) lon/lat coordinates into a tile's integer-grid space (floats)"""
+    n = 2 ** z
+    lons = coordinates[:, 0]
+    lats = np.radians(np.clip(coordinates[:, 1], -MAX_MERCATOR_LAT, MAX_MERCATOR_LAT))
+    px = ((lons + 180) / 360 * n - x) * TILE_EXTENT
+    py = ((1 - np.log(np.tan(lats) + 1 / np.cos(lats)) / math.pi) / 2 * n - y) * TILE_EXTENT
+    return np.column_stack((px, py))
+
+
+def point_grid(coordinates: np.ndarray, z: int, x: int, y: int) -> np.ndarray:
+    """
+    Integer tile-grid positions of (k, 2) lon/lat points.
+    Points on the east and south edges of the world are pulled into the last
+    tile, so every point on the map falls in exactly one tile's [0, TILE_EXTENT) square.
+    """
+    n = 2 ** z
+    grid = np.rint(project(coordinates, z, x, y)).astype(np.int64)
+    grid[:, 0] = np.minimum(grid[:, 0], (n - x) * TILE_EXTENT - 1)
+    grid[:, 1] = np.minimum(grid[:, 1], (n - y) * TILE_EXTENT - 1)
+    return grid
+
+
+def _in_tile(grid: np.ndarray) -> np.ndarray:
+    return np.all((grid >= 0) & (grid < TILE_EXTENT), axis=1)
+
+
+def simplify(points: np.ndarray, tolerance: float) -> np.ndarray:
+    """Douglas-Peucker simplification of a (k, 2) polyline; endpoints are always kept"""
+    if len(points) <= 2:
+        return points
+    keep = np.zeros(len(points), dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last <= first + 1:
+            continue
+        segment = points[last] - points[first]
+        offsets = points[first + 1:last] - points[first]
+        length = math.hypot(segment[0], segment[1])
+        if length == 0:
+            # Closed ring: measure from the shared endpoint
+            distances = np.hypot(offsets[:, 0], offsets[:, 1])
+        else:
+            distances = np.abs(segment[0] * offsets[:, 1] - segment[1] * offsets[:, 0]) / length
+        farthest = int(np.argmax(distances))
+        if distances[farthest] > tolerance:
+            split = first + 1 + farthest
+            keep[split] = True
+            stack.append((first, split))
+            stack.append((split, last))
+    return points[keep]
+
+
+def _quantize(points: np.ndarray) -> List[int]:
+    """Round to the tile grid, drop repeated vertices and flatten to [x0, y0, x1, y1, ...]"""
+    grid = np.rint(points).astype(np.int64)
+    if len(grid) > 1:
+        changed = np.any(grid[1:] != grid[:-1], axis=1)
+        grid = grid[np.concatenate(([True], changed))]
+    return grid.ravel().tolist()
+
+
+def _line(coordinates, z: int, x: int, y: int) -> Optional[List[int]]:
+    points = simplify(project(np.asarray(coordinates, dtype=np.float64)[:, :2], z, x, y), SIMPLIFY_TOLERANCE)
+    flat = _quantize(points)
+    return flat if len(flat) >= 4 else None
+
+
+def _ring(coordinates, z: int, x: int, y: int) -> Optional[List[int]]:
+    flat = _line(coordinates, z, x, y)
+    # A closed ring needs three distinct vertices plus the closing one
+    return flat if flat is not None and len(flat) >= 8 else None
+
+
+def encode_geometry(geometry: Optional[Dict], z: int, x: int, y: int) -> Optional[Tuple[int, List]]:
+    """
+    Encode a GeoJSON geometry for a tile as (type, parts).
+    Points: one flat coordinate list. Lines: one flat list per line.
+    Polygons: one list of flat rings per polygon, exterior ring first.
+    Returns None for geometries that vanish at this zoom or are unsupported.
+    """
+    if not geometry:
+        return None
+    kind = geometry.get('type')
+    coordinates = geometry.get('coordinates')
+    try:
+        if kind in ('Point', 'MultiPoint'):
+            points = [coordinates] if kind == 'Point' else coordinates
+            if not points:
+                return None
+            grid = point_grid(np.asarray(points, dtype=np.float64)[:, :2], z, x, y)
+            return POINT, [grid.ravel().tolist()]
+        if kind in ('LineString', 'MultiLineString'):
+            lines = [coordinates] if kind == 'LineString' else coordinates
+            parts = [part for part in (_line(line, z, x, y) for line in lines) if part is not None]
+            return (LINESTRING, parts) if parts else None
+        if kind in ('Polygon', 'MultiPolygon'):
+            polygons = [coordinates] if kind == 'Polygon' else coordinates
+            parts = []
+            for polygon in polygons:
+                exterior = _ring(polygon[0], z, x, y) if polygon else None
+                if exterior is None:
+                    continue
+                holes = [ring for ring in (_ring(r, z, x, y) for r in polygon[1:]) if ring is not None]
+                parts.append([exterior] + holes)
+            return (POLYGON, parts) if parts else None
+    except (TypeError, ValueError, IndexError):
+        return None
+    return None
+
+
+def _geometry_bbox(geometry: Optional[Dict]) -> Optional[Tuple[float, float, float, float]]:
+    """Lon/lat bounding box of any GeoJSON geometry, or None if it has no coordinates"""
+    if not geometry:
+        return None
+    stack = [geometry.get('coordinates')]
+    if geometry.get('type') == 'GeometryCollection':
+        stack = [g.get('coordinates') for g in geometry.get('geometries') or [] if g]
+    lons, lats = [], []
+    while stack:
+        item = stack.pop()
+        if not isinstance(item, (list, tuple)) or not item:
+            continue
+        if isinstance(item[0], (int, float)):
+            if len(item) >= 2:
+                lons.append(item[0])
+                lats.append(item[1])
+        else:
+            stack.extend(item)
+    if not lons:
+        return None
+    return min(lons), min(lats), max(lons), max(lats)
+
+
+class _TileEncoder:
+    """Collects one tile's features with dictionary-encoded properties"""
+
+    def __init__(self, z: int, x: int, y: int):
+        self.z, self.x, self.y = z, x, y
+        self.keys: List[str] = []
+        self.values: List = []
+        self.features: List[Dict] = []
+        self._key_index: Dict[str, int] = {}
+        self._value_index: Dict[str, int] = {}
+
+    def add(self, feature: Dict, feature_id: Optional[int] = None, owned: bool = False):
+        """
+        Add a feature; only its points inside this tile are kept, so no point is drawn twice.
+        owned marks points already known to belong here (cluster centroids), which are
+        clamped to the tile instead, in case rounding moved one across the edge.
+        """
+        encoded = encode_geometry(feature.get('geometry'), self.z, self.x, self.y)
+        if encoded is None:
+            return
+        kind, parts = encoded
+        if kind == POINT:
+            grid = np.asarray(parts[0], dtype=np.int64).reshape(-1, 2)
+            if owned:
+                grid = np.clip(grid, 0, TILE_EXTENT - 1)
+            else:
+                grid = grid[_in_tile(grid)]
+                if len(grid) == 0:
+                    return
+            parts = [grid.ravel().tolist()]
+        tags = []
+        for key, value in (feature.get('properties') or {}).items():
+            key_code = self._key_index.get(key)
+            if key_code is None:
+                key_code = self._key_index[key] = len(self.keys)
+                self.keys.append(key)
+            # Typed key so 1, 1.0, True and "1" stay distinct
+            value_key = f"{type(value).__name__}:{json.dumps(value, sort_keys=True)}"
+            value_code = self._value_index.get(value_key)
+            if value_code is None:
+                value_code = self._value_index[value_key] = len(self.values)
+                self.values.append(value)
+            tags += (key_code, value_code)
+        self.features.append({'id': feature_id, 'type': kind, 'geometry': parts, 'tags': tags})
+
+    def to_bytes(self) -> bytes:
+        tile = {'z': self.z, 'x': self.x, 'y': self.y, 'extent': TILE_EXTENT,
+                'keys': self.keys, 'values': self.values, 'features': self.features}
+        return json.dumps(tile, separators=(',', ':')).encode('utf-8')
+
+
+class TileCache:
+    """
+    Process-wide LRU cache of encoded tiles, bounded by total bytes.
+    Keys carry the layer version, so tiles of replaced files are never served
+    and simply age out.
+    """
+
+    def __init__(self, max_bytes: Optional[int] = None):
+        if max_bytes is None:
+            max_bytes = int(os.environ.get("TILE_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple) -> Optional[bytes]:
+        with self._lock:
+            tile = self._entries.get(key)
+            if tile is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return tile
+
+    def set(self, key: Tuple, tile: bytes):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.current_bytes -= len(old)
+            self._entries[key] = tile
+            self.current_bytes += len(tile)
+            while self.current_bytes > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self.current_bytes -= len(evicted)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self) -> Dict:
+        """Cache counters for monitoring"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self.current_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
+
+
+# Shared by every renderer in the process
+tile_cache = TileCache()
+
+
+class VectorTileRenderer:
+    """
+    Cuts cached disaster layers into encoded vector tiles.
+    Points come from the layer's grid index and are kept only in the tile they
+    fall in; at low zooms those are grid-clustered by cluster_features. Polygons
+    are matched through the layer's PolygonIndex, and other geometries through
+    an STR-tree over their bounding boxes, both with the tile buffer.
+    """
+
+    def __init__(self, get_layer: Callable, cluster_features: Callable,
+                 cache: Optional[TileCache] = None):
+        self._get_layer = get_layer
+        self._cluster_features = cluster_features
+        self.cache = cache if cache is not None else tile_cache
+        # Rows and bounding-box tree of the shapes outside the PolygonIndex, per layer version
+        self._shape_trees: Dict[str, Tuple[object, np.ndarray, STRTree]] = {}
+
+    def get_tile(self, disaster_type: str, z: int, x: int, y: int) -> bytes:
+        """Encoded tile of one layer; raises ValueError for tiles outside the grid"""
+        if not 0 <= z <= MAX_TILE_ZOOM or not 0 <= x < 2 ** z or not 0 <= y < 2 ** z:
+            raise ValueError(f"Tile {z}/{x}/{y} is outside the tile grid")
+
+        layer = self._get_layer(disaster_type)
+        if layer is None:
+            return _TileEncoder(z, x, y).to_bytes()
+
+        key = (disaster_type, layer.path, layer.mtime_ns, layer.size, z, x, y)
+        tile = self.cache.get(key)
+        if tile is None:
+            tile = self.render(disaster_type, layer, z, x, y)
+            self.cache.set(key, tile)
+        return tile
+
+    def render(self, disaster_type: str, layer, z: int, x: int, y: int) -> bytes:
+        """Encode one tile of a cached layer"""
+        columns = layer.columns
+        encoder = _TileEncoder(z, x, y)
+
+        # One grid unit of slack so points on the tile edge are not lost to rounding;
+        # the grid test then assigns each to a single tile
+        candidates = layer.index.positions[layer.index.query_bbox(*tile_bounds(z, x, y, 1))]
+        grid = point_grid(np.column_stack((columns.lons[candidates], columns.lats[candidates])), z, x, y)
+        positions = candidates[_in_tile(grid)]
+        if z < TILE_CLUSTER_MAX_ZOOM:
+            for feature in self._cluster_features(layer, positions, z, TILE_CLUSTER_RADIUS_PX):
+                encoder.add(feature, owned=True)
+        else:
+            for position in positions:
+                feature = columns.feature(position)
+                encoder.add(feature, int(position))
+
+        min_lon, min_lat, max_lon, max_lat = tile_bounds(z, x, y, TILE_BUFFER)
+        # Shapes are not wrapped across the antimeridian into the buffer
+        bbox = (max(min_lon, -180.0), min_lat, min(max_lon, 180.0), max_lat)
+        rows = layer.polygons.positions[layer.polygons.query_bbox(*bbox)]
+        shape_rows, tree = self._shapes(disaster_type, layer)
+        rows = np.union1d(rows, shape_rows[tree.query(*bbox)])
+        for row in rows:
+            encoder.add(columns.feature(row), int(row))
+        return encoder.to_bytes()
+
+    def _shapes(self, disaster_type: str, layer) -> Tuple[np.ndarray, STRTree]:
+        """Rows of a layer's non-point shapes missing from its PolygonIndex, and a tree of their boxes"""
+        cached = self._shape_trees.get(disaster_type)
+        if cached is not None and cached[0] is layer:
+            return cached[1], cached[2]
+
+        rows, bboxes = [], []
+        columns = layer.columns
+        shapes = np.setdiff1d(np.flatnonzero(np.isnan(columns.lons)), layer.polygons.positions)
+        for row in shapes:
+            bbox = _geometry_bbox(columns.geometries.get(int(row)))
+            if bbox is not None:
+                rows.append(int(row))
+                bboxes.append(bbox)
+        result = (np.array(rows, dtype=np.int64), STRTree(np.array(bboxes, dtype=np.float64).reshape(-1, 4)))
+        self._shape_trees[disaster_type] = (layer, result[0], result[1])
+        return result
+
+    def prerender(self, disaster_types: Sequence[str], max_zoom: int) -> int:
+        """Render every tile up to max_zoom into the cache; returns the number of tiles"""
+        count = 0
+        for disaster_type in disaster_types:
+            for z in range(min(max_zoom, MAX_TILE_ZOOM) + 1):
+                for x in range(2 ** z):
+                    for y in range(2 ** z):
+                        self.get_tile(disaster_type, z, x, y)
+                        count += 1
+        return count
@@ -1,18 +1,195 @@
 import os
+import random
+import threading
+import time
 import requests
 import logging
-from typing import Dict, Optional
+from requests.adapters import HTTPAdapter
+from typing import Dict, Optional, Tuple
+
+from cache import TTLCache
+from metrics import registry as metrics_registry
+
+# Upstream statuses worth retrying; other 4xx errors are our own fault
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+# Every upstream attempt, retries included; outcome is the HTTP status, or
+# timeout, connection_error, request_error or circuit_open when no response came back
+UPSTREAM_REQUESTS = metrics_registry.counter(
+    'weather_upstream_requests_total', 'Weather API upstream attempts by endpoint and outcome',
+    ('endpoint', 'outcome')
+)
+UPSTREAM_SECONDS = metrics_registry.histogram(
+    'weather_upstream_seconds', 'Duration of weather API upstream attempts', ('endpoint',)
+)
+UPSTREAM_RETRIES = metrics_registry.counter(
+    'weather_upstream_retries_total', 'Weather API upstream attempts that were retried', ('endpoint',)
+)
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """Raised instead of calling an upstream that is known to be failing"""
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+    After failure_threshold failures the circuit opens and calls fail fast
+    for reset_timeout seconds; then a single trial call decides whether it closes again.
+    """
+    
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+    
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return 'half_open'
+        return 'open'
+    
+    def allow(self) -> bool:
+        """Whether a call may go upstream now"""
+        with self._lock:
+            state = self.state
+            if state == 'closed':
+                return True
+            if state == 'half_open' and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+    
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+    
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial_in_flight or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self._trial_in_flight = False
+
 
 class WeatherAPI:
     """OpenWeatherMap API integration"""
     
-    def __init__(self):
+    def __init__(self, cache: Optional[TTLCache] = None):
         self.api_key = os.getenv("OPENWEATHER_API_KEY", "your_api_key_here")
         self.base_url = "http://api.openweathermap.org/data/2.5"
         self.geo_url = "http://api.openweathermap.org/geo/1.0"
         
+        # Responses are cached per endpoint; nearby coordinates share an entry
+        self.cache = cache if cache is not None else TTLCache(
+            max_entries=int(os.getenv("WEATHER_CACHE_MAX_ENTRIES", 4096))
+        )
+        self.quantum_deg = float(os.getenv("WEATHER_CACHE_QUANTUM_DEG", 0.01))
+        self.ttls = {
+            'weather': float(os.getenv("WEATHER_CACHE_TTL", 600)),
+            'forecast': float(os.getenv("FORECAST_CACHE_TTL", 1800)),
+            'geocode': float(os.getenv("GEOCODE_CACHE_TTL", 86400)),
+        }
+        # Expired entries are still served this long while being refreshed
+        self.stale_ttl = float(os.getenv("WEATHER_CACHE_STALE_TTL", 300))
+        
+        # One keep-alive connection pool shared by every worker thread
+        pool_size = int(os.getenv("WEATHER_POOL_SIZE", 32))
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.timeout = (
+            float(os.getenv("WEATHER_CONNECT_TIMEOUT", 3.05)),
+            float(os.getenv("WEATHER_READ_TIMEOUT", 5))
+        )
+        self.max_retries = int(os.getenv("WEATHER_MAX_RETRIES", 2))
+        self.backoff_base = float(os.getenv("WEATHER_BACKOFF_BASE", 0.25))
+        self.backoff_max = float(os.getenv("WEATHER_BACKOFF_MAX", 2))
+        self.breaker = CircuitBreaker(
+            failure_threshold=int(os.getenv("WEATHER_BREAKER_THRESHOLD", 5)),
+            reset_timeout=float(os.getenv("WEATHER_BREAKER_RESET", 30))
+        )
+    
+    def _request(self, url: str, params: Dict) -> requests.Response:
+        """
+        GET from the upstream through the pooled session.
+        Connection errors, timeouts, 429 and 5xx responses are retried with
+        jittered exponential backoff; while the circuit is open calls fail fast.
+        The breaker sees each call once: a failure only when its retries run out.
+        """
+        endpoint = url.rsplit('/', 1)[-1]
+        if not self.breaker.allow():
+            UPSTREAM_REQUESTS.labels(endpoint, 'circuit_open').inc()
+            raise CircuitOpenError("Upstream circuit open, failing fast")
+        
+        # Every path below settles the breaker, so a half-open trial is never left in flight
+        settled = False
+        try:
+            for attempt in range(self.max_retries + 1):
+                started = time.perf_counter()
+                try:
+                    response = self.session.get(url, params=params, timeout=self.timeout)
+                except requests.exceptions.RequestException as e:
+                    UPSTREAM_SECONDS.labels(endpoint).observe(time.perf_counter() - started)
+                    if isinstance(e, requests.exceptions.Timeout):
+                        outcome = 'timeout'
+                    elif isinstance(e, requests.exceptions.ConnectionError):
+                        outcome = 'connection_error'
+                    else:
+                        outcome = 'request_error'
+                    UPSTREAM_REQUESTS.labels(endpoint, outcome).inc()
+                    # Only timeouts and connection errors are worth another attempt
+                    if outcome == 'request_error' or attempt == self.max_retries:
+                        raise
+                else:
+                    UPSTREAM_SECONDS.labels(endpoint).observe(time.perf_counter() - started)
+                    UPSTREAM_REQUESTS.labels(endpoint, response.status_code).inc()
+                    if response.status_code not in RETRYABLE_STATUSES:
+                        self.breaker.record_success()
+                        settled = True
+                        response.raise_for_status()
+                        return response
+                    if attempt == self.max_retries:
+                        response.raise_for_status()
+                
+                UPSTREAM_RETRIES.labels(endpoint).inc()
+                # Full jitter keeps retrying workers from synchronizing
+                time.sleep(random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt)))
+        finally:
+            if not settled:
+                self.breaker.record_failure()
+    
+    def _quantize(self, lat: float, lon: float) -> Tuple[float, float]:
+        """Snap coordinates to the cache grid so nearby clicks share an entry"""
+        if self.quantum_deg <= 0:
+            return lat, lon
+        step = self.quantum_deg
+        return round(round(lat / step) * step, 6), round(round(lon / step) * step, 6)
+    
+    def cache_stats(self) -> Dict:
+        """Hit/miss counters of the response cache"""
+        return self.cache.stats()
+    
     def get_weather(self, lat: float, lon: float) -> Dict:
         """Get current weather for coordinates"""
+        lat, lon = self._quantize(lat, lon)
+        return self.cache.get_or_load(
+            ('weather', lat, lon),
+            lambda: self._fetch_weather(lat, lon),
+            self.ttls['weather'],
+            self.stale_ttl
+        )
+    
+    def _fetch_weather(self, lat: float, lon: float) -> Dict:
+        """Fetch current weather from the upstream API"""
         try:
             url = f"{self.base_url}/weather"
             params = {
@@ -22,8 +199,7 @@ class WeatherAPI:
                 'units': 'metric'
             }
             
-            response = requests.get(url, params=params, timeout=10)
-            response.raise_for_status()
+            response = self._request(url, params)
             
             data = response.json()
             
@@ -53,6 +229,15 @@ class WeatherAPI:
     
     def get_city_coordinates(self, city_name: str) -> Dict:
         """Get coordinates for a city name"""
+        return self.cache.get_or_load(
+            ('geocode', city_name.strip().lower()),
+            lambda: self._fetch_city_coordinates(city_name),
+            self.ttls['geocode'],
+            self.stale_ttl
+        )
+    
+    def _fetch_city_coordinates(self, city_name: str) -> Dict:
+        """Fetch city coordinates from the upstream geocoding API"""
         try:
             url = f"{self.geo_url}/direct"
             params = {
@@ -61,8 +246,7 @@ class WeatherAPI:
                 'appid': self.api_key
             }
             
-            response = requests.get(url, params=params, timeout=10)
-            response.raise_for_status()
+            response = self._request(url, params)
             
             data = response.json()
             
@@ -87,6 +271,16 @@ class WeatherAPI:
     
     def get_weather_forecast(self, lat: float, lon: float, days: int = 5) -> Dict:
         """Get weather forecast for coordinates"""
+        lat, lon = self._quantize(lat, lon)
+        return self.cache.get_or_load(
+            ('forecast', lat, lon, days),
+            lambda: self._fetch_weather_forecast(lat, lon, days),
+            self.ttls['forecast'],
+            self.stale_ttl
+        )
+    
+    def _fetch_weather_forecast(self, lat: float, lon: float, days: int = 5) -> Dict:
+        """Fetch the weather forecast from the upstream API"""
         try:
             url = f"{self.base_url}/forecast"
             params = {
@@ -97,8 +291,7 @@ class WeatherAPI:
                 'cnt': days * 8  # 8 forecasts per day (every 3 hours)
             }
             
-            response = requests.get(url, params=params, timeout=10)
-            response.raise_for_status()
+            response = self._request(url, params)
             
             data = response.json()
             
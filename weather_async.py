@@ -0,0 +1,151 @@
+import asyncio
+import concurrent.futures
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+
+from weather_api import WeatherAPI
+
+
+class AsyncWeatherAPI:
+    """
+    asyncio front end for WeatherAPI.
+    Identical in-flight requests are single-flighted so one upstream call
+    serves every waiter, and multi-point lookups fan out concurrently.
+    Blocking HTTP work runs on a thread pool sized to the connection pool.
+    """
+
+    def __init__(self, api: Optional[WeatherAPI] = None, max_concurrency: Optional[int] = None):
+        self.api = api if api is not None else WeatherAPI()
+        if max_concurrency is None:
+            max_concurrency = int(os.getenv("WEATHER_POOL_SIZE", 32))
+        self.max_concurrency = max_concurrency
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='weather')
+        self.coalesced = 0
+        self._in_flight: Dict[Hashable, asyncio.Future] = {}
+
+    def reset(self):
+        """Fresh executor and in-flight table, e.g. in a forked child process"""
+        self.executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix='weather')
+        self._in_flight = {}
+
+    async def _single_flight(self, key: Hashable, call: Callable[[], Any]) -> Any:
+        """Run call once per key at a time; concurrent callers share its result"""
+        future = self._in_flight.get(key)
+        if future is not None:
+            self.coalesced += 1
+            return await asyncio.shield(future)
+
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self.executor, call)
+        self._in_flight[key] = future
+        # Forget the call once it settles, even if every waiter was cancelled
+        future.add_done_callback(lambda done: self._forget(key, done))
+        return await asyncio.shield(future)
+
+    def _forget(self, key: Hashable, future: asyncio.Future):
+        if self._in_flight.get(key) is future:
+            del self._in_flight[key]
+
+    async def get_weather(self, lat: float, lon: float) -> Dict:
+        """Get current weather for coordinates"""
+        lat, lon = self.api._quantize(lat, lon)
+        return await self._single_flight(('weather', lat, lon), lambda: self.api.get_weather(lat, lon))
+
+    async def get_weather_forecast(self, lat: float, lon: float, days: int = 5) -> Dict:
+        """Get weather forecast for coordinates"""
+        lat, lon = self.api._quantize(lat, lon)
+        return await self._single_flight(
+            ('forecast', lat, lon, days), lambda: self.api.get_weather_forecast(lat, lon, days)
+        )
+
+    async def get_city_coordinates(self, city_name: str) -> Dict:
+        """Get coordinates for a city name"""
+        return await self._single_flight(
+            ('geocode', city_name.strip().lower()), lambda: self.api.get_city_coordinates(city_name)
+        )
+
+    async def get_conditions(self, lat: float, lon: float, include_forecast: bool = True) -> Dict:
+        """Current weather and, optionally, the forecast for one point, fetched concurrently"""
+        calls = [self.get_weather(lat, lon)]
+        if include_forecast:
+            calls.append(self.get_weather_forecast(lat, lon))
+        results = await asyncio.gather(*calls, return_exceptions=True)
+
+        conditions = {'lat': lat, 'lon': lon}
+        for name, result in zip(('weather', 'forecast'), results):
+            if isinstance(result, Exception):
+                conditions[name] = None
+                conditions[f'{name}_error'] = str(result)
+            else:
+                conditions[name] = result
+        return conditions
+
+    async def get_conditions_many(self, points: Sequence[Tuple[float, float]],
+                                  include_forecast: bool = True) -> List[Dict]:
+        """Fan out get_conditions over many points; one failure does not fail the rest"""
+        return list(await asyncio.gather(
+            *(self.get_conditions(lat, lon, include_forecast) for lat, lon in points)
+        ))
+
+
+class WeatherService:
+    """
+    Synchronous facade over AsyncWeatherAPI for the Flask routes.
+    Every calling thread submits to one event loop running in a background
+    thread, so identical requests from different threads still coalesce.
+    """
+
+    def __init__(self, api: Optional[WeatherAPI] = None, timeout: Optional[float] = None):
+        self.async_api = AsyncWeatherAPI(api)
+        self.api = self.async_api.api
+        # Worst case: every retry times out on both connect and read
+        self.timeout = timeout if timeout is not None else (
+            (self.api.max_retries + 1) * (sum(self.api.timeout) + self.api.backoff_max)
+        )
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        """Start the event loop thread on first use, and again after a fork"""
+        with self._lock:
+            if self._loop is None or self._loop_pid != os.getpid():
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name='weather-loop', daemon=True).start()
+                self._loop = loop
+                self._loop_pid = os.getpid()
+                self.async_api.reset()
+            return self._loop
+
+    def _run(self, coroutine) -> Any:
+        future = asyncio.run_coroutine_threadsafe(coroutine, self._ensure_loop())
+        try:
+            return future.result(self.timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            logging.error("Weather request timed out waiting for the event loop")
+            raise Exception("Weather API unavailable: request timed out")
+
+    def get_weather(self, lat: float, lon: float) -> Dict:
+        """Get current weather for coordinates"""
+        return self._run(self.async_api.get_weather(lat, lon))
+
+    def get_weather_forecast(self, lat: float, lon: float, days: int = 5) -> Dict:
+        """Get weather forecast for coordinates"""
+        return self._run(self.async_api.get_weather_forecast(lat, lon, days))
+
+    def get_city_coordinates(self, city_name: str) -> Dict:
+        """Get coordinates for a city name"""
+        return self._run(self.async_api.get_city_coordinates(city_name))
+
+    def get_conditions_many(self, points: Sequence[Tuple[float, float]],
+                            include_forecast: bool = True) -> List[Dict]:
+        """Current weather (and forecast) for many points, fetched concurrently"""
+        return self._run(self.async_api.get_conditions_many(points, include_forecast))
+
+    def cache_stats(self) -> Dict:
+        """Response cache counters plus requests served by coalescing"""
+        return {**self.api.cache_stats(), 'coalesced': self.async_api.coalesced}